@@ -0,0 +1,28 @@
+"""add event keyset indexes
+
+Revision ID: 8b2d4e6f1a23
+Revises: 3f1a9c2b7d10
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2d4e6f1a23'
+down_revision = '3f1a9c2b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # イベント一覧のカーソルページング（ORDER BY event_date, id）と期間・今後のイベント絞り込み用
+    op.create_index('ix_events_event_date_id', 'events', ['event_date', 'id'])
+    # 作成者での絞り込み＋同じ並び順でのページング用
+    op.create_index('ix_events_creator_id_event_date_id', 'events', ['creator_id', 'event_date', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_creator_id_event_date_id', table_name='events')
+    op.drop_index('ix_events_event_date_id', table_name='events')
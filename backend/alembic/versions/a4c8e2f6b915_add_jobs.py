@@ -0,0 +1,41 @@
+"""add jobs
+
+Revision ID: a4c8e2f6b915
+Revises: f3b7c9d1e624
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e2f6b915'
+down_revision = 'f3b7c9d1e624'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # 実行待ちのジョブだけを対象にした部分インデックス（実行済みの行は削除され、失敗した行は対象外になる）
+    op.create_index(
+        'ix_jobs_pending_run_at', 'jobs', ['run_at', 'id'],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_pending_run_at', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,38 @@
+"""add archived_reason to events_archive
+
+Revision ID: b6d2f8a4c371
+Revises: a4c8e2f6b915
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d2f8a4c371'
+down_revision = 'a4c8e2f6b915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # アーカイブした理由（"aged": 開催から一定期間が経過、"deleted": 作成者が削除）。履歴の一覧から削除したイベントを除くため
+    op.add_column('events_archive', sa.Column('archived_reason', sa.String(), nullable=False, server_default='deleted'))
+    # 既存の行の理由は記録されていないため、作成者による削除とみなして履歴の一覧には返さない
+    # ただし、アーカイブのジョブはバッチ内のイベントを同じ archived_at で移動し、削除は1件ずつ移動するため、
+    # 他のイベントと archived_at が一致する行はジョブが移動したものとして "aged" にする
+    op.execute(
+        """
+        UPDATE events_archive
+        SET archived_reason = 'aged'
+        WHERE archived_at IN (
+            SELECT archived_at FROM events_archive GROUP BY archived_at HAVING count(*) > 1
+        )
+        """
+    )
+    op.alter_column('events_archive', 'archived_reason', server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column('events_archive', 'archived_reason')
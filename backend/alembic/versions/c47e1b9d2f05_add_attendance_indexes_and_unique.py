@@ -0,0 +1,38 @@
+"""add attendance indexes and unique constraint
+
+Revision ID: c47e1b9d2f05
+Revises: 8b2d4e6f1a23
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e1b9d2f05'
+down_revision = '8b2d4e6f1a23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 一意制約を追加する前に、重複した出欠（同じイベント・ユーザー）を1件を残して削除する
+    op.execute(
+        """
+        DELETE FROM attendances a
+        USING attendances b
+        WHERE a.event_id = b.event_id
+          AND a.user_id = b.user_id
+          AND a.ctid > b.ctid
+        """
+    )
+    # (event_id, user_id) の一意制約。event_id 先頭のインデックスとしてイベント単位の出欠一覧取得にも使われる
+    op.create_unique_constraint('uq_attendances_event_id_user_id', 'attendances', ['event_id', 'user_id'])
+    # ユーザー単位の出欠一覧取得用
+    op.create_index('ix_attendances_user_id_event_id', 'attendances', ['user_id', 'event_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_attendances_user_id_event_id', table_name='attendances')
+    op.drop_constraint('uq_attendances_event_id_user_id', 'attendances', type_='unique')
@@ -0,0 +1,26 @@
+"""make events.updated_at not null
+
+Revision ID: c8e4a2d6f193
+Revises: b6d2f8a4c371
+Create Date: 2026-10-18 18:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e4a2d6f193'
+down_revision = 'b6d2f8a4c371'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 更新日時はイベント詳細のETagとレスポンスに必須のため、未設定の行は作成日時（なければ現在時刻）で埋める
+    op.execute("UPDATE events SET updated_at = COALESCE(created_at, now() AT TIME ZONE 'utc') WHERE updated_at IS NULL")
+    op.alter_column('events', 'updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('events', 'updated_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,49 @@
+"""add event attendance summaries
+
+Revision ID: d93a5c7e4b18
+Revises: c47e1b9d2f05
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93a5c7e4b18'
+down_revision = 'c47e1b9d2f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'event_attendance_summaries',
+        sa.Column('event_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('attending', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('not_attending', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('maybe', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('event_id'),
+    )
+    # 既存の出欠から集計を作成
+    op.execute(
+        """
+        INSERT INTO event_attendance_summaries (event_id, attending, not_attending, maybe, version, updated_at)
+        SELECT event_id,
+               count(*) FILTER (WHERE status = 'ATTENDING'),
+               count(*) FILTER (WHERE status = 'NOT_ATTENDING'),
+               count(*) FILTER (WHERE status = 'MAYBE'),
+               1,
+               now() AT TIME ZONE 'utc'
+        FROM attendances
+        GROUP BY event_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('event_attendance_summaries')
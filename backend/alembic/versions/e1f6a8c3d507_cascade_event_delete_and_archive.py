@@ -0,0 +1,65 @@
+"""cascade event delete and add archive tables
+
+Revision ID: e1f6a8c3d507
+Revises: d93a5c7e4b18
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f6a8c3d507'
+down_revision = 'd93a5c7e4b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # イベントの削除時に出欠をデータベース側で削除する（ORMで出欠を読み込まずに1回のDELETEで削除できるようにする）
+    op.drop_constraint('attendances_event_id_fkey', 'attendances', type_='foreignkey')
+    op.create_foreign_key(
+        'attendances_event_id_fkey', 'attendances', 'events',
+        ['event_id'], ['id'], ondelete='CASCADE',
+    )
+    # アーカイブしたイベント・出欠の保存先（元のテーブルと同じ列 + アーカイブ日時）
+    # ユーザーの削除を妨げないよう、外部キーは設定しない
+    op.create_table(
+        'events_archive',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('event_date', sa.DateTime(), nullable=False),
+        sa.Column('creator_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_events_archive_creator_id_event_date', 'events_archive', ['creator_id', 'event_date'])
+    op.create_table(
+        'attendances_archive',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('event_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('status', postgresql.ENUM(name='attendancestatus', create_type=False), nullable=False),
+        sa.Column('comment', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_attendances_archive_event_id', 'attendances_archive', ['event_id'])
+    op.create_index('ix_attendances_archive_user_id', 'attendances_archive', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_attendances_archive_user_id', table_name='attendances_archive')
+    op.drop_index('ix_attendances_archive_event_id', table_name='attendances_archive')
+    op.drop_table('attendances_archive')
+    op.drop_index('ix_events_archive_creator_id_event_date', table_name='events_archive')
+    op.drop_table('events_archive')
+    op.drop_constraint('attendances_event_id_fkey', 'attendances', type_='foreignkey')
+    op.create_foreign_key('attendances_event_id_fkey', 'attendances', 'events', ['event_id'], ['id'])
@@ -0,0 +1,48 @@
+"""add archived event attendance counts and keyset index
+
+Revision ID: f3b7c9d1e624
+Revises: e1f6a8c3d507
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b7c9d1e624'
+down_revision = 'e1f6a8c3d507'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # アーカイブ時点の出欠集計（履歴の一覧で出欠を集計せずに件数を返すため）
+    op.add_column('events_archive', sa.Column('attending', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('events_archive', sa.Column('not_attending', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('events_archive', sa.Column('maybe', sa.Integer(), nullable=False, server_default='0'))
+    # アーカイブ済みのイベントの集計をアーカイブした出欠から作成
+    op.execute(
+        """
+        UPDATE events_archive e
+        SET attending = c.attending, not_attending = c.not_attending, maybe = c.maybe
+        FROM (
+            SELECT event_id,
+                   count(*) FILTER (WHERE status = 'ATTENDING') AS attending,
+                   count(*) FILTER (WHERE status = 'NOT_ATTENDING') AS not_attending,
+                   count(*) FILTER (WHERE status = 'MAYBE') AS maybe
+            FROM attendances_archive
+            GROUP BY event_id
+        ) c
+        WHERE c.event_id = e.id
+        """
+    )
+    # 履歴を含む一覧のカーソルページング（event_date, id の順）用。eventsテーブルの同じインデックスと合わせて順序どおりに読み出す
+    op.create_index('ix_events_archive_event_date_id', 'events_archive', ['event_date', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_archive_event_date_id', table_name='events_archive')
+    op.drop_column('events_archive', 'maybe')
+    op.drop_column('events_archive', 'not_attending')
+    op.drop_column('events_archive', 'attending')
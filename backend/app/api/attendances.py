@@ -1,37 +1,118 @@
-from typing import List
+from typing import List, Literal, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 # データベースセッション、モデル、スキーマ、サービス、認証ヘルパーをインポート
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import create_session, get_db
+from app.core.etag import conditional_response, make_etag
+from app.core.instrumentation import InstrumentedRoute
+from app.core.replicas import read_source
+from app.core.response_cache import CachedResponse, cached_json_response, response_cache
+from app.core.serialization import dump_json, dump_rows, json_response
 from app.models import User
-from app.schemas import AttendanceCreate, AttendanceUpdate, AttendanceWithUser, AttendanceWithEvent
-from app.services.attendance import get_event_attendances, get_user_attendances, create_attendance, update_attendance, get_attendance
-from app.api.auth import get_current_user
+from app.schemas import AttendanceCreate, AttendanceUpdate, AttendanceWithUser, AttendanceWithEvent, AttendanceBatchRequest, AttendanceBatchResult, Principal
+from app.services.attendance import (
+    get_event_attendances, get_user_attendances, create_attendance, update_attendance,
+    batch_upsert_attendances, parse_attendance_import, iter_event_attendance_rows, format_attendance_export,
+    get_event_attendance_rows, get_user_attendance_rows, attendance_with_user_payload, attendance_with_event_payload,
+)
+from app.services.event import event_exists, get_event, get_event_version
+from app.api.auth import get_current_user, get_current_user_detached, get_read_db
 
 # APIRouterインスタンスを作成
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+# レスポンスキャッシュに保存するJSONを作成するためのシリアライザー
+attendance_list_adapter = TypeAdapter(List[AttendanceWithUser])
 
 
 @router.get("/events/{event_id}", response_model=List[AttendanceWithUser])
 def read_event_attendances(
     event_id: UUID, # パスパラメータからイベントIDを取得
-    db: Session = Depends(get_db), # データベースセッションの依存性注入
+    response: Response,
+    if_none_match: Optional[str] = Header(None), # 前回取得時のETag
+    include_history: bool = False, # イベントがアーカイブ済みの場合に、アーカイブした出欠を返す
+    db: Session = Depends(get_read_db), # 読み取り専用のデータベースセッションの依存性注入（レプリカ設定時はレプリカ）
     current_user: User = Depends(get_current_user) # 現在のユーザー情報の依存性注入
 ):
-    """指定されたイベントの出欠リストを取得します。"""
-    attendances = get_event_attendances(db, event_id=event_id)
-    return attendances
+    """指定されたイベントの出欠リストを取得します。内容が変わっていない場合は304を返します。"""
+    # 出欠のバージョン番号だけを確認し、変更がなければ出欠リストを読み込まずに304を返す
+    version = get_event_version(db, event_id=event_id)
+    if version is not None:
+        not_modified = conditional_response(if_none_match, make_etag("attendances", event_id, version[1]), response)
+        if not_modified is not None:
+            return not_modified
+
+    def compute() -> CachedResponse:
+        # 高速シリアライズモードと履歴を含む取得では、必要な列だけの行からorjsonでJSONを作成する
+        if settings.fast_serialization or include_history:
+            rows = get_event_attendance_rows(db, event_id=event_id, include_history=include_history)
+            return CachedResponse(dump_rows(attendance_with_user_payload, rows))
+        attendances = get_event_attendances(db, event_id=event_id)
+        return CachedResponse(dump_json(attendance_list_adapter, attendances))
+
+    kind = "attendances-history" if include_history else "attendances"
+    return cached_json_response(lambda: response_cache.event_key(kind, event_id), compute, response, read_source(db))
+
+
+# エクスポート形式ごとのContent-Type
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+# エクスポートの本文を生成するジェネレーター
+# レスポンスの送信中もカーソルを開いたままにする必要があるため、リクエストのセッションとは別に専用のセッションを使用する
+def _export_stream(event_id: UUID, file_format: str):
+    db = create_session()
+    try:
+        partitions = iter_event_attendance_rows(db, event_id=event_id, batch_size=settings.export_batch_size)
+        yield from format_attendance_export(partitions, file_format)
+    finally:
+        db.close()
+
+
+@router.get("/events/{event_id}/export")
+def export_event_attendances(
+    event_id: UUID, # パスパラメータからイベントIDを取得
+    format: Literal["csv", "ndjson"] = "csv", # エクスポート形式
+    current_user: Principal = Depends(get_current_user_detached) # 送信中にデータベースの接続を保持しない認証
+):
+    """指定されたイベントの出欠リストをCSVまたはNDJSONでストリーミング出力します。"""
+    # 送信中に保持する接続は _export_stream の専用セッションの1本だけにする
+    if not event_exists(event_id, current_user.email):
+        raise HTTPException(status_code=404, detail="Event not found")
+    body = _export_stream(event_id, format)
+    # クライアントが途中で切断した場合もジェネレーターを閉じ、専用セッションの接続をすぐにプールへ返却する
+    return export_response(body, event_id, format, close=body.close)
+
+
+# エクスポートのストリーミングレスポンスを作成
+# close: レスポンスの送信後（途中で切断された場合を含む）に本文のジェネレーターを閉じる関数
+def export_response(body, event_id: UUID, file_format: str, close) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="attendances-{event_id}.{file_format}"'},
+        background=BackgroundTask(close),
+    )
 
 
 @router.get("/my", response_model=List[AttendanceWithEvent])
 def read_my_attendances(
-    db: Session = Depends(get_db),
+    include_history: bool = False, # アーカイブ済み・アーカイブ対象期間の過去のイベントの出欠も含める
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """現在のユーザーの出欠リストを取得します。"""
+    # 高速シリアライズモードと履歴を含む取得では、response_modelによる検証を経由せずにJSONを返す
+    if settings.fast_serialization or include_history:
+        rows = get_user_attendance_rows(db, user_id=current_user.id, include_history=include_history)
+        return json_response(dump_rows(attendance_with_event_payload, rows))
     attendances = get_user_attendances(db, user_id=current_user.id)
     return attendances
 
@@ -54,15 +135,75 @@ def update_attendance_endpoint(
     current_user: User = Depends(get_current_user)
 ):
     """指定された出欠を更新します。出欠の所有者のみが更新できます。"""
-    db_attendance = get_attendance(db, attendance_id=attendance_id)
-    if db_attendance is None:
-        raise HTTPException(status_code=404, detail="Attendance not found")
-    
-    # 出欠の所有者であるかを確認
-    if db_attendance.user_id != current_user.id:
+    # 所有者であることの確認は更新と同じSQLで行う（存在しない場合は404、所有者でない場合は403）
+    return update_attendance(db=db, attendance_id=attendance_id, attendance=attendance, user_id=current_user.id)
+
+
+# イベント作成者であることを確認し、イベントを返す
+def _get_own_event(db: Session, event_id: UUID, current_user: User):
+    return check_event_owner(get_event(db, event_id=event_id), current_user)
+
+
+# 取得したイベント（存在しない場合はNone）の作成者が現在のユーザーであることを確認し、イベントを返す
+def check_event_owner(db_event, current_user: User):
+    if db_event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if db_event.creator_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
-    
-    return update_attendance(db=db, attendance_id=attendance_id, attendance=attendance)
\ No newline at end of file
+    return db_event
+
+
+# 一括登録の件数が上限以内であることを確認
+def check_batch_size(count: int):
+    if count > settings.attendance_batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many items (max {settings.attendance_batch_max_items})"
+        )
+
+
+@router.post("/events/{event_id}/batch", response_model=List[AttendanceBatchResult])
+def batch_attendances_endpoint(
+    event_id: UUID, # パスパラメータからイベントIDを取得
+    batch: AttendanceBatchRequest, # リクエストボディから一括登録データを取得
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """指定されたイベントの出欠を一括で登録・更新します。イベント作成者のみが実行できます。"""
+    _get_own_event(db, event_id, current_user)
+    check_batch_size(len(batch.items))
+    return batch_upsert_attendances(db, event_id=event_id, items=list(enumerate(batch.items)))
+
+
+@router.post("/events/{event_id}/import", response_model=List[AttendanceBatchResult])
+def import_attendances_endpoint(
+    event_id: UUID,
+    file: UploadFile = File(...), # 取り込むCSVまたはNDJSONファイル
+    format: Optional[Literal["csv", "ndjson"]] = Query(None), # ファイル形式（省略時はファイル名の拡張子から判定）
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """CSVまたはNDJSONファイルから、指定されたイベントの出欠を一括で登録・更新します。イベント作成者のみが実行できます。"""
+    _get_own_event(db, event_id, current_user)
+    items, results = read_import_file(file, format)
+    results.extend(batch_upsert_attendances(db, event_id=event_id, items=items))
+    return sorted(results, key=lambda result: result.index)
+
+
+# 取り込みファイルを読み込み、(出欠データのリスト, 変換できなかった行のエラー結果のリスト) を返す
+# file_format: ファイル形式（省略時はファイル名の拡張子から判定）
+def read_import_file(file: UploadFile, file_format: Optional[str]):
+    file_format = file_format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")
+
+    # ファイルを1行ずつ読み込み、変換できなかった行はその場でエラー結果にする
+    items, results = [], []
+    for index, item in parse_attendance_import(file.file, file_format):
+        if isinstance(item, str):
+            results.append(AttendanceBatchResult(index=index, result="error", detail=item))
+        else:
+            items.append((index, item))
+        check_batch_size(len(items) + len(results))
+    return items, results
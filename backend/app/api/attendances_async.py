@@ -0,0 +1,148 @@
+# 非同期モード（DATABASE_ASYNC）の出欠エンドポイント
+# パス・パラメーター・レスポンスは app.api.attendances と同じで、データベースへのアクセスを非同期セッションで行う
+from typing import List, Literal, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# データベースセッション、モデル、スキーマ、サービス、認証ヘルパーをインポート
+from app.core.config import settings
+from app.core.database import create_async_session, get_async_db
+from app.core.etag import conditional_response, make_etag
+from app.core.instrumentation import InstrumentedRoute
+from app.core.replicas import read_source
+from app.core.response_cache import CachedResponse, cached_json_response_async, response_cache
+from app.core.serialization import dump_json, dump_rows, json_response
+from app.models import User
+from app.schemas import AttendanceCreate, AttendanceUpdate, AttendanceWithUser, AttendanceWithEvent, AttendanceBatchRequest, AttendanceBatchResult, Principal
+from app.services.attendance import (
+    get_event_attendances_async, get_user_attendances_async, create_attendance_async, update_attendance_async,
+    batch_upsert_attendances_async, iter_event_attendance_rows_async, format_attendance_export_async,
+    get_event_attendance_rows_async, get_user_attendance_rows_async, attendance_with_user_payload, attendance_with_event_payload,
+)
+from app.services.event import event_exists_async, get_event_async, get_event_version_async
+from app.api.auth import get_current_user, get_current_user_detached, get_async_read_db
+from app.api.attendances import attendance_list_adapter, check_batch_size, check_event_owner, export_response, read_import_file
+
+# APIRouterインスタンスを作成
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.get("/events/{event_id}", response_model=List[AttendanceWithUser])
+async def read_event_attendances(
+    event_id: UUID, # パスパラメータからイベントIDを取得
+    response: Response,
+    if_none_match: Optional[str] = Header(None), # 前回取得時のETag
+    include_history: bool = False, # イベントがアーカイブ済みの場合に、アーカイブした出欠を返す
+    db: AsyncSession = Depends(get_async_read_db), # 読み取り専用のデータベースセッションの依存性注入（レプリカ設定時はレプリカ）
+    current_user: User = Depends(get_current_user) # 現在のユーザー情報の依存性注入
+):
+    """指定されたイベントの出欠リストを取得します。内容が変わっていない場合は304を返します。"""
+    version = await get_event_version_async(db, event_id=event_id)
+    if version is not None:
+        not_modified = conditional_response(if_none_match, make_etag("attendances", event_id, version[1]), response)
+        if not_modified is not None:
+            return not_modified
+
+    async def compute() -> CachedResponse:
+        if settings.fast_serialization or include_history:
+            rows = await get_event_attendance_rows_async(db, event_id=event_id, include_history=include_history)
+            return CachedResponse(dump_rows(attendance_with_user_payload, rows))
+        attendances = await get_event_attendances_async(db, event_id=event_id)
+        return CachedResponse(dump_json(attendance_list_adapter, attendances))
+
+    kind = "attendances-history" if include_history else "attendances"
+    return await cached_json_response_async(lambda: response_cache.event_key(kind, event_id), compute, response, read_source(db))
+
+
+# エクスポートの本文を生成する非同期ジェネレーター
+# レスポンスの送信中もカーソルを開いたままにする必要があるため、リクエストのセッションとは別に専用のセッションを使用する
+async def _export_stream(event_id: UUID, file_format: str):
+    async with create_async_session() as db:
+        partitions = await iter_event_attendance_rows_async(db, event_id=event_id, batch_size=settings.export_batch_size)
+        async for chunk in format_attendance_export_async(partitions, file_format):
+            yield chunk
+
+
+@router.get("/events/{event_id}/export")
+async def export_event_attendances(
+    event_id: UUID, # パスパラメータからイベントIDを取得
+    format: Literal["csv", "ndjson"] = "csv", # エクスポート形式
+    current_user: Principal = Depends(get_current_user_detached) # 送信中にデータベースの接続を保持しない認証
+):
+    """指定されたイベントの出欠リストをCSVまたはNDJSONでストリーミング出力します。"""
+    if not await event_exists_async(event_id, current_user.email):
+        raise HTTPException(status_code=404, detail="Event not found")
+    body = _export_stream(event_id, format)
+    # クライアントが途中で切断した場合もジェネレーターを閉じ、専用セッションの接続をすぐにプールへ返却する
+    return export_response(body, event_id, format, close=body.aclose)
+
+
+@router.get("/my", response_model=List[AttendanceWithEvent])
+async def read_my_attendances(
+    include_history: bool = False, # アーカイブ済み・アーカイブ対象期間の過去のイベントの出欠も含める
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """現在のユーザーの出欠リストを取得します。"""
+    if settings.fast_serialization or include_history:
+        rows = await get_user_attendance_rows_async(db, user_id=current_user.id, include_history=include_history)
+        return json_response(dump_rows(attendance_with_event_payload, rows))
+    return await get_user_attendances_async(db, user_id=current_user.id)
+
+
+@router.post("/", response_model=AttendanceWithEvent)
+async def create_attendance_endpoint(
+    attendance: AttendanceCreate, # リクエストボディから出欠作成データを取得
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """新しい出欠を登録します。"""
+    return await create_attendance_async(db=db, attendance=attendance, user_id=current_user.id)
+
+
+@router.put("/{attendance_id}", response_model=AttendanceWithEvent)
+async def update_attendance_endpoint(
+    attendance_id: UUID, # パスパラメータから出欠IDを取得
+    attendance: AttendanceUpdate, # リクエストボディから出欠更新データを取得
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """指定された出欠を更新します。出欠の所有者のみが更新できます。"""
+    return await update_attendance_async(db=db, attendance_id=attendance_id, attendance=attendance, user_id=current_user.id)
+
+
+# イベント作成者であることを確認し、イベントを返す
+async def _get_own_event(db: AsyncSession, event_id: UUID, current_user: User):
+    return check_event_owner(await get_event_async(db, event_id=event_id), current_user)
+
+
+@router.post("/events/{event_id}/batch", response_model=List[AttendanceBatchResult])
+async def batch_attendances_endpoint(
+    event_id: UUID, # パスパラメータからイベントIDを取得
+    batch: AttendanceBatchRequest, # リクエストボディから一括登録データを取得
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """指定されたイベントの出欠を一括で登録・更新します。イベント作成者のみが実行できます。"""
+    await _get_own_event(db, event_id, current_user)
+    check_batch_size(len(batch.items))
+    return await batch_upsert_attendances_async(db, event_id=event_id, items=list(enumerate(batch.items)))
+
+
+@router.post("/events/{event_id}/import", response_model=List[AttendanceBatchResult])
+async def import_attendances_endpoint(
+    event_id: UUID,
+    file: UploadFile = File(...), # 取り込むCSVまたはNDJSONファイル
+    format: Optional[Literal["csv", "ndjson"]] = Query(None), # ファイル形式（省略時はファイル名の拡張子から判定）
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """CSVまたはNDJSONファイルから、指定されたイベントの出欠を一括で登録・更新します。イベント作成者のみが実行できます。"""
+    await _get_own_event(db, event_id, current_user)
+    # アップロードされたファイルはディスクに退避されている場合があるため、読み込みはスレッドプールで行う
+    items, results = await run_in_threadpool(read_import_file, file, format)
+    results.extend(await batch_upsert_attendances_async(db, event_id=event_id, items=items))
+    return sorted(results, key=lambda result: result.index)
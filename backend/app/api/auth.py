@@ -3,54 +3,218 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 # 設定、データベース、セキュリティヘルパー、モデル、スキーマ、ユーザーサービスをインポート
 from app.core.config import settings
-from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token, verify_token
+from app.core.database import create_async_session, create_session, get_async_db, get_db
+from app.core.instrumentation import InstrumentedRoute, timed_dependency
+from app.core.replicas import create_async_read_session, create_read_session
+from app.core.security import verify_and_update_password, create_access_token, verify_token, decode_token, revoke_token
 from app.models import User
-from app.schemas import UserCreate, User as UserSchema, Token, LoginRequest
-from app.services.user import get_user_by_email, create_user
+from app.schemas import UserCreate, User as UserSchema, Token, Principal, LoginRequest
+from app.services.user import (
+    get_user_by_email, get_user_by_email_async, get_user_principal, get_user_principal_async, update_password_hash,
+    update_password_hash_async, create_user,
+)
 
 # APIRouterインスタンスを作成
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 # OAuth2PasswordBearerを初期化し、トークンURLを指定
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 
-# 現在のユーザーを取得するための依存性注入関数
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)], # OAuth2スキームからトークンを取得
-    db: Session = Depends(get_db) # データベースセッションの依存性注入
-) -> User:
-    credentials_exception = HTTPException(
+# 認証エラー時に返す例外を作成
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+# 現在のユーザーを取得するための依存性注入関数（同期モード）
+# 同期セッションでクエリを実行するため def で定義し、FastAPIのスレッドプール上で実行させる
+# （async def のままだとDBアクセスの間イベントループ全体がブロックされる）
+def _get_current_user_sync(
+    token: Annotated[str, Depends(oauth2_scheme)], # OAuth2スキームからトークンを取得
+    db: Session = Depends(get_db) # データベースセッションの依存性注入
+) -> Principal:
     # トークンを検証し、メールアドレスを取得
     email = verify_token(token)
     if email is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
-    # メールアドレスからユーザーを取得
-    user = get_user_by_email(db, email=email)
+    # メールアドレスからユーザーを取得（キャッシュにあればDBアクセスは発生しない）
+    user = get_user_principal(db, email=email)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+# 現在のユーザーを取得するための依存性注入関数（非同期モード）
+# asyncpgの非同期セッションを使用し、イベントループ上でブロックせずにユーザーを取得する
+async def _get_current_user_async(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    email = verify_token(token)
+    if email is None:
+        raise _credentials_exception()
+
+    user = await get_user_principal_async(db, email=email)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+# 現在のユーザーを取得するための依存性注入関数（ステートレスモード）
+# JWTに埋め込まれたクレームからPrincipalを組み立てるため、DBへの問い合わせは発生しない
+# ユーザーIDやプロフィール項目を含まない古い形式のトークンは認証エラーとする
+async def _get_current_user_stateless(
+    token: Annotated[str, Depends(oauth2_scheme)]
+) -> Principal:
+    payload = decode_token(token)
+    if payload is None:
+        raise _credentials_exception()
+    try:
+        return Principal(
+            id=payload["uid"],
+            email=payload["sub"],
+            name=payload["name"],
+            created_at=payload["created_at"],
+            updated_at=payload["updated_at"],
+        )
+    except (KeyError, ValueError):
+        raise _credentials_exception()
+
+
+# 設定（AUTH_STATELESS / DATABASE_ASYNC）に応じて使用する依存性注入関数を選択
+if settings.auth_stateless:
+    get_current_user = _get_current_user_stateless
+elif settings.database_async:
+    get_current_user = _get_current_user_async
+else:
+    get_current_user = _get_current_user_sync
+# 認証にかかった時間をリクエストの計測値（Server-Timingのauth）に記録する
+get_current_user = timed_dependency("auth", get_current_user)
+
+
+# 現在のユーザーを取得するための依存性注入関数（長時間のレスポンス向け・同期モード）
+# get_db のセッションはレスポンスの送信が終わるまで閉じられないため、専用のセッションで取得して返す前に閉じる
+def _get_current_user_detached_sync(
+    token: Annotated[str, Depends(oauth2_scheme)]
+) -> Principal:
+    email = verify_token(token)
+    if email is None:
+        raise _credentials_exception()
+    with create_session() as db:
+        user = get_user_principal(db, email=email)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+# 現在のユーザーを取得するための依存性注入関数（長時間のレスポンス向け・非同期モード）
+async def _get_current_user_detached_async(
+    token: Annotated[str, Depends(oauth2_scheme)]
+) -> Principal:
+    email = verify_token(token)
+    if email is None:
+        raise _credentials_exception()
+    async with create_async_session() as db:
+        user = await get_user_principal_async(db, email=email)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
 
+# SSEなど、レスポンスの送信中に接続を開いたままにするエンドポイント向けの依存性注入関数
+# データベースのセッション（プールの接続）をレスポンスの送信中に保持しない
+if settings.auth_stateless:
+    get_current_user_detached = _get_current_user_stateless
+elif settings.database_async:
+    get_current_user_detached = _get_current_user_detached_async
+else:
+    get_current_user_detached = _get_current_user_detached_sync
+get_current_user_detached = timed_dependency("auth", get_current_user_detached)
+
+
+# ORMのUserモデルが必要なエンドポイント向けの依存性注入関数
+# get_current_userはPrincipalを返すため、そのユーザーIDからUserを読み込む
+def get_current_db_user(
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> User:
+    user = db.get(User, current_user.id)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+
+# 読み取り専用エンドポイント向けのデータベースセッションの依存性注入関数
+# レプリカが設定されている場合はレプリカで読み取る。直前に書き込みを行ったユーザーはプライマリで読み取る
+def get_read_db(current_user: Principal = Depends(get_current_user)):
+    db = create_read_session(current_user.email)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# 読み取り専用エンドポイント向けの非同期データベースセッションの依存性注入関数（非同期モード用）
+async def get_async_read_db(current_user: Principal = Depends(get_current_user)):
+    async with await create_async_read_session(current_user.email) as db:
+        yield db
+
+
+# ユーザー情報をクレームに埋め込んだアクセストークンを作成
+# ステートレスモードでは、これらのクレームだけで現在のユーザーを組み立てる
+def create_user_access_token(user: User) -> str:
+    # アクセストークンの有効期限を設定
+    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
+    return create_access_token(
+        data={
+            "sub": user.email,
+            "uid": str(user.id),
+            "name": user.name,
+            "created_at": user.created_at.isoformat(),
+            "updated_at": user.updated_at.isoformat(),
+        },
+        expires_delta=access_token_expires,
+    )
+
+
 # ユーザー認証関数
 def authenticate_user(db: Session, email: str, password: str):
     user = get_user_by_email(db, email)
     if not user:
         return False # ユーザーが見つからない場合
-    if not verify_password(password, user.password_hash):
+    verified, new_hash = verify_and_update_password(password, user.password_hash)
+    if not verified:
         return False # パスワードが一致しない場合
+    if new_hash is not None:
+        # bcryptのコストが変更されている場合、新しいコストで再ハッシュした値を保存
+        update_password_hash(db, user, new_hash)
     return user # 認証成功
 
 
+# ユーザー認証関数（非同期セッション版）
+# パスワードの検証はハッシュ用プロセスの結果を待つため、イベントループをブロックしないようスレッドプールで待つ
+async def authenticate_user_async(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email_async(db, email)
+    if not user:
+        return False
+    verified, new_hash = await run_in_threadpool(verify_and_update_password, password, user.password_hash)
+    if not verified:
+        return False
+    if new_hash is not None:
+        await update_password_hash_async(db, user, new_hash)
+    return user
+
+
 @router.post("/register", response_model=UserSchema)
 def register(user: UserCreate, db: Session = Depends(get_db)):
     """新しいユーザーを登録します。"""
@@ -76,12 +240,8 @@ def login_for_access_token(
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    # アクセストークンの有効期限を設定
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     # アクセストークンを作成
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    access_token = create_user_access_token(user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -94,15 +254,21 @@ def login(login_request: LoginRequest, db: Session = Depends(get_db)):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
-    # アクセストークンの有効期限を設定
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     # アクセストークンを作成
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    access_token = create_user_access_token(user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+@router.post("/logout")
+def logout(token: Annotated[str, Depends(oauth2_scheme)]):
+    """現在のアクセストークンを失効させます。"""
+    payload = decode_token(token)
+    if payload is None:
+        raise _credentials_exception()
+    revoke_token(payload)
+    return {"message": "Logged out successfully"}
+
+
 @router.get("/me", response_model=UserSchema)
 def read_users_me(current_user: Annotated[User, Depends(get_current_user)]):
     """現在の認証済みユーザーの情報を取得します。"""
@@ -0,0 +1,64 @@
+# 非同期モード（DATABASE_ASYNC）の認証エンドポイント
+# パスとレスポンスは app.api.auth と同じで、データベースへのアクセスを非同期セッションで行う
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# データベースセッション、スキーマ、サービス、認証ヘルパーをインポート
+from app.core.database import get_async_db
+from app.core.instrumentation import InstrumentedRoute
+from app.schemas import UserCreate, User as UserSchema, Token, LoginRequest
+from app.services.user import get_user_by_email_async, create_user_async
+from app.api.auth import create_user_access_token, authenticate_user_async, logout, read_users_me
+
+# APIRouterインスタンスを作成
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.post("/register", response_model=UserSchema)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    """新しいユーザーを登録します。"""
+    db_user = await get_user_by_email_async(db, email=user.email)
+    if db_user:
+        raise HTTPException(
+            status_code=400,
+            detail="Email already registered" # メールアドレスが既に登録されている場合
+        )
+    return await create_user_async(db=db, user=user)
+
+
+@router.post("/token", response_model=Token)
+async def login_for_access_token(
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], # フォームデータからユーザー名とパスワードを取得
+    db: AsyncSession = Depends(get_async_db)
+):
+    """OAuth2パスワードフローを使用してアクセストークンを発行します。"""
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = create_user_access_token(user)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post("/login", response_model=Token)
+async def login(login_request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    """ユーザーのメールアドレスとパスワードを使用してログインし、アクセストークンを発行します。"""
+    user = await authenticate_user_async(db, login_request.email, login_request.password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password"
+        )
+    access_token = create_user_access_token(user)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+# データベースにアクセスしないエンドポイントは同期モードと同じ関数を登録する
+router.post("/logout")(logout)
+router.get("/me", response_model=UserSchema)(read_users_me)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+# データベースセッション、スキーマ、サービス、認証ヘルパーをインポート
+from app.core.instrumentation import InstrumentedRoute
+from app.core.serialization import dump_payload, json_response
+from app.schemas import Dashboard, Principal
+from app.services.dashboard import get_dashboard_event_rows, dashboard_payload
+from app.api.auth import get_current_user, get_read_db
+
+# APIRouterインスタンスを作成
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+# パスは末尾のスラッシュなしの /dashboard（リダイレクトによる往復を増やさない）
+@router.get("", response_model=Dashboard)
+def read_dashboard(
+    limit: int = Query(20, ge=1, le=100), # 表示する今後のイベントの最大数
+    db: Session = Depends(get_read_db), # 読み取り専用のデータベースセッションの依存性注入（レプリカ設定時はレプリカ）
+    current_user: Principal = Depends(get_current_user) # 現在のユーザー情報の依存性注入
+):
+    """現在のユーザー・今後のイベントと出欠の集計・各イベントへの自分の出欠をまとめて取得します。"""
+    # /auth/me・/events/・/attendances/my の3回のリクエストの代わりに、1つのセッションで1回のクエリを実行する
+    # ユーザーごとに内容が異なるためレスポンスキャッシュは使用せず、行からorjsonで直接JSONを作成する
+    rows = get_dashboard_event_rows(db, user_id=current_user.id, limit=limit)
+    return json_response(dump_payload(dashboard_payload, current_user, rows))
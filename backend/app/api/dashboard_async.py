@@ -0,0 +1,25 @@
+# 非同期モード（DATABASE_ASYNC）のダッシュボードエンドポイント
+# パス・パラメーター・レスポンスは app.api.dashboard と同じで、データベースへのアクセスを非同期セッションで行う
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# データベースセッション、スキーマ、サービス、認証ヘルパーをインポート
+from app.core.instrumentation import InstrumentedRoute
+from app.core.serialization import dump_payload, json_response
+from app.schemas import Dashboard, Principal
+from app.services.dashboard import get_dashboard_event_rows_async, dashboard_payload
+from app.api.auth import get_current_user, get_async_read_db
+
+# APIRouterインスタンスを作成
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.get("", response_model=Dashboard)
+async def read_dashboard(
+    limit: int = Query(20, ge=1, le=100), # 表示する今後のイベントの最大数
+    db: AsyncSession = Depends(get_async_read_db), # 読み取り専用のデータベースセッションの依存性注入（レプリカ設定時はレプリカ）
+    current_user: Principal = Depends(get_current_user) # 現在のユーザー情報の依存性注入
+):
+    """現在のユーザー・今後のイベントと出欠の集計・各イベントへの自分の出欠をまとめて取得します。"""
+    rows = await get_dashboard_event_rows_async(db, user_id=current_user.id, limit=limit)
+    return json_response(dump_payload(dashboard_payload, current_user, rows))
@@ -1,43 +1,160 @@
-from typing import List, Annotated
+import asyncio
+import json
+from datetime import datetime
+from typing import List, Annotated, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 # データベースセッション、モデル、スキーマ、サービス、認証ヘルパーをインポート
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.etag import conditional_response, make_etag
+from app.core.instrumentation import InstrumentedRoute
+from app.core.pubsub import broker
+from app.core.replicas import read_source
+from app.core.response_cache import CachedResponse, cached_json_response, response_cache
+from app.core.serialization import dump_json, dump_rows
 from app.models import User, Event
-from app.schemas import EventCreate, EventUpdate, Event as EventSchema, EventWithAttendances
-from app.services.event import get_events, get_event, create_event, update_event, delete_event
-from app.api.auth import get_current_user
+from app.schemas import EventCreate, EventUpdate, Event as EventSchema, EventWithAttendances, Principal
+from app.services.event import encode_event_cursor, event_exists, event_row_payload, get_events, get_event_rows, get_event_version, get_event_with_attendances, create_event, update_event, delete_event
+from app.api.auth import get_current_user, get_current_user_detached, get_read_db
 
 # APIRouterインスタンスを作成
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+# イベント一覧の1ページの最大件数
+# これより大きい limit は拒否せずにこの件数に切り詰め、続きは X-Next-Cursor で取得させる
+MAX_EVENTS_PAGE_SIZE = 100
+
+# レスポンスキャッシュに保存するJSONを作成するためのシリアライザー
+event_list_adapter = TypeAdapter(List[EventSchema])
+event_detail_adapter = TypeAdapter(EventWithAttendances)
 
 
 @router.get("/", response_model=List[EventSchema])
 def read_events(
-    skip: int = 0, # スキップするレコード数
-    limit: int = 100, # 取得するレコードの最大数
-    db: Session = Depends(get_db), # データベースセッションの依存性注入
+    response: Response,
+    skip: int = Query(0, ge=0), # スキップするレコード数（cursor未指定時のみ有効）
+    limit: int = Query(100, ge=1), # 取得するレコードの最大数（MAX_EVENTS_PAGE_SIZE件を超える場合は切り詰める）
+    cursor: Optional[str] = None, # 前ページのレスポンスヘッダー X-Next-Cursor の値
+    date_from: Optional[datetime] = None, # この日時以降に開催されるイベントに絞り込む
+    date_to: Optional[datetime] = None, # この日時より前に開催されるイベントに絞り込む
+    creator_id: Optional[UUID] = None, # 作成者で絞り込む
+    upcoming: bool = False, # 今後開催されるイベントのみに絞り込む
+    include_history: bool = False, # アーカイブ済み・アーカイブ対象期間の過去のイベントも含める
+    db: Session = Depends(get_read_db), # 読み取り専用のデータベースセッションの依存性注入（レプリカ設定時はレプリカ）
     current_user: User = Depends(get_current_user) # 現在のユーザー情報の依存性注入
 ):
-    """イベントのリストを取得します。"""
-    events = get_events(db, skip=skip, limit=limit)
-    return events
+    """イベントのリストを開催日時順に取得します。続きのページがある場合は X-Next-Cursor ヘッダーにカーソルを返します。"""
+    limit = min(limit, MAX_EVENTS_PAGE_SIZE)
+    # 高速シリアライズモードと履歴を含む一覧では、ORMオブジェクトの代わりに必要な列だけの行を取得する
+    use_rows = settings.fast_serialization or include_history
+
+    def compute() -> CachedResponse:
+        filters = dict(date_from=date_from, date_to=date_to, creator_id=creator_id, upcoming=upcoming)
+        try:
+            if use_rows:
+                events = get_event_rows(db, skip=skip, limit=limit, cursor=cursor, include_history=include_history, **filters)
+            else:
+                events = get_events(db, skip=skip, limit=limit, cursor=cursor, **filters)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return event_list_body(events, limit, use_rows)
+
+    # ページ・絞り込み条件ごとにキャッシュする
+    params = f"{skip}|{limit}|{cursor}|{date_from}|{date_to}|{creator_id}|{upcoming}|{include_history}"
+    return cached_json_response(lambda: response_cache.list_key("events", params), compute, response, read_source(db))
+
+
+# イベント一覧のレスポンスの本文とヘッダーを作成
+# use_rows: events が列の射影の行（get_event_rows）かどうか
+def event_list_body(events, limit: int, use_rows: bool) -> CachedResponse:
+    headers = {}
+    # ページが埋まっている場合は続きがある可能性があるため、次ページのカーソルを返す
+    if len(events) == limit:
+        headers["X-Next-Cursor"] = encode_event_cursor(events[-1])
+    if use_rows:
+        body = dump_rows(event_row_payload, events)
+    else:
+        body = dump_json(event_list_adapter, events)
+    return CachedResponse(body, headers)
 
 
 @router.get("/{event_id}", response_model=EventWithAttendances)
 def read_event(
     event_id: UUID, # パスパラメータからイベントIDを取得
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(None), # 前回取得時のETag
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """指定されたイベントの詳細を取得します。"""
-    event = get_event(db, event_id=event_id)
-    if event is None:
+    """指定されたイベントの詳細を取得します。内容が変わっていない場合は304を返します。"""
+    # イベントと出欠のバージョンだけを確認し、変更がなければ詳細を読み込まずに304を返す
+    version = get_event_version(db, event_id=event_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    not_modified = conditional_response(if_none_match, event_etag(event_id, version), response)
+    if not_modified is not None:
+        return not_modified
+
+    def compute() -> CachedResponse:
+        event = get_event_with_attendances(db, event_id=event_id)
+        if event is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return CachedResponse(dump_json(event_detail_adapter, event))
+
+    return cached_json_response(lambda: response_cache.event_key("event", event_id), compute, response, read_source(db))
+
+
+# イベントの詳細のETagを作成（version は get_event_version の戻り値）
+def event_etag(event_id: UUID, version) -> str:
+    # 更新日時が未設定（NULL）の古い行でも失敗しないよう、空文字列としてETagに含める
+    updated_at = version[0].isoformat() if version[0] else ""
+    return make_etag("event", event_id, updated_at, version[1])
+
+
+@router.get("/{event_id}/stream")
+async def stream_event_changes(
+    event_id: UUID, # パスパラメータからイベントIDを取得
+    request: Request,
+    current_user: Principal = Depends(get_current_user_detached) # 配信中にデータベースの接続を保持しない認証
+):
+    """指定されたイベントの出欠・イベントの変更をServer-Sent Eventsで配信します。"""
+    if not await run_in_threadpool(event_exists, event_id, current_user.email):
         raise HTTPException(status_code=404, detail="Event not found")
-    return event
+    return event_stream_response(event_id, request)
+
+
+# イベントの変更をServer-Sent Eventsで配信するレスポンスを作成（存在の確認は呼び出し元で行う）
+def event_stream_response(event_id: UUID, request: Request) -> StreamingResponse:
+    subscription = broker.subscribe(f"event:{event_id}")
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n" # 切断時の再接続間隔（ミリ秒）
+            while not await request.is_disconnected():
+                message = await subscription.get(timeout=settings.pubsub_heartbeat_seconds)
+                if message is None:
+                    yield ": keep-alive\n\n" # 中継サーバーに接続を切られないよう定期的にコメントを送る
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
+                if subscription.closed:
+                    break # サーバーの終了時は接続を閉じ、クライアントに別のワーカーへ再接続させる
+        except asyncio.CancelledError:
+            pass
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, # プロキシでのバッファリングを無効化
+    )
 
 
 @router.post("/", response_model=EventSchema)
@@ -58,18 +175,8 @@ def update_event_endpoint(
     current_user: User = Depends(get_current_user)
 ):
     """指定されたイベントを更新します。イベント作成者のみが更新できます。"""
-    db_event = get_event(db, event_id=event_id)
-    if db_event is None:
-        raise HTTPException(status_code=404, detail="Event not found")
-    
-    # イベント作成者であるかを確認
-    if db_event.creator_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    
-    return update_event(db=db, event_id=event_id, event=event)
+    # 作成者であることの確認は更新と同じSQLで行う（存在しない場合は404、作成者でない場合は403）
+    return update_event(db=db, event_id=event_id, event=event, user_id=current_user.id)
 
 
 @router.delete("/{event_id}")
@@ -79,16 +186,6 @@ def delete_event_endpoint(
     current_user: User = Depends(get_current_user)
 ):
     """指定されたイベントを削除します。イベント作成者のみが削除できます。"""
-    db_event = get_event(db, event_id=event_id)
-    if db_event is None:
-        raise HTTPException(status_code=404, detail="Event not found")
-    
-    # イベント作成者であるかを確認
-    if db_event.creator_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    
-    delete_event(db=db, event_id=event_id)
+    # 作成者であることの確認は削除と同じSQLで行う（存在しない場合は404、作成者でない場合は403）
+    delete_event(db=db, event_id=event_id, user_id=current_user.id)
     return {"message": "Event deleted successfully"}
\ No newline at end of file
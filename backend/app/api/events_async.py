@@ -0,0 +1,129 @@
+# 非同期モード（DATABASE_ASYNC）のイベントエンドポイント
+# パス・パラメーター・レスポンスは app.api.events と同じで、データベースへのアクセスを非同期セッションで行う
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# データベースセッション、スキーマ、サービス、認証ヘルパーをインポート
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.etag import conditional_response
+from app.core.instrumentation import InstrumentedRoute
+from app.core.replicas import read_source
+from app.core.response_cache import CachedResponse, cached_json_response_async, response_cache
+from app.core.serialization import dump_json
+from app.schemas import EventCreate, EventUpdate, Event as EventSchema, EventWithAttendances, Principal
+from app.services.event import (
+    event_exists_async, get_events_async, get_event_rows_async, get_event_version_async, get_event_with_attendances_async,
+    create_event_async, update_event_async, delete_event_async,
+)
+from app.api.auth import get_current_user, get_current_user_detached, get_async_read_db
+from app.api.events import MAX_EVENTS_PAGE_SIZE, event_detail_adapter, event_etag, event_list_body, event_stream_response
+
+# APIRouterインスタンスを作成
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.get("/", response_model=List[EventSchema])
+async def read_events(
+    response: Response,
+    skip: int = Query(0, ge=0), # スキップするレコード数（cursor未指定時のみ有効）
+    limit: int = Query(100, ge=1), # 取得するレコードの最大数（MAX_EVENTS_PAGE_SIZE件を超える場合は切り詰める）
+    cursor: Optional[str] = None, # 前ページのレスポンスヘッダー X-Next-Cursor の値
+    date_from: Optional[datetime] = None, # この日時以降に開催されるイベントに絞り込む
+    date_to: Optional[datetime] = None, # この日時より前に開催されるイベントに絞り込む
+    creator_id: Optional[UUID] = None, # 作成者で絞り込む
+    upcoming: bool = False, # 今後開催されるイベントのみに絞り込む
+    include_history: bool = False, # アーカイブ済み・アーカイブ対象期間の過去のイベントも含める
+    db: AsyncSession = Depends(get_async_read_db), # 読み取り専用のデータベースセッションの依存性注入（レプリカ設定時はレプリカ）
+    current_user: Principal = Depends(get_current_user) # 現在のユーザー情報の依存性注入
+):
+    """イベントのリストを開催日時順に取得します。続きのページがある場合は X-Next-Cursor ヘッダーにカーソルを返します。"""
+    limit = min(limit, MAX_EVENTS_PAGE_SIZE)
+    use_rows = settings.fast_serialization or include_history
+
+    async def compute() -> CachedResponse:
+        filters = dict(date_from=date_from, date_to=date_to, creator_id=creator_id, upcoming=upcoming)
+        try:
+            if use_rows:
+                events = await get_event_rows_async(db, skip=skip, limit=limit, cursor=cursor, include_history=include_history, **filters)
+            else:
+                events = await get_events_async(db, skip=skip, limit=limit, cursor=cursor, **filters)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return event_list_body(events, limit, use_rows)
+
+    params = f"{skip}|{limit}|{cursor}|{date_from}|{date_to}|{creator_id}|{upcoming}|{include_history}"
+    return await cached_json_response_async(lambda: response_cache.list_key("events", params), compute, response, read_source(db))
+
+
+@router.get("/{event_id}", response_model=EventWithAttendances)
+async def read_event(
+    event_id: UUID, # パスパラメータからイベントIDを取得
+    response: Response,
+    if_none_match: Optional[str] = Header(None), # 前回取得時のETag
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """指定されたイベントの詳細を取得します。内容が変わっていない場合は304を返します。"""
+    version = await get_event_version_async(db, event_id=event_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    not_modified = conditional_response(if_none_match, event_etag(event_id, version), response)
+    if not_modified is not None:
+        return not_modified
+
+    async def compute() -> CachedResponse:
+        event = await get_event_with_attendances_async(db, event_id=event_id)
+        if event is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return CachedResponse(dump_json(event_detail_adapter, event))
+
+    return await cached_json_response_async(lambda: response_cache.event_key("event", event_id), compute, response, read_source(db))
+
+
+@router.get("/{event_id}/stream")
+async def stream_event_changes(
+    event_id: UUID, # パスパラメータからイベントIDを取得
+    request: Request,
+    current_user: Principal = Depends(get_current_user_detached) # 配信中にデータベースの接続を保持しない認証
+):
+    """指定されたイベントの出欠・イベントの変更をServer-Sent Eventsで配信します。"""
+    if not await event_exists_async(event_id, current_user.email):
+        raise HTTPException(status_code=404, detail="Event not found")
+    return event_stream_response(event_id, request)
+
+
+@router.post("/", response_model=EventSchema)
+async def create_event_endpoint(
+    event: EventCreate, # リクエストボディからイベント作成データを取得
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """新しいイベントを作成します。"""
+    return await create_event_async(db=db, event=event, user_id=current_user.id)
+
+
+@router.put("/{event_id}", response_model=EventSchema)
+async def update_event_endpoint(
+    event_id: UUID, # パスパラメータからイベントIDを取得
+    event: EventUpdate, # リクエストボディからイベント更新データを取得
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """指定されたイベントを更新します。イベント作成者のみが更新できます。"""
+    return await update_event_async(db=db, event_id=event_id, event=event, user_id=current_user.id)
+
+
+@router.delete("/{event_id}")
+async def delete_event_endpoint(
+    event_id: UUID, # パスパラメータからイベントIDを取得
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """指定されたイベントを削除します。イベント作成者のみが削除できます。"""
+    await delete_event_async(db=db, event_id=event_id, user_id=current_user.id)
+    return {"message": "Event deleted successfully"}
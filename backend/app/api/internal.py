@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends
+
+# データベースのプール統計ヘルパーをインポート
+from app.core.database import get_pool_stats
+from app.core.etag import get_etag_stats
+from app.core.instrumentation import InstrumentedRoute
+from app.core.pubsub import broker
+from app.core.rate_limit import get_rate_limit_stats
+from app.core.replicas import replica_router
+from app.core.response_cache import response_cache
+from app.core.security import require_internal_token
+from app.jobs.queue import job_stats
+from app.services.user import user_principal_cache
+
+# APIRouterインスタンスを作成
+# 運用監視向けの内部エンドポイントのため、OpenAPIドキュメントには含めず、共有シークレットを持つリクエストだけに応答する
+router = APIRouter(include_in_schema=False, route_class=InstrumentedRoute, dependencies=[Depends(require_internal_token)])
+
+
+@router.get("/pool")
+def read_pool_stats():
+    """データベースコネクションプールの統計情報を取得します。"""
+    return get_pool_stats()
+
+
+@router.get("/cache")
+def read_cache_stats():
+    """認証済みユーザーキャッシュ、レスポンスキャッシュ、条件付きGETの統計情報を取得します。"""
+    return {
+        "user_principal": user_principal_cache.stats(),
+        "response": response_cache.stats(),
+        "conditional_get": get_etag_stats(),
+    }
+
+
+@router.get("/pubsub")
+def read_pubsub_stats():
+    """リアルタイム配信の購読者数・配信数の統計情報を取得します。"""
+    return broker.stats()
+
+
+@router.get("/replicas")
+def read_replica_stats():
+    """読み取りレプリカの遅延・振り分け件数の統計情報を取得します。"""
+    return replica_router.stats()
+
+
+@router.get("/admission")
+def read_admission_stats():
+    """レート制限・同時実行数の制限で拒否したリクエスト数と、処理中のリクエスト数を取得します。"""
+    return get_rate_limit_stats()
+
+
+@router.get("/jobs")
+def read_job_stats():
+    """バックグラウンドジョブの状態・種類ごとの件数（定期的に集計した値）と、このプロセスで実行したジョブの統計情報を取得します。"""
+    return job_stats()
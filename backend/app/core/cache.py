@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from .metrics import Counter
+
+
+# 有効期限（TTL）付きのLRUキャッシュ
+# スレッドプール上の同期エンドポイントから同時にアクセスされるため、すべての操作をロックで保護する
+# 件数が上限を超えた場合は最も長く使われていないエントリから破棄する
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict() # キー -> (有効期限, 値)
+        self.hits = Counter()
+        self.misses = Counter()
+        self.evictions = Counter()
+
+    # キーに対応する値を取得（存在しない・期限切れの場合はNone）
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key) # 最近使われたエントリとして末尾に移動
+                self.hits.inc()
+                return entry[1]
+            if entry is not None:
+                del self._data[key] # 期限切れのエントリを削除
+        self.misses.inc()
+        return None
+
+    # キーに値を設定（ttlを省略した場合はキャッシュ全体の有効期限を使用）
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return # キャッシュが無効化されている場合
+        expires_at = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False) # 最も古いエントリを破棄
+                self.evictions.inc()
+
+    # キーを無効化
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    # すべてのエントリを破棄
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    # キャッシュの統計情報を取得
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+            "evictions": self.evictions.value,
+        }
@@ -1,19 +1,177 @@
-from sqlalchemy import create_engine
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 # アプリケーション設定をインポート
-from .config import settings
+from .config import settings, to_async_url
+from .instrumentation import record_pool_wait, record_statement
+from .metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# コネクションプールのメトリクス
+# 接続のチェックアウト待ち時間（秒）とプールタイムアウトの発生回数を記録する
+pool_wait_seconds = Histogram()
+pool_timeouts = Counter()
+
+
+# チェックアウト待ち時間を計測するQueuePool
+# プールが枯渇している場合、_do_getは接続が返却されるかタイムアウトするまで待機する
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_timeouts.inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            pool_wait_seconds.observe(elapsed)
+            record_pool_wait(elapsed) # 処理中のリクエストの計測値にも加算
+
+
+# 非同期エンジン用のチェックアウト待ち時間を計測するプール
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    pass
+
+
+# 設定値からエンジンの共通オプションを作成
+def _engine_options() -> dict:
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+# ステートメントタイムアウトを設定する接続引数を作成
+def _connect_args(async_driver: bool = False) -> dict:
+    if settings.db_statement_timeout_ms <= 0:
+        return {}
+    if async_driver:
+        # asyncpgはサーバー設定をserver_settingsで受け取る
+        return {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
+    # psycopg2は接続時のoptionsでサーバー設定を渡す
+    return {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+
+
+# エンジンにSQL実行の計測フックを登録
+# 各ステートメントの実行時間を処理中のリクエストの計測値（SQLの数・DB時間）に加算し、遅いクエリを記録する
+def _instrument_engine(sync_engine) -> None:
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record_statement(statement, time.perf_counter() - context._query_start)
+
 
 # データベースエンジンを作成
-# settings.database_urlからデータベース接続文字列を取得
-engine = create_engine(settings.database_url)
+# 接続先を省略した場合はsettings.database_url（プライマリ）に接続する
+def _create_engine(url: Optional[str] = None):
+    engine = create_engine(
+        url or settings.database_url,
+        poolclass=InstrumentedQueuePool,
+        connect_args=_connect_args(),
+        **_engine_options(),
+    )
+    _instrument_engine(engine)
+    return engine
+
+
+# asyncpgを使用する非同期エンジンを作成
+# 接続先を省略した場合はsettings.database_url（プライマリ）に接続する
+def _create_async_engine(url: Optional[str] = None):
+    engine = create_async_engine(
+        to_async_url(url) if url else settings.async_database_url,
+        poolclass=InstrumentedAsyncQueuePool,
+        connect_args=_connect_args(async_driver=True),
+        **_engine_options(),
+    )
+    _instrument_engine(engine.sync_engine)
+    return engine
+
+
+# プロセスごとのエンジン
+# gunicornのpreload_appではアプリケーションをマスタープロセスで読み込んでからワーカーをforkするため、
+# モジュールの読み込み時にエンジンを作成すると、プール内の接続（ソケット）が複数のワーカーで共有されてしまう
+# エンジンは最初に使用したプロセスで作成し、作成したプロセスIDと異なるプロセスから使用された場合は作り直す
+_engines: dict = {} # "sync" / "async" / "replica:{番号}" / "async-replica:{番号}" -> (プロセスID, エンジン)
+_engines_lock = threading.Lock()
+
+
+def _get_process_engine(kind: str, factory):
+    pid = os.getpid()
+    entry = _engines.get(kind)
+    if entry is not None and entry[0] == pid:
+        return entry[1]
+    with _engines_lock:
+        entry = _engines.get(kind)
+        if entry is not None and entry[0] == pid:
+            return entry[1]
+        if entry is not None:
+            # fork元から引き継いだエンジン
+            # 親プロセスが使用中の接続を閉じないよう、close=Falseでプールを切り離すだけにする
+            inherited = entry[1]
+            getattr(inherited, "sync_engine", inherited).dispose(close=False)
+        engine = factory()
+        _engines[kind] = (pid, engine)
+        return engine
+
+
+# このプロセスの同期エンジンを取得
+def get_engine():
+    return _get_process_engine("sync", _create_engine)
+
+
+# このプロセスのレプリカ用エンジンを取得（indexはsettings.replica_urlsの位置）
+def get_replica_engine(index: int):
+    return _get_process_engine(f"replica:{index}", lambda: _create_engine(settings.replica_urls[index]))
+
+
+# このプロセスの非同期エンジンを取得（非同期モードの場合のみ使用する）
+def get_async_engine():
+    return _get_process_engine("async", _create_async_engine)
+
+
+# このプロセスのレプリカ用の非同期エンジンを取得（非同期モードの場合のみ使用する）
+def get_async_replica_engine(index: int):
+    return _get_process_engine(f"async-replica:{index}", lambda: _create_async_engine(settings.replica_urls[index]))
+
 
 # データベースセッションクラスを作成
 # autocommit=False: トランザクションを手動でコミットする必要がある
 # autoflush=False: クエリ実行時に自動的にフラッシュしない
-# bind=engine: 作成したエンジンにバインド
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# エンジンはプロセスごとに異なるため、セッションの作成時にbindで指定する（create_session）
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# 非同期モードで使用するセッションクラス
+# expire_on_commit=False: コミット後に属性へアクセスしても暗黙のI/Oが発生しないようにする
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+# このプロセスのエンジンにバインドしたセッションを作成
+def create_session() -> Session:
+    return SessionLocal(bind=get_engine())
+
+
+# このプロセスの非同期エンジンにバインドした非同期セッションを作成
+def create_async_session() -> AsyncSession:
+    return AsyncSessionLocal(bind=get_async_engine())
+
 
 # データベースモデルのベースクラスを作成
 # このBaseクラスを継承して、データベーステーブルに対応するPythonクラスを定義する
@@ -23,8 +181,86 @@ Base = declarative_base()
 # データベースセッションを取得するための依存性注入関数
 # FastAPIのDependsで使用される
 def get_db():
-    db = SessionLocal() # 新しいセッションを作成
+    db = create_session() # 新しいセッションを作成
     try:
         yield db # セッションを呼び出し元に提供
     finally:
-        db.close() # セッションを閉じる（リソース解放）
\ No newline at end of file
+        db.close() # セッションを閉じる（リソース解放）
+
+
+# 非同期データベースセッションを取得するための依存性注入関数
+# async def のエンドポイント・依存関数から使用し、イベントループをブロックせずにクエリを実行する
+async def get_async_db():
+    async with create_async_session() as db:
+        yield db
+
+
+# コネクションプールの現在の状態とメトリクスを取得
+# 非同期モードでは、リクエストの処理に使用する非同期エンジンのプールの状態を返す
+def get_pool_stats() -> dict:
+    pool = get_async_engine().pool if settings.database_async else get_engine().pool
+    return {
+        "size": pool.size(), # 設定上のプールサイズ
+        "checked_in": pool.checkedin(), # プール内で待機中の接続数
+        "checked_out": pool.checkedout(), # 使用中の接続数
+        "overflow": pool.overflow(), # プールサイズを超えて作成されている接続数（負の値は未作成分）
+        "timeouts": pool_timeouts.value,
+        "wait_seconds": pool_wait_seconds.snapshot(),
+    }
+
+
+# データベースに接続できるようになるまで待つ（起動時に使用）
+# コンテナの同時起動などでデータベースの準備が遅れても、接続できるまで間隔を延ばしながら再試行する
+def wait_for_database(timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    delay = 0.25
+    while True:
+        try:
+            with get_engine().connect() as connection:
+                connection.execute(text("SELECT 1"))
+            return
+        except Exception as exc:
+            if time.monotonic() + delay > deadline:
+                raise
+            logger.warning("database is not ready (%s), retrying in %.1fs", exc, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+
+# プールに接続を事前に作成しておく（起動時に使用）
+# 最初のリクエストが接続の確立（TCP・認証）を待たないよう、指定した数の接続を同時にチェックアウトしてから返却する
+def warm_up_pool(connections: int) -> int:
+    engine = get_engine()
+    opened = []
+    try:
+        for _ in range(max(min(connections, settings.db_pool_size), 0)):
+            opened.append(engine.connect())
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+# 非同期エンジンのプールに接続を事前に作成しておく
+async def warm_up_async_pool(connections: int) -> int:
+    engine = get_async_engine()
+    opened = []
+    try:
+        for _ in range(max(min(connections, settings.db_pool_size), 0)):
+            opened.append(await engine.connect().start())
+    finally:
+        for connection in opened:
+            await connection.close()
+    return len(opened)
+
+
+# このプロセスのエンジンの接続をすべて閉じる（終了時に使用）
+async def dispose_engines() -> None:
+    with _engines_lock:
+        entries = [entry for entry in _engines.values() if entry[0] == os.getpid()]
+        _engines.clear()
+    for _, engine in entries:
+        if hasattr(engine, "sync_engine"):
+            await engine.dispose()
+        else:
+            engine.dispose()
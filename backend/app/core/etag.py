@@ -0,0 +1,42 @@
+from typing import Optional
+
+from fastapi import Response
+
+from .metrics import Counter
+
+# 条件付きGETのメトリクス
+# 304で応答できた件数と、本文を生成して返した件数を記録する
+etag_hits = Counter()
+etag_misses = Counter()
+
+
+# 値の組み合わせから弱いETagを作成
+def make_etag(*parts) -> str:
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+# If-None-Match ヘッダーがETagと一致するかを確認（弱い比較）
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return etag in candidates or etag[2:] in candidates
+
+
+# 条件付きGETを処理
+# ETagが一致する場合は304レスポンスを返し、一致しない場合はレスポンスにETagを設定してNoneを返す
+def conditional_response(if_none_match: Optional[str], etag: str, response: Response) -> Optional[Response]:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"} # ブラウザに毎回再検証させる
+    if etag_matches(if_none_match, etag):
+        etag_hits.inc()
+        return Response(status_code=304, headers=headers)
+    etag_misses.inc()
+    response.headers.update(headers)
+    return None
+
+
+# 条件付きGETの統計情報を取得
+def get_etag_stats() -> dict:
+    return {"not_modified": etag_hits.value, "full_responses": etag_misses.value}
@@ -0,0 +1,227 @@
+import asyncio
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+
+from .config import settings
+from .metrics import Counter, HistogramFamily, format_counter
+
+# 遅いクエリのログ出力先
+slow_query_logger = logging.getLogger("app.slow_query")
+
+# ルート（メソッド・パスのテンプレート）ごとのリクエストメトリクス
+# ルートに一致しなかったリクエストは、ラベルの種類が増えすぎないよう route="unmatched" にまとめる
+_LABELS = ("method", "route")
+request_duration_seconds = HistogramFamily("http_request_duration_seconds", "Total time until the response headers are sent.", _LABELS)
+request_db_seconds = HistogramFamily("http_request_db_seconds", "Time spent executing SQL statements.", _LABELS)
+request_db_statements = HistogramFamily(
+    "http_request_db_statements", "Number of SQL statements executed.", _LABELS, buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+request_pool_wait_seconds = HistogramFamily("http_request_pool_wait_seconds", "Time spent waiting for a pooled connection.", _LABELS)
+request_auth_seconds = HistogramFamily("http_request_auth_seconds", "Time spent authenticating the current user.", _LABELS)
+request_handler_seconds = HistogramFamily("http_request_handler_seconds", "Time spent in the endpoint function, excluding serialization.", _LABELS)
+request_serialization_seconds = HistogramFamily("http_request_serialization_seconds", "Time spent validating and encoding the response body.", _LABELS)
+slow_queries = Counter()
+
+
+# 1リクエスト分の計測値
+# ミドルウェアがリクエストごとに作成してコンテキスト変数に設定し、エンジンのイベントや各処理が加算する
+# スレッドプールで実行される同期エンドポイントにもコンテキストが引き継がれるため、同じオブジェクトに加算される
+class RequestTimings:
+    __slots__ = ("method", "route", "start", "statements", "db", "pool_wait", "auth", "handler", "serialization", "endpoint_end")
+
+    def __init__(self, method: str):
+        self.method = method
+        self.route = "unmatched"
+        self.start = time.perf_counter()
+        self.statements = 0 # 実行したSQLの数
+        self.db = 0.0 # SQLの実行時間（秒）
+        self.pool_wait = 0.0 # コネクションプールの待ち時間（秒）
+        self.auth = 0.0 # 認証の時間（秒）
+        self.handler = 0.0 # エンドポイント本体の時間（シリアライズを除く、秒）
+        self.serialization = 0.0 # レスポンスの検証・エンコードの時間（秒）
+        self.endpoint_end: Optional[float] = None # エンドポイント本体の終了時刻
+
+    # Server-Timingヘッダーの値を作成（時間はミリ秒）
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.start
+        return ", ".join([
+            f'db;dur={self.db * 1000:.2f};desc="{self.statements} queries"',
+            f"pool;dur={self.pool_wait * 1000:.2f}",
+            f"auth;dur={self.auth * 1000:.2f}",
+            f"app;dur={self.handler * 1000:.2f}",
+            f"serialize;dur={self.serialization * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ])
+
+    # ルートごとのヒストグラムに記録
+    def observe(self) -> None:
+        labels = (self.method, self.route)
+        request_duration_seconds.labels(*labels).observe(time.perf_counter() - self.start)
+        request_db_seconds.labels(*labels).observe(self.db)
+        request_db_statements.labels(*labels).observe(self.statements)
+        request_pool_wait_seconds.labels(*labels).observe(self.pool_wait)
+        request_auth_seconds.labels(*labels).observe(self.auth)
+        request_handler_seconds.labels(*labels).observe(self.handler)
+        request_serialization_seconds.labels(*labels).observe(self.serialization)
+
+
+# 処理中のリクエストの計測値（リクエスト外の処理ではNone）
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+# 処理中のリクエストの計測値を取得
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+# SQLの実行を記録（エンジンのafter_cursor_executeイベントから呼び出す）
+# 実行時間がしきい値を超えた場合は、SQLとルートを遅いクエリとしてログに出力する
+# パラメーターには個人情報やパスワードハッシュが含まれ得るため出力しない
+def record_statement(statement: str, duration: float) -> None:
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.statements += 1
+        timings.db += duration
+    threshold = settings.slow_query_threshold_ms
+    if threshold > 0 and duration * 1000 >= threshold:
+        slow_queries.inc()
+        route = f"{timings.method} {timings.route}" if timings is not None else "-"
+        slow_query_logger.warning("slow query (%.1f ms) route=%s sql=%s", duration * 1000, route, " ".join(statement.split()))
+
+
+# コネクションプールの待ち時間を記録
+def record_pool_wait(duration: float) -> None:
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.pool_wait += duration
+
+
+# with ブロックの実行時間を計測値の指定した項目に加算
+@contextmanager
+def timed(field: str):
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timings, field, getattr(timings, field) + time.perf_counter() - start)
+
+
+# 関数の実行時間を計測値の指定した項目に加算するラッパーを作成（依存性注入関数用）
+# FastAPIが同期関数をスレッドプールで実行できるよう、元の関数と同じく同期/非同期の関数を返す
+# functools.wrapsにより引数の定義（依存関係）は元の関数のものが使われる
+def timed_dependency(field: str, func: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with timed(field):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timed(field):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# エンドポイント本体の実行時間を記録するラッパーを作成
+# 本体の中で明示的にシリアライズした時間（timed("serialization")）は本体の時間から除く
+def _timed_endpoint(func: Callable) -> Callable:
+    def start() -> tuple:
+        timings = _current_timings.get()
+        return timings, time.perf_counter(), timings.serialization if timings is not None else 0.0
+
+    def finish(timings: Optional[RequestTimings], started: float, serialization: float) -> None:
+        if timings is not None:
+            timings.endpoint_end = time.perf_counter()
+            timings.handler += timings.endpoint_end - started - (timings.serialization - serialization)
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            state = start()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                finish(*state)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        state = start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            finish(*state)
+    return wrapper
+
+
+# 計測付きのルート
+# リクエストにルートのパステンプレートを記録し、エンドポイント本体の終了後にFastAPIが行う
+# レスポンスの検証・エンコード（response_model）の時間をシリアライズ時間として記録する
+class InstrumentedRoute(APIRoute):
+    def get_route_handler(self):
+        self.dependant.call = _timed_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def instrumented_handler(request):
+            timings = _current_timings.get()
+            if timings is not None:
+                timings.route = route
+            response = await handler(request)
+            if timings is not None and timings.endpoint_end is not None:
+                timings.serialization += time.perf_counter() - timings.endpoint_end
+            return response
+
+        return instrumented_handler
+
+
+# リクエストごとの計測を行うASGIミドルウェア
+# レスポンスヘッダーの送信時点の計測値をServer-Timingヘッダーとして付与し、
+# レスポンスの送信完了後（ストリーミング中のSQLも含めて）ルートごとのヒストグラムに記録する
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(scope["method"])
+        token = _current_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.server_timing_enabled:
+                MutableHeaders(scope=message).append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            timings.observe()
+            _current_timings.reset(token)
+
+
+# リクエストメトリクスをPrometheusのテキスト形式で出力
+def render_request_metrics() -> list:
+    lines = []
+    for family in (
+        request_duration_seconds, request_db_seconds, request_db_statements, request_pool_wait_seconds,
+        request_auth_seconds, request_handler_seconds, request_serialization_seconds,
+    ):
+        lines.extend(family.expose())
+    lines.extend(format_counter("db_slow_queries_total", "SQL statements slower than the slow query threshold.", slow_queries))
+    return lines
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import signal
+import threading
+import time
+
+from sqlalchemy.orm import configure_mappers
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .database import dispose_engines, wait_for_database, warm_up_async_pool, warm_up_pool
+from .pubsub import broker, start_pubsub, stop_pubsub
+from .replicas import start_replica_monitor, stop_replica_monitor
+from .security import shutdown_hash_workers, warm_up_hash_workers
+from app.jobs.archive import start_archive_scheduler, stop_archive_scheduler
+from app.jobs.queue import start_job_workers, stop_job_workers
+
+logger = logging.getLogger(__name__)
+
+# 終了を要求するシグナル
+SHUTDOWN_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+# 終了シグナルの受信時に、サーバー本体の終了処理より先にSSEの配信を打ち切るハンドラーを登録
+# uvicornは終了時に処理中の接続が終わるまで待つため、開いたままのSSE接続があるとワーカーは猶予時間いっぱいまで終了できない
+# uvicornはイベントループにシグナルハンドラーを登録しているので、既存のハンドラーの呼び出しは連鎖させて残す
+def _install_drain_handlers(loop: asyncio.AbstractEventLoop) -> None:
+    if threading.current_thread() is not threading.main_thread():
+        return # シグナルはメインスレッドでのみ受け取れる（テストクライアントなど）
+
+    for sig in SHUTDOWN_SIGNALS:
+        previous = signal.getsignal(sig)
+
+        def handle(signum, frame, previous=previous):
+            # シグナルハンドラー内ではロックを取得せず、イベントループ上で配信を打ち切る
+            loop.call_soon_threadsafe(broker.shutdown)
+            if callable(previous):
+                previous(signum, frame)
+
+        signal.signal(sig, handle)
+
+
+# 起動時の処理（リクエストの受け付けを開始する前に、ワーカープロセスごとに実行される）
+# 最初のリクエストが初期化の待ち時間を負担しないよう、マッパーの設定・接続の作成・ハッシュ用プロセスの起動を済ませておく
+async def startup() -> None:
+    started = time.perf_counter()
+    configure_mappers() # モデル間のリレーションシップを解決しておく（初回のクエリ時に行われる処理）
+    await run_in_threadpool(wait_for_database, settings.db_startup_timeout_seconds)
+    # 非同期モードでは、リクエストの処理に使用する非同期エンジンのプールだけを温める
+    if settings.database_async:
+        connections = await warm_up_async_pool(settings.db_pool_warmup_connections)
+    else:
+        connections = await run_in_threadpool(warm_up_pool, settings.db_pool_warmup_connections)
+    await run_in_threadpool(warm_up_hash_workers)
+    start_pubsub() # 複数ワーカー間の変更通知を受け取るリスナーを開始（postgresモードのみ）
+    start_replica_monitor() # レプリカの遅延の確認を開始（レプリカが設定されている場合のみ）
+    start_archive_scheduler() # 過去のイベントの定期的なアーカイブを開始（間隔が設定されている場合のみ）
+    start_job_workers() # バックグラウンドジョブのワーカーを開始
+    _install_drain_handlers(asyncio.get_running_loop())
+    logger.info("worker ready in %.2fs (%d pooled connections)", time.perf_counter() - started, connections)
+
+
+# 終了時の処理
+# SSEの購読者に再接続を促してから、リスナー・監視スレッド・定期実行のスレッド・ジョブのワーカー・ハッシュ用プロセス・接続を順に片付ける
+async def shutdown() -> None:
+    broker.shutdown()
+    stop_pubsub()
+    stop_replica_monitor()
+    stop_archive_scheduler()
+    await run_in_threadpool(stop_job_workers) # 実行中のジョブが終わるまで待つ
+    await run_in_threadpool(shutdown_hash_workers)
+    await dispose_engines()
@@ -0,0 +1,117 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+
+# デフォルトのヒストグラムのバケット境界（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# 単調増加するカウンター
+# スレッドプール上の同期エンドポイントから同時に更新されるため、ロックで保護する
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0
+
+    # カウンターを増加させる
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+# 観測値の分布を固定バケットで集計するヒストグラム
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1) # 最後の要素は +Inf バケット
+        self._sum = 0.0
+        self._count = 0
+
+    # 観測値を記録する
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    # 現在の集計値を辞書で返す（バケットは累積件数）
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative.append({"le": "+Inf" if bound == float("inf") else bound, "count": running})
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+
+# ラベルの組み合わせごとにヒストグラムを保持するファミリー（例: メソッド・ルートごとの処理時間）
+class HistogramFamily:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+
+    # ラベル値に対応するヒストグラムを取得（なければ作成）
+    def labels(self, *values: str) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    # Prometheusのテキスト形式で出力する行のリストを返す
+    def expose(self) -> List[str]:
+        with self._lock:
+            children = sorted(self._children.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in children:
+            lines.extend(format_histogram(self.name, dict(zip(self.label_names, values)), child.snapshot()))
+        return lines
+
+
+# ラベルの値をPrometheusのテキスト形式用にエスケープ
+def _escape_label_value(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ラベルをPrometheusのテキスト形式に変換
+def format_labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels.items()) + "}"
+
+
+# ヒストグラムの集計値（Histogram.snapshotの戻り値）をPrometheusのテキスト形式の行に変換
+def format_histogram(name: str, labels: Dict[str, object], snapshot: dict) -> List[str]:
+    lines = [
+        f"{name}_bucket{format_labels({**labels, 'le': bucket['le']})} {bucket['count']}"
+        for bucket in snapshot["buckets"]
+    ]
+    lines.append(f"{name}_sum{format_labels(labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{format_labels(labels)} {snapshot['count']}")
+    return lines
+
+
+# カウンターをPrometheusのテキスト形式の行に変換
+def format_counter(name: str, documentation: str, counter: Counter) -> List[str]:
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} counter", f"{name} {counter.value}"]
+
+
+# ラベルの組み合わせごとの現在値をPrometheusのゲージの行に変換（samples: (ラベル, 値) のリスト）
+def format_gauge(name: str, documentation: str, samples: List[Tuple[Dict[str, object], float]]) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    lines.extend(f"{name}{format_labels(labels)} {value}" for labels, value in samples)
+    return lines
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# 複数ワーカー間で通知を共有する場合に使用するPostgreSQLのLISTEN/NOTIFYチャンネル名
+NOTIFY_CHANNEL = "attendance_events"
+# memoryモードで、コミット後に配信するメッセージを保持するSession.infoのキー
+PENDING_INFO_KEY = "pubsub_pending"
+# memoryモードで、セーブポイントの開始時点の保留中のメッセージ数を保持するSession.infoのキー
+SAVEPOINTS_INFO_KEY = "pubsub_savepoints"
+
+
+# 購読者1人分の受信キュー
+# 処理が追いつかずキューが満杯になった場合は、溜まったメッセージを捨てて再取得を促すメッセージに置き換える
+class Subscription:
+    def __init__(self, broker: "Broker", channel: str, maxsize: int):
+        self.broker = broker
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.closed = False # サーバーの終了により配信を打ち切った場合にTrue
+
+    # メッセージを受信キューに追加（イベントループのスレッドで呼び出される）
+    def _offer(self, message: dict) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # 遅い購読者のためにメモリを増やし続けないよう、未送信のメッセージを破棄する
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+            self.broker.dropped.inc()
+
+    # サーバーの終了時に配信を打ち切る（イベントループのスレッドで呼び出される）
+    # 購読者には再接続を促すメッセージを送り、別のワーカーへ接続し直してもらう
+    def _shut_down(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+        self.queue.put_nowait({"type": "reconnect"})
+
+    # 次のメッセージを待つ（timeout秒以内に届かなければNone）
+    async def get(self, timeout: float) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+# プロセス内のpub/sub
+# 購読はイベントループ上で行い、配信はスレッドプール上の同期エンドポイントからも呼び出せる
+class Broker:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._channels: dict[str, set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.draining = False # 終了処理中は新しい購読を受け付けない
+        self.published = Counter() # 配信したメッセージ数
+        self.delivered = Counter() # 購読者のキューに追加したメッセージ数
+        self.dropped = Counter() # 遅い購読者のために破棄した回数
+
+    # チャンネルを購読する（イベントループ上で呼び出す）
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel, self.queue_size)
+        if self.draining:
+            subscription._shut_down() # 終了処理中の場合は、すぐに再接続を促す
+            return subscription
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    # 購読を解除する
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    # このプロセスの購読者にメッセージを配信する（任意のスレッドから呼び出せる）
+    def deliver_local(self, channel: str, message: dict) -> None:
+        self.published.inc()
+        with self._lock:
+            loop = self._loop
+            subscribers = list(self._channels.get(channel, ()))
+        if loop is None or not subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._fan_out, subscribers, message)
+        except RuntimeError:
+            pass # イベントループが既に終了している場合
+
+    def _fan_out(self, subscribers: list, message: dict) -> None:
+        for subscription in subscribers:
+            subscription._offer(message)
+        self.delivered.inc(len(subscribers))
+
+    # 書き込みと同じトランザクションでメッセージを配信する（コミットの前に呼び出す）
+    # postgresモードでは書き込みのセッションでNOTIFYを送信し、自分のプロセスを含むすべてのワーカーのリスナー経由で配信する
+    # memoryモードではセッションに保留し、コミット後にこのプロセスの購読者へ配信する
+    # いずれもコミットされた場合にのみ配信され、ロールバックされた書き込みの変更は配信されない
+    def publish(self, db: Session, channel: str, message: dict) -> None:
+        if settings.pubsub_backend == "postgres":
+            db.execute(*_notify_statement(channel, message))
+        else:
+            db.info.setdefault(PENDING_INFO_KEY, []).append((channel, message))
+
+    # 書き込みと同じトランザクションでメッセージを配信する（非同期セッション版）
+    # memoryモードで保留したメッセージは、同期セッションと同じくコミット後のイベントで配信される（AsyncSession.sync_session）
+    async def publish_async(self, db: AsyncSession, channel: str, message: dict) -> None:
+        if settings.pubsub_backend == "postgres":
+            await db.execute(*_notify_statement(channel, message))
+        else:
+            self.publish(db.sync_session, channel, message)
+
+    # すべての購読者への配信を打ち切る（サーバーの終了時に呼び出す。任意のスレッドから呼び出せる）
+    # SSEの接続が開いたままだと、ワーカーは終了の猶予時間まで待たされるため、先に接続を閉じさせる
+    def shutdown(self) -> None:
+        with self._lock:
+            self.draining = True
+            loop = self._loop
+            subscribers = [subscription for subscriptions in self._channels.values() for subscription in subscriptions]
+        if loop is None or not subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(lambda: [subscription._shut_down() for subscription in subscribers])
+        except RuntimeError:
+            pass # イベントループが既に終了している場合
+
+    # 統計情報を取得
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = sum(len(subscriptions) for subscriptions in self._channels.values())
+            channels = len(self._channels)
+        return {
+            "backend": settings.pubsub_backend,
+            "channels": channels,
+            "subscribers": subscribers,
+            "published": self.published.value,
+            "delivered": self.delivered.value,
+            "dropped": self.dropped.value,
+        }
+
+
+# NOTIFYを送信するSQLとパラメーターを作成
+def _notify_statement(channel: str, message: dict) -> tuple:
+    payload = json.dumps({"channel": channel, "message": message}, default=str)
+    return text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": payload}
+
+
+broker = Broker(queue_size=settings.pubsub_queue_size)
+
+
+# memoryモードで保留したメッセージを、トランザクションのコミット後に配信する
+# 書き込みは既にコミット済みのため、配信に失敗してもリクエストは失敗させずに記録だけ残す
+@event.listens_for(Session, "after_commit")
+def _deliver_pending(session: Session) -> None:
+    if session.in_nested_transaction():
+        return # セーブポイントの解放では配信しない
+    for channel, message in session.info.pop(PENDING_INFO_KEY, ()):
+        try:
+            broker.deliver_local(channel, message)
+        except Exception:
+            logger.exception("failed to deliver a message to %s", channel)
+
+
+# セーブポイントの開始時点の保留中のメッセージ数を記録する
+@event.listens_for(Session, "after_transaction_create")
+def _mark_savepoint(session: Session, transaction) -> None:
+    if transaction.nested and PENDING_INFO_KEY in session.info:
+        session.info.setdefault(SAVEPOINTS_INFO_KEY, {})[transaction] = len(session.info[PENDING_INFO_KEY])
+
+
+# セーブポイントがロールバックされた場合は、その中で保留したメッセージを破棄する
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_savepoint(session: Session, previous_transaction) -> None:
+    if previous_transaction.nested and PENDING_INFO_KEY in session.info:
+        marker = session.info.get(SAVEPOINTS_INFO_KEY, {}).get(previous_transaction, 0)
+        del session.info[PENDING_INFO_KEY][marker:]
+
+
+# トランザクションの終了時に、配信しなかった（ロールバックされた）メッセージを破棄する
+# フラッシュ（nested ではない内部のトランザクション）の終了では破棄しない
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(PENDING_INFO_KEY, None)
+        session.info.pop(SAVEPOINTS_INFO_KEY, None)
+
+
+# PostgreSQLのLISTENで通知を受け取り、このプロセスの購読者に配信するスレッド
+class PostgresListener(threading.Thread):
+    def __init__(self, broker: Broker):
+        super().__init__(name="pubsub-listener", daemon=True)
+        self.broker = broker
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("pubsub listener failed, reconnecting")
+                time.sleep(1) # 接続に失敗した場合は少し待ってから再接続する
+
+    def _listen(self) -> None:
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        connection = psycopg2.connect(settings.database_url)
+        try:
+            connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            while not self._stopped.is_set():
+                # 通知が届くまで最大1秒待ち、停止要求を定期的に確認する
+                if select.select([connection], [], [], 1.0) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    data = json.loads(notify.payload)
+                    self.broker.deliver_local(data["channel"], data["message"])
+        finally:
+            connection.close()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+_listener: Optional[PostgresListener] = None
+
+
+# アプリケーション起動時に呼び出し、postgresモードの場合はリスナーを開始する
+def start_pubsub() -> None:
+    global _listener
+    if settings.pubsub_backend == "postgres" and _listener is None:
+        _listener = PostgresListener(broker)
+        _listener.start()
+
+
+# アプリケーション終了時に呼び出し、リスナーを停止する
+def stop_pubsub() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,233 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .metrics import Counter
+from .security import bearer_subject
+
+# レート制限・同時実行数の制限の対象外とするパス（運用監視・ドキュメント）
+# 運用監視のエンドポイントは共有シークレット（settings.internal_api_token）で保護され、データベースにアクセスしない
+EXEMPT_PATHS = ("/metrics", "/internal/", "/docs", "/redoc", "/openapi.json")
+# 接続を開いたまま待機するだけでデータベースの接続を保持しないため、同時実行数に数えないパスの末尾（SSEの配信）
+# 配信のエンドポイントは、認証・イベントの存在確認のセッションを配信を始める前に閉じる（auth.get_current_user_detached）
+UNCOUNTED_PATH_SUFFIXES = ("/stream",)
+# 接続元IPアドレスごとに制限するパスの接頭辞（ログイン・登録など、トークンを持たないリクエストを含む）
+AUTH_PATH_PREFIX = "/auth/"
+
+
+# トークンバケットの保存先のインターフェース
+# 外部ストア（Redisなど）で複数ワーカー間で共有する場合はこのクラスを継承して実装する
+class RateLimitStore:
+    # ネットワーク越しに通信するため、イベントループ上で直接呼び出さずスレッドプールで実行する必要があるかどうか
+    blocking = False
+
+    # キーのバケットからトークンを1つ取り出す
+    # rate: 1秒あたりに補充するトークン数、burst: バケットの容量
+    # 戻り値: (許可するかどうか, 拒否した場合に次のトークンが補充されるまでの秒数)
+    def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+
+# プロセス内メモリに保存するバックエンド（最近使われていないキーから破棄する）
+# 複数ワーカーで動作させる場合、制限はワーカーごとに適用される
+class MemoryRateLimitStore(RateLimitStore):
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict() # キー -> (残りのトークン数, 最終更新時刻)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated) * rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1.0 - tokens) / rate
+
+    def stats(self) -> dict:
+        return {"keys": len(self._buckets), "maxsize": self.maxsize}
+
+
+# トークンバケットを1回の往復で更新するLuaスクリプト（時刻はRedisサーバーの時刻を使い、ワーカー間の時計のずれの影響を受けない）
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+# Redis互換のクライアントに保存するバックエンド（全ワーカーで制限を共有する）
+class RedisRateLimitStore(RateLimitStore):
+    blocking = True
+
+    def __init__(self, client, prefix: str = "attendance:ratelimit:"):
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._prefix = prefix
+
+    def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        allowed, tokens = self._script(keys=[self._prefix + key], args=[rate, burst])
+        if allowed:
+            return True, 0.0
+        return False, (1.0 - float(tokens)) / rate
+
+
+# 同時に処理するリクエスト数の上限
+# 上限に達している場合は queue_timeout 秒まで空きを待ち、空かなければ拒否する
+# 接続プールの待ち行列（最大 db_pool_timeout 秒）に積まれる前に、すぐに503を返して負荷を落とす
+class ConcurrencyLimiter:
+    def __init__(self, limit: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0 # 処理中のリクエスト数（イベントループ上でのみ更新する）
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+
+    async def acquire(self) -> bool:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit) # イベントループ上で作成する
+        if self._semaphore.locked():
+            if self.queue_timeout <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return False
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+# 設定から保存先を作成
+def _create_store() -> RateLimitStore:
+    if settings.rate_limit_backend == "redis":
+        import redis # Redisバックエンドを使用する場合のみ必要
+
+        return RedisRateLimitStore(redis.Redis.from_url(settings.rate_limit_url))
+    return MemoryRateLimitStore(maxsize=settings.rate_limit_memory_size)
+
+
+rate_limit_store = _create_store()
+concurrency_limiter = ConcurrencyLimiter(settings.max_concurrent_requests, settings.concurrency_queue_timeout_seconds)
+
+# 制限の統計情報
+user_rate_limited = Counter() # ユーザーごとのレート制限で拒否したリクエスト数
+auth_rate_limited = Counter() # /auth/* の接続元IPアドレスごとのレート制限で拒否したリクエスト数
+load_shed = Counter() # 同時実行数の上限で拒否したリクエスト数
+
+
+def get_rate_limit_stats() -> dict:
+    stats = {
+        "user_rate_limited": user_rate_limited.value,
+        "auth_rate_limited": auth_rate_limited.value,
+        "load_shed": load_shed.value,
+        "in_flight": concurrency_limiter.in_flight,
+        "max_concurrent_requests": concurrency_limiter.limit,
+    }
+    if isinstance(rate_limit_store, MemoryRateLimitStore):
+        stats["store"] = rate_limit_store.stats()
+    return stats
+
+
+# レート制限と同時実行数の制限を行うミドルウェア（アドミッション制御）
+# /auth/* は接続元IPアドレスごと、それ以外はトークンのサブジェクト（ユーザー）ごとのトークンバケットで制限する
+# サブジェクトはトークンの署名を検証して取り出すだけで、データベースにはアクセスしない
+# 接続元IPアドレスは、プロキシの背後で動作させる場合はサーバーの --proxy-headers / forwarded_allow_ips で実際のクライアントに置き換えておく
+class AdmissionControlMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        if settings.rate_limit_enabled:
+            limited = await self._check_rate(scope)
+            if limited is not None:
+                counter, retry_after = limited
+                counter.inc()
+                await _reject(send, 429, "Too many requests", retry_after)
+                return
+
+        if not concurrency_limiter.enabled or scope["path"].endswith(UNCOUNTED_PATH_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+        if not await concurrency_limiter.acquire():
+            load_shed.inc()
+            await _reject(send, 503, "Server is busy, please retry", 1.0)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            concurrency_limiter.release()
+
+    # レート制限を超えている場合は (拒否を数えるカウンター, 再試行までの秒数) を返す
+    async def _check_rate(self, scope) -> Optional[Tuple[Counter, float]]:
+        if scope["path"].startswith(AUTH_PATH_PREFIX):
+            key = f"ip:{_client_ip(scope)}"
+            rate, burst, counter = settings.rate_limit_auth_rate, settings.rate_limit_auth_burst, auth_rate_limited
+        else:
+            subject = bearer_subject(scope)
+            # トークンのないリクエストは認証で拒否されるが、繰り返し送られる場合に備えて接続元IPアドレスごとに制限する
+            key = f"user:{subject}" if subject is not None else f"ip:{_client_ip(scope)}"
+            rate, burst, counter = settings.rate_limit_user_rate, settings.rate_limit_user_burst, user_rate_limited
+        if rate <= 0:
+            return None
+        if rate_limit_store.blocking:
+            allowed, retry_after = await run_in_threadpool(rate_limit_store.take, key, rate, burst)
+        else:
+            allowed, retry_after = rate_limit_store.take(key, rate, burst)
+        return None if allowed else (counter, retry_after)
+
+
+# 接続元IPアドレス
+def _client_ip(scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+# 制限を超えたリクエストにエラーレスポンスを返す（FastAPIのHTTPExceptionと同じ形式の本文）
+async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(int(retry_after + 0.999), 1)).encode()), # 秒単位に切り上げる
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,247 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import (
+    AsyncSessionLocal, SessionLocal, create_async_session, create_session, get_async_engine, get_async_replica_engine,
+    get_engine, get_replica_engine,
+)
+from .metrics import Counter
+from .response_cache import (
+    READ_PRIMARY, READ_REPLICA, READ_STICKY, CacheBackend, MemoryCacheBackend, RedisCacheBackend, call_backend,
+)
+from .security import bearer_subject
+
+logger = logging.getLogger(__name__)
+
+# レプリカの遅延（秒）を取得するSQL
+# 受信済みのWALをすべて適用済みであれば、プライマリで更新がない間も遅延は0とみなす
+LAG_QUERY = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+# レプリカで読み取ったセッションを示すSession.infoのキー
+REPLICA_INFO_KEY = "replica"
+# 直前に書き込みを行ったユーザーがプライマリで読み取るセッションを示すSession.infoのキー
+STICKY_INFO_KEY = "sticky"
+
+
+# レプリカ1台分の状態
+class Replica:
+    def __init__(self, index: int, url: str):
+        self.index = index
+        url = make_url(url)
+        self.name = f"{url.host}:{url.port or 5432}" if url.host else url.database # 統計情報に表示する名前（パスワードを含めない）
+        self.lag: Optional[float] = None # 最後に確認した遅延（秒）。未確認・接続できなかった場合はNone
+        self.checked_at: Optional[float] = None # 最後に確認した時刻（UNIX時刻）
+        self.reads = Counter() # このレプリカで処理した読み取り数
+        self.failures = Counter() # 遅延の確認に失敗した回数
+
+    # 読み取りに使用できるかどうか
+    @property
+    def usable(self) -> bool:
+        return self.lag is not None and self.lag <= settings.db_replica_max_lag_seconds
+
+    # 遅延を確認する
+    def check(self) -> None:
+        try:
+            with get_replica_engine(self.index).connect() as connection:
+                lag = float(connection.execute(text(LAG_QUERY)).scalar() or 0.0)
+        except Exception as exc:
+            if self.lag is not None:
+                logger.warning("replica %s is unavailable, reading from the primary: %s", self.name, exc)
+            self.failures.inc()
+            lag = None
+        self.lag = lag
+        self.checked_at = time.time()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "usable": self.usable,
+            "lag_seconds": self.lag,
+            "checked_at": self.checked_at,
+            "reads": self.reads.value,
+            "failures": self.failures.value,
+        }
+
+
+# 読み取りの振り分け先を決めるルーター
+# 遅延が許容値以内のレプリカに順番に振り分け、使用できるレプリカがなければプライマリで読み取る
+class ReplicaRouter:
+    def __init__(self, urls: list[str]):
+        self.replicas = [Replica(index, url) for index, url in enumerate(urls)]
+        self._next = itertools.count()
+        self.primary_reads = Counter() # レプリカが設定されていても、プライマリで処理した読み取り数
+        self.sticky_reads = Counter() # うち、直前に書き込みを行ったユーザーの読み取り数
+        self.fallbacks = Counter() # うち、使用できるレプリカがなかった読み取り数
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    # 読み取りに使用するレプリカを選ぶ（使用できるレプリカがなければNone）
+    def choose(self) -> Optional[Replica]:
+        usable = [replica for replica in self.replicas if replica.usable]
+        if not usable:
+            return None
+        return usable[next(self._next) % len(usable)]
+
+    # すべてのレプリカの遅延を確認する
+    def check_all(self) -> None:
+        for replica in self.replicas:
+            replica.check()
+
+    def stats(self) -> dict:
+        return {
+            "replicas": [replica.stats() for replica in self.replicas],
+            "primary_reads": self.primary_reads.value,
+            "sticky_reads": self.sticky_reads.value,
+            "fallbacks": self.fallbacks.value,
+        }
+
+
+replica_router = ReplicaRouter(settings.replica_urls)
+
+
+# 書き込みを行ったユーザーの記録（キーはトークンのサブジェクト）
+# 複数ワーカーで動作させる場合も記録を共有できるよう、レスポンスキャッシュと同じ保存先の実装を使用する
+def _create_write_marks() -> CacheBackend:
+    if settings.response_cache_backend == "redis":
+        import redis # Redisバックエンドを使用する場合のみ必要
+
+        return RedisCacheBackend(redis.Redis.from_url(settings.response_cache_url), prefix="attendance:written:")
+    return MemoryCacheBackend(maxsize=10000, ttl=settings.db_read_your_writes_seconds)
+
+
+write_marks = _create_write_marks()
+
+
+# ユーザーが書き込みを行ったことを記録する
+def mark_write(subject: str) -> None:
+    write_marks.set(subject, b"1", settings.db_read_your_writes_seconds)
+
+
+# ユーザーが直前に書き込みを行ったかどうか
+def wrote_recently(subject: str) -> bool:
+    return write_marks.get(subject) is not None
+
+
+# 読み取り専用のセッションを作成
+# subject は現在のユーザー（トークンのサブジェクト）で、直前に書き込みを行っていればプライマリで読み取る
+def create_read_session(subject: Optional[str]) -> Session:
+    if not replica_router.enabled:
+        return create_session()
+    replica, info = _route_read(subject is not None and wrote_recently(subject))
+    engine = get_engine() if replica is None else get_replica_engine(replica.index)
+    return SessionLocal(bind=engine, info=info)
+
+
+# 読み取り専用の非同期セッションを作成（非同期モード用、振り分けは create_read_session と同じ）
+async def create_async_read_session(subject: Optional[str]) -> AsyncSession:
+    if not replica_router.enabled:
+        return create_async_session()
+    sticky = subject is not None and await call_backend(write_marks, wrote_recently, subject)
+    replica, info = _route_read(sticky)
+    engine = get_async_engine() if replica is None else get_async_replica_engine(replica.index)
+    return AsyncSessionLocal(bind=engine, info=info)
+
+
+# 読み取り先のレプリカ（プライマリの場合はNone）と、セッションに設定するinfoを選ぶ
+# sticky は現在のユーザーが直前に書き込みを行ったかどうか
+def _route_read(sticky: bool) -> tuple[Optional[Replica], dict]:
+    if sticky:
+        replica_router.primary_reads.inc()
+        replica_router.sticky_reads.inc()
+        return None, {STICKY_INFO_KEY: True}
+    replica = replica_router.choose()
+    if replica is None:
+        replica_router.primary_reads.inc()
+        replica_router.fallbacks.inc()
+        return None, {}
+    replica.reads.inc()
+    return replica, {REPLICA_INFO_KEY: replica.name}
+
+
+# セッションの読み取り元を返す（レスポンスキャッシュの使い方を決める。response_cache.cached_json_response）
+# 非同期セッションの info は同期セッションの info と同じもの
+def read_source(db: Union[Session, AsyncSession]) -> str:
+    if REPLICA_INFO_KEY in db.info:
+        return READ_REPLICA
+    if STICKY_INFO_KEY in db.info:
+        return READ_STICKY
+    return READ_PRIMARY
+
+
+# レプリカの遅延を定期的に確認するスレッド
+# リクエストの処理中に接続の確立・タイムアウトを待たないよう、確認はこのスレッドだけで行う
+class ReplicaMonitor(threading.Thread):
+    def __init__(self, router: ReplicaRouter):
+        super().__init__(name="replica-monitor", daemon=True)
+        self.router = router
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            self.router.check_all()
+            self._stopped.wait(settings.db_replica_check_interval_seconds)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+_monitor: Optional[ReplicaMonitor] = None
+
+
+# アプリケーション起動時に呼び出し、レプリカが設定されている場合は遅延の確認を開始する
+# 最初の確認が終わるまではプライマリで読み取る
+def start_replica_monitor() -> None:
+    global _monitor
+    if replica_router.enabled and _monitor is None:
+        _monitor = ReplicaMonitor(replica_router)
+        _monitor.start()
+
+
+# アプリケーション終了時に呼び出し、遅延の確認を停止する
+def stop_replica_monitor() -> None:
+    global _monitor
+    if _monitor is not None:
+        _monitor.stop()
+        _monitor = None
+
+
+# 安全なメソッド（書き込みを伴わないリクエスト）
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+# 書き込みに成功したリクエストのユーザーを記録するミドルウェア
+# 記録はレスポンスの送信前に行い、クライアントが応答を受け取った直後の読み取りが確実にプライマリへ振り分けられるようにする
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not replica_router.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        subject = bearer_subject(scope)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and subject is not None:
+                await call_backend(write_marks, mark_write, subject)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
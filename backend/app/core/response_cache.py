@@ -0,0 +1,415 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Iterable, NamedTuple, Optional
+
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+from starlette.concurrency import run_in_threadpool
+
+from .cache import TTLCache
+from .config import settings
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# コミット後に無効化するイベントIDの集合を保持するSession.infoのキー（invalidate_after_commit）
+INVALIDATE_INFO_KEY = "response_cache_invalidate"
+
+
+# レスポンスキャッシュの保存先のインターフェース
+# 値はバイト列として保存する。外部ストア（Redisなど）を使う場合はこのクラスを継承して実装する
+class CacheBackend:
+    # 操作がネットワークなどのI/Oを待つかどうか（非同期モードでは、Trueの場合にスレッドプールで呼び出す）
+    blocking = True
+
+    # キーに対応する値を取得（存在しない場合はNone）
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    # キーに値を保存
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    # 世代番号を取得（存在しない場合は現在時刻から初期化する）
+    def get_generation(self, key: str) -> int:
+        raise NotImplementedError
+
+    # 世代番号を1つ進める（存在しない場合は現在時刻から初期化する）
+    def bump_generation(self, key: str) -> None:
+        raise NotImplementedError
+
+    # 複数の世代番号を進め、marks のキーに値を保存する（外部ストアでは1回の往復で行う）
+    # marks: 世代番号と一緒に保存するキー -> 値、marks_ttl: その保存期限
+    def bump_generations(self, keys: Iterable[str], marks: Iterable[str] = (), marks_ttl: float = 0.0) -> None:
+        for key in keys:
+            self.bump_generation(key)
+        for key in marks:
+            self.set(key, b"1", marks_ttl)
+
+
+# プロセス内メモリに保存するバックエンド（LRU + TTL）
+# 複数ワーカーで動作させる場合、無効化は同じプロセス内にしか反映されないため、TTLの間古い内容を返すことがある
+class MemoryCacheBackend(CacheBackend):
+    blocking = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._cache.set(key, value, ttl)
+
+    def get_generation(self, key: str) -> int:
+        with self._lock:
+            generation = self._cache.get(key)
+            if generation is None:
+                # 世代番号が破棄された後に古い番号が再利用されないよう、現在時刻から始める
+                generation = time.time_ns()
+                self._cache.set(key, generation)
+            return generation
+
+    def bump_generation(self, key: str) -> None:
+        with self._lock:
+            generation = self._cache.get(key)
+            self._cache.set(key, time.time_ns() if generation is None else generation + 1)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+# Redis互換のクライアントに保存するバックエンド
+# redis-pyのクライアント（または同じインターフェースを持つテスト用の代替実装）を受け取る
+class RedisCacheBackend(CacheBackend):
+    def __init__(self, client, prefix: str = "attendance:"):
+        self._client = client
+        self._prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(self._prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._client.set(self._prefix + key, value, ex=max(int(ttl), 1))
+
+    def get_generation(self, key: str) -> int:
+        self._client.set(self._prefix + key, time.time_ns(), nx=True)
+        return int(self._client.get(self._prefix + key))
+
+    def bump_generation(self, key: str) -> None:
+        self._client.set(self._prefix + key, time.time_ns(), nx=True)
+        self._client.incr(self._prefix + key)
+
+    def bump_generations(self, keys: Iterable[str], marks: Iterable[str] = (), marks_ttl: float = 0.0) -> None:
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.set(self._prefix + key, time.time_ns(), nx=True)
+            pipe.incr(self._prefix + key)
+        for key in marks:
+            pipe.set(self._prefix + key, b"1", ex=max(int(marks_ttl), 1))
+        pipe.execute()
+
+
+# キャッシュしたレスポンス（本文と一部のレスポンスヘッダー）
+class CachedResponse:
+    def __init__(self, body: bytes, headers: Optional[dict] = None):
+        self.body = body
+        self.headers = headers or {}
+
+    # バックエンドに保存する形式（1行目にヘッダーのJSON、2行目以降に本文）に変換
+    def dump(self) -> bytes:
+        return json.dumps(self.headers).encode() + b"\n" + self.body
+
+    @classmethod
+    def load(cls, data: bytes) -> "CachedResponse":
+        headers, body = data.split(b"\n", 1)
+        return cls(body, json.loads(headers))
+
+
+# キャッシュキーと、その無効化の単位（世代番号のキー）
+class CacheKey(NamedTuple):
+    key: str
+    scope: str
+
+
+# 読み取りに使用したセッションの種類（replicas.read_source で判定する）
+READ_PRIMARY = "primary" # プライマリ
+READ_STICKY = "sticky" # 直前に書き込みを行ったユーザーのプライマリでの読み取り
+READ_REPLICA = "replica" # レプリカ
+
+
+# 同じキーを計算中のリクエストが共有する状態
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[bytes] = None
+
+
+# バックエンドの操作をイベントループから呼び出す（非同期モード用）
+# I/Oを待つバックエンド（Redisなど）の場合は、イベントループをブロックしないようスレッドプールで実行する
+async def call_backend(backend: Optional[CacheBackend], func: Callable, *args):
+    if backend is not None and backend.blocking:
+        return await run_in_threadpool(func, *args)
+    return func(*args)
+
+
+# 読み取りの多いエンドポイント向けのレスポンスキャッシュ
+# キーにイベント単位・一覧単位の世代番号を含め、書き込み時は世代番号を進めることで古いエントリを無効化する
+# 同じキーのキャッシュが同時に切れた場合は、1つのリクエストだけが計算し、他のリクエストはその結果を待つ（single-flight）
+class ResponseCache:
+    def __init__(self, backend: Optional[CacheBackend], ttl: float, wait_timeout: float = 10.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._inflight: dict[str, _Flight] = {}
+        self._inflight_async: dict[str, asyncio.Future] = {} # 非同期モードで計算中のキー（イベントループ上でのみ操作する）
+        self.hits = Counter()
+        self.misses = Counter()
+        self.coalesced = Counter() # 他のリクエストの計算結果を待って利用した件数
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    # イベント単位のキャッシュキーを作成
+    def event_key(self, kind: str, event_id) -> CacheKey:
+        scope = f"gen:event:{event_id}"
+        generation = self.backend.get_generation(scope)
+        return CacheKey(f"{kind}:{event_id}:{generation}", scope)
+
+    # イベント一覧のキャッシュキーを作成（params はページ・絞り込み条件）
+    def list_key(self, kind: str, params: str) -> CacheKey:
+        scope = "gen:event-list"
+        generation = self.backend.get_generation(scope)
+        return CacheKey(f"{kind}:{generation}:{params}", scope)
+
+    # キャッシュから取得し、なければcomputeで作成して保存する
+    # ttl を指定した場合は、キャッシュ全体の有効期限より短い期限で保存する
+    # store=False の場合は、作成した内容を返すだけで保存しない
+    def get_or_compute(
+        self, key: str, compute: Callable[[], CachedResponse], ttl: Optional[float] = None, store: bool = True
+    ) -> CachedResponse:
+        data = self.backend.get(key)
+        if data is not None:
+            self.hits.inc()
+            return CachedResponse.load(data)
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            # 先に計算を始めたリクエストの結果を待つ
+            if flight.done.wait(self.wait_timeout) and flight.value is not None:
+                self.coalesced.inc()
+                return CachedResponse.load(flight.value)
+            return compute() # 計算が失敗した・時間がかかりすぎた場合は自分で計算する
+
+        self.misses.inc()
+        try:
+            response = compute()
+            flight.value = response.dump()
+            if store:
+                self.backend.set(key, flight.value, self._store_ttl(ttl))
+            return response
+        finally:
+            flight.done.set()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    # キャッシュから取得し、なければcomputeで作成して保存する（非同期モード用、引数はget_or_compute と同じ）
+    # compute はコルーチン関数で、同じキーの計算中のリクエストはイベントループ上で結果を待つ
+    async def get_or_compute_async(
+        self, key: str, compute: Callable[[], Awaitable[CachedResponse]], ttl: Optional[float] = None, store: bool = True
+    ) -> CachedResponse:
+        data = await self.run_async(self.backend.get, key)
+        if data is not None:
+            self.hits.inc()
+            return CachedResponse.load(data)
+
+        flight = self._inflight_async.get(key)
+        if flight is not None:
+            # 先に計算を始めたリクエストの結果を待つ（待っている側がキャンセルされても計算は止めない）
+            try:
+                value = await asyncio.wait_for(asyncio.shield(flight), self.wait_timeout)
+            except asyncio.TimeoutError:
+                value = None
+            if value is not None:
+                self.coalesced.inc()
+                return CachedResponse.load(value)
+            return await compute() # 計算が失敗した・時間がかかりすぎた場合は自分で計算する
+
+        flight = self._inflight_async[key] = asyncio.get_running_loop().create_future()
+        self.misses.inc()
+        value = None
+        try:
+            response = await compute()
+            value = response.dump()
+            if store:
+                await self.run_async(self.backend.set, key, value, self._store_ttl(ttl))
+            return response
+        finally:
+            flight.set_result(value)
+            self._inflight_async.pop(key, None)
+
+    # 保存期限（キャッシュ全体の有効期限より長くしない）
+    def _store_ttl(self, ttl: Optional[float]) -> float:
+        return self.ttl if ttl is None else min(ttl, self.ttl)
+
+    # キャッシュの操作をイベントループから呼び出す（非同期モード用）
+    async def run_async(self, func: Callable, *args):
+        return await call_backend(self.backend, func, *args)
+
+    # イベントの詳細・出欠リストのキャッシュを無効化
+    def invalidate_event(self, event_id) -> None:
+        if self.enabled:
+            self._invalidate([f"gen:event:{event_id}"])
+
+    # イベント一覧のキャッシュを無効化
+    def invalidate_event_lists(self) -> None:
+        if self.enabled:
+            self._invalidate(["gen:event-list"])
+
+    # 複数のイベントの詳細・出欠リストと、イベント一覧のキャッシュをまとめて無効化
+    def invalidate_events(self, event_ids: Iterable) -> None:
+        if self.enabled:
+            self._invalidate([*(f"gen:event:{event_id}" for event_id in event_ids), "gen:event-list"])
+
+    # セッションのトランザクションがコミットされた後に、イベント一覧と（event_id を指定した場合は）そのイベントのキャッシュを無効化する
+    # 書き込みのたびにキャッシュへ往復せず、1つのトランザクション内の無効化をコミット時の1回の往復にまとめる
+    # ロールバックされた場合は無効化しない。Session と AsyncSession のどちらも受け取る
+    def invalidate_after_commit(self, session, event_id=None) -> None:
+        if self.enabled:
+            event_ids = session.info.setdefault(INVALIDATE_INFO_KEY, set())
+            if event_id is not None:
+                event_ids.add(event_id)
+
+    # 世代番号を進める
+    # レプリカを使用する場合は、無効化した時刻から許容遅延の間、無効化の直後であることを記録する（recently_invalidated）
+    def _invalidate(self, scopes: list) -> None:
+        marks = [f"invalidated:{scope}" for scope in scopes] if settings.replica_urls else []
+        self.backend.bump_generations(scopes, marks, settings.db_replica_max_lag_seconds)
+
+    # 無効化の単位が許容遅延の時間内に無効化されたかどうか
+    # この間にレプリカで読み取った内容は、無効化の原因になった書き込みを反映していない可能性がある
+    def recently_invalidated(self, scope: str) -> bool:
+        return self.backend.get(f"invalidated:{scope}") is not None
+
+    # キャッシュの統計情報を取得
+    def stats(self) -> dict:
+        stats = {
+            "backend": type(self.backend).__name__ if self.enabled else None,
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+            "coalesced": self.coalesced.value,
+        }
+        if isinstance(self.backend, MemoryCacheBackend):
+            stats["store"] = self.backend.stats()
+        return stats
+
+
+# 設定からバックエンドを作成
+def _create_backend() -> Optional[CacheBackend]:
+    if settings.response_cache_backend == "memory":
+        return MemoryCacheBackend(maxsize=settings.response_cache_size, ttl=settings.response_cache_ttl_seconds)
+    if settings.response_cache_backend == "redis":
+        import redis # Redisバックエンドを使用する場合のみ必要
+
+        return RedisCacheBackend(redis.Redis.from_url(settings.response_cache_url))
+    return None
+
+
+response_cache = ResponseCache(_create_backend(), ttl=settings.response_cache_ttl_seconds)
+
+
+# invalidate_after_commit で登録した無効化を、トランザクションのコミット後に行う
+# 書き込みは既にコミット済みのため、無効化に失敗してもリクエストは失敗させずに記録だけ残す（古い内容はTTLで消える）
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    if session.in_nested_transaction():
+        return # セーブポイントの解放では無効化しない
+    event_ids = session.info.pop(INVALIDATE_INFO_KEY, None)
+    if event_ids is None or not response_cache.enabled:
+        return
+    try:
+        if response_cache.backend.blocking and _on_event_loop():
+            # 非同期セッションのコミット（イベントループ上のgreenlet）では、イベントループをブロックせずにスレッドプールで実行する
+            await_only(run_in_threadpool(response_cache.invalidate_events, event_ids))
+        else:
+            response_cache.invalidate_events(event_ids)
+    except Exception:
+        logger.exception("failed to invalidate the response cache")
+
+
+# トランザクションの終了時に、無効化しなかった（ロールバックされた）登録を破棄する
+# フラッシュ・セーブポイントの内部のトランザクションの終了では破棄しない
+@event.listens_for(Session, "after_transaction_end")
+def _discard_invalidations(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(INVALIDATE_INFO_KEY, None)
+
+
+# 現在のスレッドでイベントループが実行中かどうか
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+# キャッシュを経由してJSONレスポンスを作成
+# key はキャッシュキーを返す関数（キャッシュ無効時は呼び出さない）
+# compute はキャッシュがない場合に呼び出され、シリアライズ済みのCachedResponseを返す
+# response は依存性注入で受け取ったレスポンスで、ETagなど設定済みのヘッダーを引き継ぐ
+# source は compute が読み取るセッションの種類（replicas.read_source）
+def cached_json_response(
+    key: Callable[[], CacheKey], compute: Callable[[], CachedResponse], response: Response, source: str = READ_PRIMARY
+) -> Response:
+    if not response_cache.enabled or source == READ_STICKY:
+        # 直前に書き込みを行ったユーザーには、他のユーザーがレプリカから保存した古い内容を返さないよう、キャッシュを経由せずに読み取る
+        cached = compute()
+    elif source == READ_REPLICA:
+        cache_key = key()
+        # 無効化の直後にレプリカで読み取った内容は、書き込みを反映していない可能性があるため保存しない
+        # それ以外も、レプリカの内容は最大で許容遅延の分だけ古いため、保存期限を許容遅延までに短くする
+        store = not response_cache.recently_invalidated(cache_key.scope)
+        cached = response_cache.get_or_compute(cache_key.key, compute, settings.db_replica_max_lag_seconds, store=store)
+    else:
+        cached = response_cache.get_or_compute(key().key, compute)
+    return _cached_response(cached, response)
+
+
+# キャッシュを経由してJSONレスポンスを作成（非同期モード用）
+# 引数は cached_json_response と同じで、compute はコルーチン関数
+async def cached_json_response_async(
+    key: Callable[[], CacheKey], compute: Callable[[], Awaitable[CachedResponse]], response: Response, source: str = READ_PRIMARY
+) -> Response:
+    if not response_cache.enabled or source == READ_STICKY:
+        cached = await compute()
+    elif source == READ_REPLICA:
+        cache_key = await response_cache.run_async(key)
+        store = not await response_cache.run_async(response_cache.recently_invalidated, cache_key.scope)
+        cached = await response_cache.get_or_compute_async(cache_key.key, compute, settings.db_replica_max_lag_seconds, store=store)
+    else:
+        cache_key = await response_cache.run_async(key)
+        cached = await response_cache.get_or_compute_async(cache_key.key, compute)
+    return _cached_response(cached, response)
+
+
+# キャッシュした内容から、依存性注入で受け取ったレスポンスのヘッダーを引き継いだJSONレスポンスを作成
+def _cached_response(cached: CachedResponse, response: Response) -> Response:
+    return Response(
+        content=cached.body,
+        media_type="application/json",
+        headers={**dict(response.headers), **cached.headers},
+    )
@@ -1,24 +1,114 @@
+import hmac
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
+from fastapi import Header, HTTPException, status
 from jose import JWTError, jwt # JWT（JSON Web Token）のエンコード・デコード用ライブラリ
 from passlib.context import CryptContext # パスワードハッシュ化ライブラリ
 
 from .config import settings # アプリケーション設定をインポート
+from .metrics import Counter
 
 # パスワードハッシュ化のコンテキストを設定
 # bcryptスキームを使用し、非推奨のハッシュは自動的に処理
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 最小・最大ラウンド数を設定値に固定することで、コストが異なる既存ハッシュを再ハッシュ対象として検出する
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
+
+# パスワード処理用のプロセスプール（初回使用時に作成）
+# bcryptはCPUを占有するため、リクエストを処理するスレッドプールとは別のプロセスで実行する
+_hash_executor: Optional[ProcessPoolExecutor] = None
+_hash_executor_lock = threading.Lock()
+# 実行中・待機中のハッシュ処理数を制限するセマフォ
+_hash_slots = threading.BoundedSemaphore(max(settings.password_hash_max_pending, 1))
+# 待ち行列が上限に達して拒否したリクエスト数
+password_hash_rejections = Counter()
+
+
+# プロセスプールを取得（未作成の場合は作成）
+def _get_hash_executor() -> ProcessPoolExecutor:
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is None:
+            _hash_executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+        return _hash_executor
+
+
+# 何もしないタスク（ワーカープロセスの起動に使用する）
+def _noop() -> None:
+    return None
+
+
+# プロセスプールのワーカーを事前に起動しておく（起動時に使用）
+# ProcessPoolExecutorはワーカーを必要になるまで起動しないため、最初のログインがプロセスの起動を待たないようにする
+def warm_up_hash_workers() -> None:
+    if settings.password_hash_workers <= 0:
+        return
+    executor = _get_hash_executor()
+    for future in [executor.submit(_noop) for _ in range(settings.password_hash_workers)]:
+        future.result()
+
+
+# プロセスプールを終了する（終了時に使用）
+def shutdown_hash_workers() -> None:
+    global _hash_executor
+    with _hash_executor_lock:
+        executor, _hash_executor = _hash_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# パスワード処理をプロセスプールで実行し、結果を待つ
+# 待ち行列が上限に達している場合は、スレッドを待たせずに503を返す
+def _run_hash_task(func, *args):
+    if settings.password_hash_workers <= 0:
+        return func(*args) # プロセスプールを使用しない設定の場合は直接実行
+    if not _hash_slots.acquire(blocking=False):
+        password_hash_rejections.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return _get_hash_executor().submit(func, *args).result()
+    finally:
+        _hash_slots.release()
+
+
+# 平文パスワードとハッシュ化されたパスワードを比較して検証（ワーカープロセスで実行される）
+def _verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# 平文パスワードをハッシュ化（ワーカープロセスで実行される）
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
 
 
 # 平文パスワードとハッシュ化されたパスワードを比較して検証
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run_hash_task(_verify_and_update, plain_password, hashed_password)[0]
+
+
+# 平文パスワードを検証し、コストが変更されていれば新しいハッシュも返す
+# 戻り値: (検証結果, 再ハッシュ後の値。再ハッシュ不要の場合はNone)
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    return _run_hash_task(_verify_and_update, plain_password, hashed_password)
 
 
 # 平文パスワードをハッシュ化
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _run_hash_task(_hash, password)
 
 
 # アクセストークンを作成
@@ -29,20 +119,90 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire}) # ペイロードに有効期限を追加
+    # ペイロードに有効期限、発行日時、失効管理用のトークンIDを追加
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex})
     # JWTをエンコード
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
 
-# トークンを検証し、ペイロードからメールアドレスを抽出
-def verify_token(token: str) -> Optional[str]:
+# 失効させたトークンを保持するプロセス内のデナイリスト
+# トークンID（jti）と有効期限のみを保持し、期限切れのエントリは追加時に掃除するため
+# サイズは「有効期限内に失効させたトークン数」に比例して小さく保たれる
+class TokenDenylist:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[str, float] = {} # jti -> 有効期限（UNIX時刻）
+
+    # トークンIDを失効させる
+    def add(self, jti: str, expires_at: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._entries = {key: exp for key, exp in self._entries.items() if exp > now}
+            self._entries[jti] = expires_at
+
+    # トークンIDが失効しているかを確認
+    def __contains__(self, jti: str) -> bool:
+        expires_at = self._entries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+
+token_denylist = TokenDenylist()
+
+
+# トークンを検証し、ペイロード全体を返す
+# 署名・有効期限の検証に失敗した場合、または失効済みの場合はNoneを返す
+def decode_token(token: str) -> Optional[dict]:
     try:
         # JWTをデコード
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub") # "sub"クレームからメールアドレスを取得
-        if email is None:
-            return None # メールアドレスがペイロードにない場合
-        return email
     except JWTError:
-        return None # JWTの検証に失敗した場合
\ No newline at end of file
+        return None # JWTの検証に失敗した場合
+    if payload.get("sub") is None:
+        return None # メールアドレスがペイロードにない場合
+    jti = payload.get("jti")
+    if jti is not None and jti in token_denylist:
+        return None # 失効済みのトークンの場合
+    return payload
+
+
+# ASGIのリクエスト（scope）のAuthorizationヘッダーからトークンを検証し、サブジェクトを取得
+# ミドルウェアでユーザーを識別するために使用する（データベースにはアクセスしない）
+def bearer_subject(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            payload = decode_token(token)
+            return payload["sub"] if payload is not None else None
+    return None
+
+
+# 運用監視向けのエンドポイント（/metrics・/internal/*）の依存性注入関数
+# settings.internal_api_token が未設定の場合はエンドポイントが存在しないものとして404を返し、
+# 設定されている場合は Authorization: Bearer <internal_api_token> が一致しないリクエストを401で拒否する
+def require_internal_token(authorization: Optional[str] = Header(None)) -> None:
+    if not settings.internal_api_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.internal_api_token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+# トークンを検証し、ペイロードからメールアドレスを抽出
+def verify_token(token: str) -> Optional[str]:
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    return payload["sub"] # "sub"クレームからメールアドレスを取得
+
+
+# トークンを失効させる（ログアウト時に使用）
+def revoke_token(payload: dict) -> None:
+    if payload.get("jti") is not None:
+        token_denylist.add(payload["jti"], float(payload["exp"]))
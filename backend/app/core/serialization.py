@@ -0,0 +1,38 @@
+from typing import Any, Callable, Iterable
+
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from .instrumentation import timed
+
+
+# 高速シリアライズモード（settings.fast_serialization）で使用するJSONエンコーダー
+# 一覧エンドポイントでは、ORMオブジェクトをPydanticで検証してからエンコードする代わりに、
+# 必要な列だけを取得した行からレスポンスと同じ構造のdictを組み立て、orjsonで直接バイト列にする
+# UUID・datetime・Enumはorjsonがネイティブに扱い、PydanticのJSON出力と同じ表現になる
+# いずれの経路も、かかった時間をリクエストの計測値のシリアライズ時間に加算する
+
+
+# 行のリストをレスポンスの構造のdictに変換し、JSONのバイト列にエンコード（高速シリアライズモード）
+def dump_rows(build: Callable[[Any], dict], rows: Iterable) -> bytes:
+    with timed("serialization"):
+        return orjson.dumps([build(row) for row in rows])
+
+
+# ORMオブジェクトをスキーマで検証し、JSONのバイト列にエンコード（従来の経路）
+def dump_json(adapter: TypeAdapter, value: Any) -> bytes:
+    with timed("serialization"):
+        return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+# エンコード済みのJSONをレスポンスとして返す
+# response_modelによる検証とjsonable_encoderを経由しない
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+# 行のリスト以外の構造（複数の項目をまとめたレスポンスなど）のdictを組み立て、JSONのバイト列にエンコード
+def dump_payload(build: Callable[..., dict], *args: Any) -> bytes:
+    with timed("serialization"):
+        return orjson.dumps(build(*args))
@@ -0,0 +1,99 @@
+# 過去のイベントのアーカイブ
+# 開催日時から settings.archive_after_days 日が経過したイベントを、出欠とともにアーカイブテーブルへバッチ単位で移動する
+# settings.archive_interval_seconds を設定するとアプリケーション内で定期的に実行される。cronなどから単独で実行することもできる
+#
+# 実行方法（backendディレクトリで）:
+#   python -m app.jobs.archive
+#   python -m app.jobs.archive --older-than-days 180 --batch-size 1000
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.database import create_session, get_engine
+from app.services.archive import archive_events_before
+
+logger = logging.getLogger(__name__)
+
+# 複数のワーカー・ホストで同時に実行されないようにするアドバイザリロックのキー
+ARCHIVE_LOCK_KEY = 0x61726368
+
+
+# アーカイブを1回実行し、移動したイベント数を返す
+# 他のプロセスが実行中の場合は何もせずNoneを返す（PostgreSQLのアドバイザリロックで排他する）
+def run_archive(older_than_days: int, batch_size: int) -> Optional[int]:
+    before = datetime.utcnow() - timedelta(days=older_than_days)
+    engine = get_engine()
+    # ロックはバッチごとのコミットをまたいで保持するため、アーカイブ用のセッションとは別の接続で取得する
+    with engine.connect() as lock_connection:
+        if engine.dialect.name == "postgresql":
+            if not lock_connection.execute(select(func.pg_try_advisory_lock(ARCHIVE_LOCK_KEY))).scalar():
+                return None
+        started = time.perf_counter()
+        db = create_session()
+        try:
+            archived = archive_events_before(db, before, batch_size)
+        finally:
+            db.close()
+            if engine.dialect.name == "postgresql":
+                lock_connection.execute(select(func.pg_advisory_unlock(ARCHIVE_LOCK_KEY)))
+    logger.info("archived %d events held before %s in %.1fs", archived, before.isoformat(), time.perf_counter() - started)
+    return archived
+
+
+# アーカイブを定期的に実行するスレッド
+class ArchiveScheduler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(name="archive-scheduler", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        # 起動直後のリクエストと重ならないよう、最初の実行も1間隔待ってから行う
+        while not self._stopped.wait(self.interval):
+            try:
+                run_archive(settings.archive_after_days, settings.archive_batch_size)
+            except Exception:
+                logger.exception("archive job failed")
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+_scheduler: Optional[ArchiveScheduler] = None
+
+
+# アプリケーション起動時に呼び出し、定期的なアーカイブを開始する（archive_interval_seconds が0の場合は何もしない）
+def start_archive_scheduler() -> None:
+    global _scheduler
+    if settings.archive_interval_seconds > 0 and _scheduler is None:
+        _scheduler = ArchiveScheduler(settings.archive_interval_seconds)
+        _scheduler.start()
+
+
+# アプリケーション終了時に呼び出し、定期的なアーカイブを停止する
+def stop_archive_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="過去のイベントと出欠をアーカイブテーブルへ移動します")
+    parser.add_argument("--older-than-days", type=int, default=settings.archive_after_days, help="開催日時からの経過日数")
+    parser.add_argument("--batch-size", type=int, default=settings.archive_batch_size, help="1回のトランザクションで移動するイベント数")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if run_archive(args.older_than_days, args.batch_size) is None:
+        logger.info("another archive job is running, skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# バックグラウンドジョブのキュー
+# 書き込みの後に行う処理（集計の再計算など）を、リクエストの中で実行する代わりにjobsテーブルへ登録し、ワーカーで実行する
+# 登録は書き込みと同じトランザクションで行うため、書き込みがロールバックされればジョブも登録されず、
+# コミットされたジョブはプロセスが再起動しても失われない
+# ワーカーは SELECT ... FOR UPDATE SKIP LOCKED で他のワーカーと重複しないようにジョブを取り出し、
+# 同じ種類の実行待ちのジョブをまとめて1回のハンドラー呼び出しで処理する
+#
+# アプリケーションの各ワーカープロセス内で settings.job_workers 個のスレッドが実行する。専用のプロセスで実行する場合（backendディレクトリで）:
+#   JOB_WORKERS=4 python -m app.jobs.queue
+import logging
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import create_session
+from app.core.metrics import Counter, Histogram, HistogramFamily
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+# ジョブを登録したセッションを示すSession.infoのキー（コミット後にワーカーを起こすために使う）
+ENQUEUED_INFO_KEY = "jobs_enqueued"
+# 再試行の待ち時間の上限（秒）
+MAX_RETRY_DELAY_SECONDS = 600.0
+
+# ハンドラー: 同じ種類のジョブの引数のリストを受け取り、ジョブを取り出したセッションで処理する
+# ジョブの削除と同じトランザクションでコミットされる。コミット後に行う処理（キャッシュの無効化・配信など）があれば関数として返す
+JobHandler = Callable[[Session, List[dict]], Optional[Callable[[], None]]]
+_handlers: Dict[str, JobHandler] = {}
+
+# ジョブの統計情報
+jobs_processed = Counter() # 実行に成功したジョブ数
+jobs_retried = Counter() # 失敗して再試行を予定したジョブ数
+jobs_dead = Counter() # 再試行の上限に達したジョブ数
+job_wait_seconds = Histogram() # 実行予定日時から実行を開始するまでの時間
+job_duration_seconds = HistogramFamily(
+    "job_duration_seconds", "Time spent running a batch of jobs.", ["kind"],
+)
+
+
+# ジョブのハンドラーを登録するデコレーター
+def job_handler(kind: str):
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+    return register
+
+
+# ジョブを登録する（コミットは呼び出し元の書き込みと一緒に行う）
+# delay: 実行を開始するまでの秒数
+def enqueue(db: Session, kind: str, payload: dict, delay: float = 0.0) -> None:
+    now = datetime.utcnow()
+    db.add(Job(kind=kind, payload=payload, run_at=now + timedelta(seconds=delay), created_at=now))
+    db.info[ENQUEUED_INFO_KEY] = True
+
+
+# ジョブを登録したトランザクションのコミット後に、このプロセスのワーカーを起こす
+# 他のプロセスのワーカーは settings.job_poll_interval_seconds ごとの確認で取り出す
+@event.listens_for(Session, "after_commit")
+def _wake_workers(session: Session) -> None:
+    if session.info.pop(ENQUEUED_INFO_KEY, False) and _pool is not None:
+        _pool.wake()
+
+
+# 失敗した回数に応じた再試行までの待ち時間（指数バックオフ）
+def retry_delay(attempts: int) -> float:
+    return min(settings.job_retry_base_seconds * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+
+
+# 実行待ちのジョブを1回分取り出して実行し、処理したジョブ数を返す（実行待ちのジョブがなければ0）
+# 最も古いジョブと同じ種類のジョブを最大 batch_size 件まとめて取り出し、行ロックを保持したままハンドラーを実行する
+def run_pending_jobs(db: Session, batch_size: int) -> int:
+    now = datetime.utcnow()
+    due = select(Job).where(Job.status == "pending", Job.run_at <= now).order_by(Job.run_at, Job.id)
+    first = db.scalars(due.limit(1).with_for_update(skip_locked=True)).first()
+    if first is None:
+        db.rollback()
+        return 0
+    jobs = [first]
+    if batch_size > 1:
+        jobs += db.scalars(
+            due.where(Job.kind == first.kind, Job.id != first.id).limit(batch_size - 1).with_for_update(skip_locked=True)
+        ).all()
+    for job in jobs:
+        job_wait_seconds.observe(max((now - job.run_at).total_seconds(), 0.0))
+
+    handler = _handlers.get(first.kind)
+    started = time.perf_counter()
+    try:
+        if handler is None:
+            raise LookupError(f"no handler registered for job kind {first.kind!r}")
+        # ハンドラーが失敗しても行ロックを保持したまま失敗を記録できるよう、セーブポイントの中で実行する
+        with db.begin_nested():
+            after_commit = handler(db, [job.payload for job in jobs])
+    except Exception as exc:
+        logger.exception("job %s failed (%d jobs)", first.kind, len(jobs))
+        _record_failure(jobs, exc, now)
+        db.commit()
+        return len(jobs)
+    finally:
+        job_duration_seconds.labels(first.kind).observe(time.perf_counter() - started)
+
+    db.execute(delete(Job).where(Job.id.in_([job.id for job in jobs])).execution_options(synchronize_session=False))
+    db.commit()
+    jobs_processed.inc(len(jobs))
+    if after_commit is not None:
+        after_commit()
+    return len(jobs)
+
+
+# 失敗したジョブの再試行を予定する（上限に達したジョブは "dead" にして実行待ちから外す）
+def _record_failure(jobs: List[Job], exc: Exception, now: datetime) -> None:
+    for job in jobs:
+        job.attempts += 1
+        job.last_error = f"{type(exc).__name__}: {exc}"
+        if job.attempts >= settings.job_max_attempts:
+            job.status = "dead"
+            jobs_dead.inc()
+        else:
+            job.run_at = now + timedelta(seconds=retry_delay(job.attempts))
+            jobs_retried.inc()
+
+
+# 状態・種類ごとのジョブ数（キューの深さ）
+def queue_depth(db: Session) -> List[dict]:
+    rows = db.execute(select(Job.status, Job.kind, func.count()).group_by(Job.status, Job.kind)).all()
+    return [{"status": status, "kind": kind, "count": count} for status, kind, count in rows]
+
+
+# 最後に集計したキューの深さと、その時刻（UNIX時刻）。未集計・集計に失敗し続けている場合はNone
+_queue_depth: Optional[List[dict]] = None
+_queue_depth_checked_at: Optional[float] = None
+
+
+# キューの深さを定期的に集計するスレッド
+# /metrics・/internal/jobs はリクエストごとにデータベースへ問い合わせず、集計済みの値を返す
+# （接続プールが埋まっている・データベースが停止している間も、メトリクスの取得が待たされない）
+class QueueDepthMonitor(threading.Thread):
+    def __init__(self):
+        super().__init__(name="job-queue-depth", daemon=True)
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        global _queue_depth, _queue_depth_checked_at
+        while not self._stopped.is_set():
+            try:
+                db = create_session()
+                try:
+                    _queue_depth = queue_depth(db)
+                finally:
+                    db.close()
+                _queue_depth_checked_at = time.time()
+            except Exception:
+                logger.warning("failed to measure the job queue depth", exc_info=True)
+            self._stopped.wait(settings.job_queue_depth_interval_seconds)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+# 集計済みのキューの深さ（未集計の場合はNone）
+def cached_queue_depth() -> Optional[List[dict]]:
+    return _queue_depth
+
+
+# ジョブを実行するワーカースレッド
+# 実行待ちのジョブがなくなったら、ジョブの登録で起こされるまで待つ
+# 他のプロセスで登録されたジョブを確認するため、先頭のワーカーだけは確認の間隔が経過した時点でも起きる
+class JobWorker(threading.Thread):
+    def __init__(self, pool: "JobWorkerPool", index: int):
+        super().__init__(name=f"job-worker-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+
+    def run(self) -> None:
+        while not self.pool.stopped.is_set():
+            try:
+                db = create_session()
+                try:
+                    processed = run_pending_jobs(db, settings.job_batch_size)
+                finally:
+                    db.close()
+            except Exception:
+                logger.exception("job worker failed")
+                processed = 0
+            if processed:
+                self.pool.wake() # 実行待ちのジョブが残っている可能性があるため、待機中のワーカーにも取り出させる
+            else:
+                self.pool.wait(settings.job_poll_interval_seconds if self.index == 0 else None)
+
+
+# ワーカースレッドのプール
+class JobWorkerPool:
+    def __init__(self, size: int):
+        self.stopped = threading.Event()
+        self._wakeup = threading.Event()
+        self.workers = [JobWorker(self, index) for index in range(size)]
+
+    def start(self) -> None:
+        for worker in self.workers:
+            worker.start()
+
+    # 新しいジョブが登録されたことを待機中のワーカーに知らせる
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    # 次のジョブの登録か、timeout 秒が経過するまで待つ（Noneの場合は起こされるまで待つ）
+    def wait(self, timeout: Optional[float]) -> None:
+        if self._wakeup.wait(timeout):
+            self._wakeup.clear()
+
+    # 実行中のジョブが終わるまで最大 timeout 秒待って停止する（終わらなかったジョブはロックが外れた後に再実行される）
+    def stop(self, timeout: float) -> None:
+        self.stopped.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker.join(max(deadline - time.monotonic(), 0.0))
+
+
+_pool: Optional[JobWorkerPool] = None
+_depth_monitor: Optional[QueueDepthMonitor] = None
+
+
+# アプリケーション起動時に呼び出し、ジョブのワーカーとキューの深さの集計を開始する
+# job_workers が0の場合は登録のみ行い、実行は他のプロセスに任せる
+def start_job_workers() -> None:
+    global _pool, _depth_monitor
+    if settings.job_workers > 0 and _pool is None:
+        _pool = JobWorkerPool(settings.job_workers)
+        _pool.start()
+    if _depth_monitor is None:
+        _depth_monitor = QueueDepthMonitor()
+        _depth_monitor.start()
+
+
+# アプリケーション終了時に呼び出し、ジョブのワーカーとキューの深さの集計を停止する
+def stop_job_workers(timeout: float = 10.0) -> None:
+    global _pool, _depth_monitor
+    if _depth_monitor is not None:
+        _depth_monitor.stop()
+        _depth_monitor = None
+    if _pool is not None:
+        _pool.stop(timeout)
+        _pool = None
+
+
+# 集計済みのキューの深さ、このプロセスのワーカー数と、実行したジョブの統計情報
+def job_stats() -> dict:
+    return {
+        "queue": _queue_depth,
+        "queue_checked_at": _queue_depth_checked_at,
+        "workers": len(_pool.workers) if _pool is not None else 0,
+        "processed": jobs_processed.value,
+        "retried": jobs_retried.value,
+        "dead": jobs_dead.value,
+        "wait_seconds": job_wait_seconds.snapshot(),
+    }
+
+
+# ジョブ専用のプロセスとして実行する
+def main():
+    import app.services.attendance # noqa: F401 ハンドラーを登録する
+
+    logging.basicConfig(level=logging.INFO)
+    if settings.job_workers <= 0:
+        raise SystemExit("JOB_WORKERS must be at least 1")
+    start_job_workers()
+    stopped = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: stopped.set())
+    logger.info("running %d job workers", settings.job_workers)
+    stopped.wait()
+    stop_job_workers()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,49 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 # APIエンドポイントのルーターをインポート
-from app.api import auth, events, attendances
+from app.api import auth, events, attendances, dashboard, internal
+from app.core.config import settings
+from app.core.database import pool_timeouts, pool_wait_seconds
+from app.core.instrumentation import InstrumentedRoute, RequestMetricsMiddleware, render_request_metrics
+from app.core.lifecycle import shutdown, startup
+from app.core.metrics import format_counter, format_gauge, format_histogram
+from app.core import rate_limit
+from app.core.replicas import ReadYourWritesMiddleware
+from app.core.security import require_internal_token
+from app.jobs import queue as job_queue
+
+
+# アプリケーションの起動・終了時の処理
+# 複数ワーカーで起動する場合は、ワーカープロセスごとに実行される
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup() # 接続プールなどを準備してからリクエストの受け付けを開始する
+    yield
+    await shutdown() # SSEの配信を打ち切り、接続を閉じる
+
 
 # FastAPIアプリケーションのインスタンスを作成
 # titleとversionはOpenAPIドキュメントに表示される
-app = FastAPI(title="Attendance App API", version="1.0.0")
+app = FastAPI(title="Attendance App API", version="1.0.0", lifespan=lifespan)
+# このファイルで定義するルートも計測対象にする（各APIルーターは個別に指定済み）
+app.router.route_class = InstrumentedRoute
+
+# リクエストごとの計測ミドルウェアを追加
+# SQLの数・DB時間・プール待ち・認証・処理・シリアライズ時間をServer-Timingヘッダーで返し、/metrics に集計する
+app.add_middleware(RequestMetricsMiddleware)
+
+# 書き込みに成功したユーザーを記録するミドルウェアを追加
+# レプリカが設定されている場合、直後の同じユーザーの読み取りをプライマリへ振り分ける
+app.add_middleware(ReadYourWritesMiddleware)
+
+# アドミッション制御のミドルウェアを追加
+# ユーザー・接続元IPアドレスごとのレート制限（429）と、同時実行数の上限による負荷の切り捨て（503）を、
+# 認証やデータベースの接続を待つ前に行う。拒否したレスポンスにもCORSヘッダーが付くよう、CORSミドルウェアの内側に置く
+app.add_middleware(rate_limit.AdmissionControlMiddleware)
 
 # CORSミドルウェアを追加
 # クロスオリジンリクエストを許可するための設定
@@ -16,18 +53,59 @@ app.add_middleware(
     allow_credentials=True, # クッキーなどの資格情報を許可
     allow_methods=["*"], # すべてのHTTPメソッドを許可
     allow_headers=["*"], # すべてのHTTPヘッダーを許可
+    expose_headers=["X-Next-Cursor", "Server-Timing"], # フロントエンドから読み取れるレスポンスヘッダー（ページングのカーソル、計測値）
 )
 
+# 非同期モード（DATABASE_ASYNC）では、データベースへのアクセスを非同期セッションで行うルーターに差し替える
+# パス・パラメーター・レスポンスはどちらのモードでも同じ
+if settings.database_async:
+    from app.api import auth_async as auth, events_async as events, attendances_async as attendances, dashboard_async as dashboard
+
 # 各APIルーターをアプリケーションにインクルード
 # prefix: 各ルーターのパスの前に付加されるプレフィックス
 # tags: OpenAPIドキュメントでのグループ化に使用されるタグ
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(events.router, prefix="/events", tags=["events"])
 app.include_router(attendances.router, prefix="/attendances", tags=["attendances"])
+app.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
+app.include_router(internal.router, prefix="/internal", tags=["internal"])
 
 
 # ルートエンドポイントの定義
 @app.get("/")
 def read_root():
     """APIのルートエンドポイント。"""
-    return {"message": "Attendance App API"}
\ No newline at end of file
+    return {"message": "Attendance App API"}
+
+
+# Prometheus形式のメトリクスエンドポイント（/internal/* と同じく共有シークレットを持つリクエストだけに応答する）
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_internal_token)])
+def read_metrics():
+    """ルートごとのリクエスト・コネクションプール・アドミッション制御・バックグラウンドジョブのメトリクスをPrometheusのテキスト形式で返します。"""
+    lines = render_request_metrics()
+    lines.extend([
+        "# HELP db_pool_wait_seconds Time spent waiting for a pooled connection.",
+        "# TYPE db_pool_wait_seconds histogram",
+        *format_histogram("db_pool_wait_seconds", {}, pool_wait_seconds.snapshot()),
+    ])
+    lines.extend(format_counter("db_pool_timeouts_total", "Pool checkouts that timed out.", pool_timeouts))
+    lines.extend(format_counter("rate_limited_user_total", "Requests rejected by the per-user rate limit.", rate_limit.user_rate_limited))
+    lines.extend(format_counter("rate_limited_auth_total", "/auth requests rejected by the per-IP rate limit.", rate_limit.auth_rate_limited))
+    lines.extend(format_counter("load_shed_total", "Requests rejected because the concurrency limit was reached.", rate_limit.load_shed))
+    lines.extend(format_gauge("requests_in_flight", "Requests counted by the concurrency limiter.", [({}, rate_limit.concurrency_limiter.in_flight)]))
+    # キューの深さはすべてのプロセスで共通のため、jobsテーブルから定期的に集計した値を返す（未集計の場合は出力しない）
+    depth = job_queue.cached_queue_depth() or []
+    lines.extend(format_gauge(
+        "job_queue_depth", "Jobs in the queue by status and kind.",
+        [({"status": row["status"], "kind": row["kind"]}, row["count"]) for row in depth],
+    ))
+    lines.extend(format_counter("jobs_processed_total", "Jobs completed by this process.", job_queue.jobs_processed))
+    lines.extend(format_counter("jobs_retried_total", "Failed jobs scheduled for a retry by this process.", job_queue.jobs_retried))
+    lines.extend(format_counter("jobs_dead_total", "Jobs that exhausted their retries in this process.", job_queue.jobs_dead))
+    lines.extend([
+        "# HELP job_wait_seconds Time between a job becoming due and a worker starting it.",
+        "# TYPE job_wait_seconds histogram",
+        *format_histogram("job_wait_seconds", {}, job_queue.job_wait_seconds.snapshot()),
+    ])
+    lines.extend(job_queue.job_duration_seconds.expose())
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
@@ -2,7 +2,10 @@
 from .user import User
 from .event import Event
 from .attendance import Attendance, AttendanceStatus
+from .event_summary import EventAttendanceSummary
+from .archive import EventArchive, AttendanceArchive
+from .job import Job
 
 # このパッケージがインポートされたときに公開されるシンボルを定義
 # これにより、`from app.models import User`のように直接インポートできるようになる
-__all__ = ["User", "Event", "Attendance", "AttendanceStatus"]
\ No newline at end of file
+__all__ = ["User", "Event", "Attendance", "AttendanceStatus", "EventAttendanceSummary", "EventArchive", "AttendanceArchive", "Job"]
\ No newline at end of file
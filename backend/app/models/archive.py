@@ -0,0 +1,51 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, Index # SQLAlchemyのデータ型とカラム定義をインポート
+from sqlalchemy.dialects.postgresql import UUID # PostgreSQL固有のUUID型をインポート
+
+from app.core.database import Base # データベースのベースクラスをインポート
+from .attendance import AttendanceStatus # 出欠ステータスのEnumをインポート
+
+
+# アーカイブしたイベントのモデル（データベーステーブルに対応）
+# 列はeventsテーブルと同じで、アーカイブした日時・理由とアーカイブ時点の出欠集計を追加で保持する
+class EventArchive(Base):
+    __tablename__ = "events_archive" # テーブル名を指定
+    __table_args__ = (
+        # 履歴を含む一覧のカーソルページング（event_date, id の順）用
+        Index("ix_events_archive_event_date_id", "event_date", "id"),
+        # 作成者ごとの過去のイベントの検索用
+        Index("ix_events_archive_creator_id_event_date", "creator_id", "event_date"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True) # 元のイベントID
+    title = Column(String, nullable=False) # イベントタイトル
+    description = Column(Text) # イベント説明
+    event_date = Column(DateTime, nullable=False) # イベント開催日時
+    creator_id = Column(UUID(as_uuid=True), nullable=False) # 作成者ID（ユーザーの削除を妨げないよう外部キーは設定しない）
+    created_at = Column(DateTime) # 作成日時
+    updated_at = Column(DateTime) # 更新日時
+    archived_at = Column(DateTime, nullable=False) # アーカイブ日時
+    archived_reason = Column(String, nullable=False) # アーカイブした理由（"aged": 開催から一定期間が経過、"deleted": 作成者が削除）
+    # アーカイブ時点の出欠ステータスごとの件数（カラム名はAttendanceStatusの値と一致させる）
+    attending = Column(Integer, nullable=False, default=0) # 参加
+    not_attending = Column(Integer, nullable=False, default=0) # 不参加
+    maybe = Column(Integer, nullable=False, default=0) # 未定
+
+
+# アーカイブした出欠のモデル（データベーステーブルに対応）
+# 列はattendancesテーブルと同じで、アーカイブした日時を追加で保持する
+class AttendanceArchive(Base):
+    __tablename__ = "attendances_archive" # テーブル名を指定
+    __table_args__ = (
+        # イベント単位・ユーザー単位の過去の出欠の検索用
+        Index("ix_attendances_archive_event_id", "event_id"),
+        Index("ix_attendances_archive_user_id", "user_id"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True) # 元の出欠ID
+    event_id = Column(UUID(as_uuid=True), nullable=False) # イベントID
+    user_id = Column(UUID(as_uuid=True), nullable=False) # ユーザーID
+    status = Column(Enum(AttendanceStatus), nullable=False) # 出欠ステータス
+    comment = Column(Text) # コメント
+    created_at = Column(DateTime) # 作成日時
+    updated_at = Column(DateTime) # 更新日時
+    archived_at = Column(DateTime, nullable=False) # アーカイブ日時
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from enum import Enum as PyEnum # PythonのEnumクラスをインポート
 
-from sqlalchemy import Column, Text, DateTime, ForeignKey, Enum # SQLAlchemyのデータ型とカラム定義をインポート
+from sqlalchemy import Column, Text, DateTime, ForeignKey, Enum, Index, UniqueConstraint # SQLAlchemyのデータ型とカラム定義をインポート
 from sqlalchemy.dialects.postgresql import UUID # PostgreSQL固有のUUID型をインポート
 from sqlalchemy.orm import relationship # リレーションシップ定義をインポート
 
@@ -19,9 +19,16 @@ class AttendanceStatus(PyEnum):
 # 出欠モデル（データベーステーブルに対応）
 class Attendance(Base):
     __tablename__ = "attendances" # テーブル名を指定
+    __table_args__ = (
+        # 同じイベントに同じユーザーが複数の出欠を登録できないようにする一意制約
+        # event_id 先頭のインデックスとしてイベント単位の出欠一覧取得にも使われる
+        UniqueConstraint("event_id", "user_id", name="uq_attendances_event_id_user_id"),
+        # ユーザー単位の出欠一覧取得用の複合インデックス
+        Index("ix_attendances_user_id_event_id", "user_id", "event_id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4) # 主キー、UUID型、デフォルトで新しいUUIDを生成
-    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id"), nullable=False) # イベントID（外部キー）
+    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), nullable=False) # イベントID（外部キー、イベントの削除時にデータベース側で削除）
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False) # ユーザーID（外部キー）
     status = Column(Enum(AttendanceStatus), nullable=False) # 出欠ステータス（Enum型）
     comment = Column(Text) # コメント（テキスト型）
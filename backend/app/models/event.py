@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey # SQLAlchemyのデータ型とカラム定義をインポート
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Index # SQLAlchemyのデータ型とカラム定義をインポート
 from sqlalchemy.dialects.postgresql import UUID # PostgreSQL固有のUUID型をインポート
 from sqlalchemy.orm import relationship # リレーションシップ定義をインポート
 
@@ -11,6 +11,12 @@ from app.core.database import Base # データベースのベースクラスを
 # イベントモデル（データベーステーブルに対応）
 class Event(Base):
     __tablename__ = "events" # テーブル名を指定
+    __table_args__ = (
+        # 一覧のカーソルページング（event_date, id の順）用の複合インデックス
+        Index("ix_events_event_date_id", "event_date", "id"),
+        # 作成者で絞り込んだ一覧のページング用の複合インデックス
+        Index("ix_events_creator_id_event_date_id", "creator_id", "event_date", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4) # 主キー、UUID型、デフォルトで新しいUUIDを生成
     title = Column(String, nullable=False) # イベントタイトル（文字列、必須）
@@ -18,10 +24,20 @@ class Event(Base):
     event_date = Column(DateTime, nullable=False) # イベント開催日時（日時型、必須）
     creator_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False) # 作成者ID（外部キー、必須）
     created_at = Column(DateTime, default=datetime.utcnow) # 作成日時（デフォルトで現在時刻）
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # 更新日時（更新時に現在時刻に自動更新）
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow) # 更新日時（更新時に現在時刻に自動更新、必須）
 
     # リレーションシップの定義
     # "User"モデルとの多対一の関係（Eventは一つのUserによって作成される）
     creator = relationship("User", back_populates="created_events")
     # "Attendance"モデルとの一対多の関係（Eventは複数のAttendanceを持つ）
-    attendances = relationship("Attendance", back_populates="event")
\ No newline at end of file
+    # 削除はデータベースの ON DELETE CASCADE に任せ、出欠の多いイベントでも出欠をORMに読み込まない
+    attendances = relationship(
+        "Attendance", back_populates="event",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
+    # "EventAttendanceSummary"モデルとの一対一の関係（出欠の集計）
+    # 削除はデータベースの ON DELETE CASCADE に任せ、ORMからは読み込まない
+    attendance_summary = relationship(
+        "EventAttendanceSummary", back_populates="event", uselist=False,
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
\ No newline at end of file
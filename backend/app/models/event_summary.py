@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, DateTime, ForeignKey # SQLAlchemyのデータ型とカラム定義をインポート
+from sqlalchemy.dialects.postgresql import UUID # PostgreSQL固有のUUID型をインポート
+from sqlalchemy.orm import relationship # リレーションシップ定義をインポート
+
+from app.core.database import Base # データベースのベースクラスをインポート
+
+
+# イベントごとの出欠集計モデル（データベーステーブルに対応）
+# 出欠の登録・更新時に増分で更新し、一覧表示で出欠行を読み込まずに件数を返すために使用する
+class EventAttendanceSummary(Base):
+    __tablename__ = "event_attendance_summaries" # テーブル名を指定
+
+    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), primary_key=True) # イベントID（主キー・外部キー）
+    # 出欠ステータスごとの件数（カラム名はAttendanceStatusの値と一致させる）
+    attending = Column(Integer, nullable=False, default=0) # 参加
+    not_attending = Column(Integer, nullable=False, default=0) # 不参加
+    maybe = Column(Integer, nullable=False, default=0) # 未定
+    version = Column(Integer, nullable=False, default=0) # 出欠が変更されるたびに増加するバージョン番号
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # 更新日時
+
+    # リレーションシップの定義
+    # "Event"モデルとの一対一の関係
+    event = relationship("Event", back_populates="attendance_summary")
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, JSON, Index, text # SQLAlchemyのデータ型とカラム定義をインポート
+
+from app.core.database import Base # データベースのベースクラスをインポート
+
+
+# バックグラウンドジョブのモデル（データベーステーブルに対応）
+# 書き込みと同じトランザクションで登録し、コミット後にワーカーが取り出して実行する。実行に成功した行は削除する
+class Job(Base):
+    __tablename__ = "jobs" # テーブル名を指定
+    __table_args__ = (
+        # 実行待ちのジョブを実行予定日時の順に取り出すための部分インデックス
+        Index("ix_jobs_pending_run_at", "run_at", "id", postgresql_where=text("status = 'pending'")),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True) # 主キー（登録順の連番）
+    kind = Column(String, nullable=False) # ジョブの種類（登録されたハンドラーの名前）
+    payload = Column(JSON, nullable=False) # ハンドラーに渡す引数
+    status = Column(String, nullable=False, default="pending") # 状態（"pending": 実行待ち、"dead": 再試行の上限に達した）
+    attempts = Column(Integer, nullable=False, default=0) # 失敗した回数
+    last_error = Column(Text) # 最後に失敗したときのエラー内容
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow) # 実行予定日時（再試行時は待ち時間の分だけ後ろにずらす）
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow) # 登録日時
@@ -1,8 +1,12 @@
 # 他のスキーマファイルからクラスをインポート
 from .user import User, UserCreate, UserUpdate, UserInDB
-from .auth import Token, TokenData, LoginRequest
-from .event import Event, EventCreate, EventUpdate, EventWithAttendances
-from .attendance import Attendance, AttendanceCreate, AttendanceUpdate, AttendanceWithUser, AttendanceWithEvent
+from .auth import Token, TokenData, Principal, LoginRequest
+from .event import Event, EventCreate, EventUpdate, EventWithAttendances, AttendanceSummary
+from .attendance import (
+    Attendance, AttendanceCreate, AttendanceUpdate, AttendanceWithUser, AttendanceWithEvent,
+    AttendanceBatchItem, AttendanceBatchRequest, AttendanceBatchResult,
+)
+from .dashboard import Dashboard, DashboardEvent
 
 # 循環参照を解決するためにmodel_rebuildを呼び出し
 EventWithAttendances.model_rebuild()
@@ -11,7 +15,9 @@ EventWithAttendances.model_rebuild()
 # これにより、`from app.schemas import User`のように直接インポートできるようになる
 __all__ = [
     "User", "UserCreate", "UserUpdate", "UserInDB",
-    "Token", "TokenData", "LoginRequest",
-    "Event", "EventCreate", "EventUpdate", "EventWithAttendances",
-    "Attendance", "AttendanceCreate", "AttendanceUpdate", "AttendanceWithUser", "AttendanceWithEvent"
+    "Token", "TokenData", "Principal", "LoginRequest",
+    "Event", "EventCreate", "EventUpdate", "EventWithAttendances", "AttendanceSummary",
+    "Attendance", "AttendanceCreate", "AttendanceUpdate", "AttendanceWithUser", "AttendanceWithEvent",
+    "AttendanceBatchItem", "AttendanceBatchRequest", "AttendanceBatchResult",
+    "Dashboard", "DashboardEvent",
 ]
\ No newline at end of file
@@ -1,8 +1,8 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 
-from pydantic import BaseModel # PydanticのBaseModelをインポート
+from pydantic import BaseModel, EmailStr, model_validator # PydanticのBaseModelとバリデーターをインポート
 
 from app.models.attendance import AttendanceStatus # 出欠ステータスEnumをインポート
 from .user import User # ユーザーモデルのスキーマをインポート
@@ -51,4 +51,30 @@ class AttendanceWithEvent(Attendance):
     event: Event # イベント情報
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# 一括登録の1件分のスキーマ（イベント作成者が参加者の出欠をまとめて登録・更新する）
+# 対象ユーザーは user_id または email のどちらか一方で指定する
+class AttendanceBatchItem(AttendanceBase):
+    user_id: Optional[UUID] = None # 対象ユーザーのID
+    email: Optional[EmailStr] = None # 対象ユーザーのメールアドレス
+
+    @model_validator(mode="after")
+    def check_user_reference(self):
+        if (self.user_id is None) == (self.email is None):
+            raise ValueError("Specify exactly one of user_id or email")
+        return self
+
+
+# 一括登録リクエストのスキーマ
+class AttendanceBatchRequest(BaseModel):
+    items: List[AttendanceBatchItem] # 登録・更新する出欠のリスト
+
+
+# 一括登録の1件ごとの結果のスキーマ
+class AttendanceBatchResult(BaseModel):
+    index: int # リクエスト内の位置（0始まり）
+    result: Literal["created", "updated", "error"] # 処理結果
+    attendance_id: Optional[UUID] = None # 登録・更新された出欠のID
+    detail: Optional[str] = None # エラー内容
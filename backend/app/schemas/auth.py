@@ -1,3 +1,6 @@
+from datetime import datetime
+from uuid import UUID
+
 from pydantic import BaseModel, EmailStr # PydanticのBaseModelとEmailStr型をインポート
 
 
@@ -12,6 +15,20 @@ class TokenData(BaseModel):
     email: str | None = None # ユーザーのメールアドレス（サブジェクト）
 
 
+# 認証済みユーザーを表す軽量なプリンシパル
+# ステートレス認証モードではJWTのクレームから組み立て、DBアクセスなしでエンドポイントに渡す
+# レスポンスに必要なプロフィール項目（Userスキーマと同じ項目）を保持する
+class Principal(BaseModel):
+    id: UUID # ユーザーID（"uid"クレーム）
+    email: str # メールアドレス（"sub"クレーム）
+    name: str # 名前
+    created_at: datetime # 作成日時
+    updated_at: datetime # 更新日時
+
+    class Config:
+        from_attributes = True # ORMのUserからも作成できるようにする
+
+
 # ログインリクエストのスキーマ
 class LoginRequest(BaseModel):
     email: EmailStr # メールアドレス（EmailStr型でメール形式をバリデーション）
@@ -0,0 +1,19 @@
+from typing import List, Optional
+
+from pydantic import BaseModel # PydanticのBaseModelをインポート
+
+from .auth import Principal # 認証済みユーザーのスキーマをインポート
+from .event import Event # イベントモデルのスキーマをインポート
+from .attendance import Attendance # 出欠モデルのスキーマをインポート
+
+
+# ダッシュボードに表示するイベントのスキーマ
+class DashboardEvent(Event):
+    my_attendance: Optional[Attendance] = None # 現在のユーザーの出欠（未回答の場合はNone）
+
+
+# ダッシュボードのレスポンススキーマ
+# 画面の表示に必要な現在のユーザー・今後のイベント・自分の出欠を1回のリクエストで返す
+class Dashboard(BaseModel):
+    user: Principal # 現在のユーザー
+    events: List[DashboardEvent] = [] # 今後のイベント（開催日時の昇順）
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Optional, List
 from uuid import UUID
 
-from pydantic import BaseModel # PydanticのBaseModelをインポート
+from pydantic import BaseModel, field_validator # PydanticのBaseModelとバリデーターをインポート
 
 from .user import User # ユーザーモデルのスキーマをインポート
 # AttendanceWithUserは後で定義されるため、文字列として参照
@@ -28,6 +28,16 @@ class EventUpdate(BaseModel):
     event_date: Optional[datetime] = None # 開催日時（任意）
 
 
+# 出欠ステータスごとの件数のスキーマ
+class AttendanceSummary(BaseModel):
+    attending: int = 0 # 参加
+    not_attending: int = 0 # 不参加
+    maybe: int = 0 # 未定
+
+    class Config:
+        from_attributes = True # ORMモードを有効にする
+
+
 # イベントのレスポンススキーマ
 class Event(EventBase):
     id: UUID # イベントID
@@ -35,6 +45,13 @@ class Event(EventBase):
     created_at: datetime # 作成日時
     updated_at: datetime # 更新日時
     creator: User # 作成者情報
+    attendance_summary: AttendanceSummary = AttendanceSummary() # 出欠の集計
+
+    # 出欠がまだ1件もないイベントは集計行が存在しないため、すべて0件として扱う
+    @field_validator("attendance_summary", mode="before")
+    @classmethod
+    def default_attendance_summary(cls, value):
+        return AttendanceSummary() if value is None else value
 
     class Config:
         from_attributes = True # ORMモードを有効にする
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from typing import Sequence
+from uuid import UUID
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.pubsub import broker # イベント変更の配信用pub/subをインポート
+from app.core.response_cache import response_cache # レスポンスキャッシュをインポート
+from app.core.config import settings # アプリケーション設定をインポート
+from app.models import ( # イベント・出欠・出欠集計・ユーザーとアーカイブのモデルをインポート
+    Attendance, AttendanceArchive, AttendanceStatus, Event, EventArchive, EventAttendanceSummary, User,
+)
+
+# アーカイブへコピーする列（アーカイブ側は同じ列 + archived_at。イベントはさらにアーカイブ時点の出欠集計を持つ）
+EVENT_COLUMNS = ("id", "title", "description", "event_date", "creator_id", "created_at", "updated_at")
+ATTENDANCE_COLUMNS = ("id", "event_id", "user_id", "status", "comment", "created_at", "updated_at")
+SUMMARY_COLUMNS = tuple(status.value for status in AttendanceStatus)
+
+# アーカイブした理由（events_archive.archived_reason）
+# 作成者が削除したイベントは監査用に残すだけで、履歴を含む一覧には返さない
+ARCHIVE_REASON_AGED = "aged" # 開催から archive_after_days 日が経過したため
+ARCHIVE_REASON_DELETED = "deleted" # 作成者が削除したため（EVENT_DELETE_MODE=archive）
+
+
+# 通常の読み取りの対象とするイベント（ホットデータ）の開催日時の下限
+# これより前のイベントはアーカイブの対象で、履歴の取得を指定した場合にのみ返す
+def hot_horizon() -> datetime:
+    return datetime.utcnow() - timedelta(days=settings.archive_after_days)
+
+
+# アーカイブしたイベントの列の射影（services.event.event_row_columns と同じラベル）
+# 作成者（users）を結合したクエリで使用し、出欠集計はアーカイブ時点の件数を返す
+def archived_event_row_columns(prefix: str = ""):
+    return (
+        EventArchive.id.label(f"{prefix}id"),
+        EventArchive.title.label(f"{prefix}title"),
+        EventArchive.description.label(f"{prefix}description"),
+        EventArchive.event_date.label(f"{prefix}event_date"),
+        EventArchive.creator_id.label(f"{prefix}creator_id"),
+        EventArchive.created_at.label(f"{prefix}created_at"),
+        EventArchive.updated_at.label(f"{prefix}updated_at"),
+        User.email.label(f"{prefix}creator_email"),
+        User.name.label(f"{prefix}creator_name"),
+        User.created_at.label(f"{prefix}creator_created_at"),
+        User.updated_at.label(f"{prefix}creator_updated_at"),
+        EventArchive.attending.label(f"{prefix}attending"),
+        EventArchive.not_attending.label(f"{prefix}not_attending"),
+        EventArchive.maybe.label(f"{prefix}maybe"),
+    )
+
+
+# アーカイブした出欠の列の射影（出欠の列と同じラベル）
+ARCHIVED_ATTENDANCE_ROW_COLUMNS = tuple(getattr(AttendanceArchive, column).label(column) for column in ATTENDANCE_COLUMNS)
+
+
+# 指定したイベントとその出欠をアーカイブテーブルへ移動し、移動したイベント数を返す（コミットは呼び出し元で行う）
+# reason: アーカイブした理由（ARCHIVE_REASON_AGED または ARCHIVE_REASON_DELETED）
+# 行をORMに読み込まず、INSERT ... SELECT でコピーしてから DELETE で削除する集合演算で行う
+# 出欠・出欠集計はイベントの削除時にデータベースの ON DELETE CASCADE で削除される
+def archive_events(db: Session, event_ids: Sequence[UUID], reason: str) -> int:
+    if not event_ids:
+        return 0
+    result = None
+    for stmt in _archive_statements(event_ids, reason):
+        result = db.execute(stmt)
+    return result.rowcount
+
+
+# 指定したイベントとその出欠をアーカイブテーブルへ移動（非同期セッション版）
+async def archive_events_async(db: AsyncSession, event_ids: Sequence[UUID], reason: str) -> int:
+    if not event_ids:
+        return 0
+    result = None
+    for stmt in _archive_statements(event_ids, reason):
+        result = await db.execute(stmt)
+    return result.rowcount
+
+
+# アーカイブへの移動を行うSQL（出欠のコピー、イベントのコピー、イベントの削除の順）
+def _archive_statements(event_ids: Sequence[UUID], reason: str) -> list:
+    archived_at = literal(datetime.utcnow())
+    return [
+        insert(AttendanceArchive).from_select(
+            [*ATTENDANCE_COLUMNS, "archived_at"],
+            select(*(getattr(Attendance, column) for column in ATTENDANCE_COLUMNS), archived_at)
+            .where(Attendance.event_id.in_(event_ids)),
+        ),
+        insert(EventArchive).from_select(
+            [*EVENT_COLUMNS, "archived_at", "archived_reason", *SUMMARY_COLUMNS],
+            select(
+                *(getattr(Event, column) for column in EVENT_COLUMNS),
+                archived_at,
+                literal(reason),
+                *(func.coalesce(getattr(EventAttendanceSummary, column), 0) for column in SUMMARY_COLUMNS),
+            )
+            .outerjoin(EventAttendanceSummary, EventAttendanceSummary.event_id == Event.id)
+            .where(Event.id.in_(event_ids)),
+        ),
+        delete(Event).where(Event.id.in_(event_ids)).execution_options(synchronize_session=False),
+    ]
+
+
+# 開催日時が before より前のイベントを、batch_size 件ずつアーカイブへ移動し、移動したイベント数を返す
+# バッチごとにコミットして、ロックの保持時間とトランザクションの大きさを一定に抑える
+# 処理中の更新とぶつからないよう、他のトランザクションがロックしているイベントは飛ばして次回の実行に回す
+def archive_events_before(db: Session, before: datetime, batch_size: int) -> int:
+    total = 0
+    while True:
+        event_ids = db.scalars(
+            select(Event.id)
+            .where(Event.event_date < before)
+            .order_by(Event.event_date, Event.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not event_ids:
+            return total
+        total += archive_events(db, event_ids, ARCHIVE_REASON_AGED)
+        # 購読者への削除の通知は、アーカイブと同じトランザクションで送り、キャッシュはコミット後にまとめて無効化する
+        for event_id in event_ids:
+            broker.publish(db, f"event:{event_id}", {"type": "event", "action": "deleted"})
+            response_cache.invalidate_after_commit(db, event_id)
+        db.commit() # バッチごとにコミット
@@ -1,66 +1,639 @@
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from typing import IO, AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union
 from uuid import UUID
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError # 未使用だが、一般的なインポート
+from pydantic import ValidationError
+from sqlalchemy import literal_column, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
 
-from app.models import Attendance # Attendanceモデルをインポート
-from app.schemas import AttendanceCreate, AttendanceUpdate # Attendance関連のスキーマをインポート
+from app.core.pubsub import broker # 出欠変更の配信用pub/subをインポート
+from app.core.response_cache import response_cache # レスポンスキャッシュをインポート
+from app.jobs.queue import enqueue, job_handler # バックグラウンドジョブの登録関数をインポート
+from app.models import Attendance, AttendanceArchive, Event, EventArchive, EventAttendanceSummary, User # Attendance・Event・アーカイブ・出欠集計・Userモデルをインポート
+from app.schemas import AttendanceCreate, AttendanceUpdate, AttendanceBatchItem, AttendanceBatchResult # Attendance関連のスキーマをインポート
+from app.services.archive import ( # アーカイブの列の射影・アーカイブの理由・ホットデータの範囲をインポート
+    ARCHIVE_REASON_AGED, ARCHIVED_ATTENDANCE_ROW_COLUMNS, archived_event_row_columns, hot_horizon,
+)
+from app.services.attendance_summary import apply_summary_delta, apply_summary_delta_async, refresh_event_summary # 出欠集計の更新関数をインポート
+from app.services.event import event_row_columns, event_row_payload, ownership_error, ownership_error_async # イベントの列の射影・所有者確認の例外をインポート
+
+
+# レスポンススキーマごとのリレーション読み込みプラン
+# いずれも多対一のリレーションなので、JOINで一覧取得と同じクエリ内に読み込む
+# AttendanceWithUserスキーマ: user
+ATTENDANCE_WITH_USER_OPTIONS = (
+    joinedload(Attendance.user),
+)
+# AttendanceWithEventスキーマ: event とその creator・attendance_summary
+ATTENDANCE_WITH_EVENT_OPTIONS = (
+    joinedload(Attendance.event).joinedload(Event.creator),
+    joinedload(Attendance.event).joinedload(Event.attendance_summary),
+)
 
 
 # 指定されたイベントの出欠リストを取得
 def get_event_attendances(db: Session, event_id: UUID):
-    return db.query(Attendance).filter(Attendance.event_id == event_id).all()
+    return db.scalars(_event_attendances_statement(event_id)).all()
+
+
+# 指定されたイベントの出欠リストを取得（非同期セッション版）
+async def get_event_attendances_async(db: AsyncSession, event_id: UUID):
+    return (await db.scalars(_event_attendances_statement(event_id))).all()
+
+
+# 指定されたイベントの出欠リストを取得するクエリ
+def _event_attendances_statement(event_id: UUID):
+    return select(Attendance).options(*ATTENDANCE_WITH_USER_OPTIONS).where(Attendance.event_id == event_id)
 
 
 # 指定されたユーザーの出欠リストを取得
+# 開催日時がアーカイブの対象期間より前のイベントの出欠は含めない（履歴を含める場合は get_user_attendance_rows を使用する）
 def get_user_attendances(db: Session, user_id: UUID):
-    return db.query(Attendance).filter(Attendance.user_id == user_id).all()
+    return db.scalars(_user_attendances_statement(user_id)).all()
+
+
+# 指定されたユーザーの出欠リストを取得（非同期セッション版）
+async def get_user_attendances_async(db: AsyncSession, user_id: UUID):
+    return (await db.scalars(_user_attendances_statement(user_id))).all()
+
+
+# 指定されたユーザーの出欠リストを取得するクエリ
+def _user_attendances_statement(user_id: UUID):
+    return (
+        select(Attendance)
+        .options(*ATTENDANCE_WITH_EVENT_OPTIONS)
+        .where(Attendance.user_id == user_id, Attendance.event.has(Event.event_date >= hot_horizon()))
+    )
+
+
+# 高速シリアライズモード用の列の射影（Attendanceスキーマの組み立てに必要な列のみ）
+ATTENDANCE_ROW_COLUMNS = (
+    Attendance.id,
+    Attendance.event_id,
+    Attendance.user_id,
+    Attendance.status,
+    Attendance.comment,
+    Attendance.created_at,
+    Attendance.updated_at,
+)
+# AttendanceWithUserスキーマ用: 出欠したユーザーの列
+ATTENDANCE_USER_ROW_COLUMNS = (
+    User.email.label("user_email"),
+    User.name.label("user_name"),
+    User.created_at.label("user_created_at"),
+    User.updated_at.label("user_updated_at"),
+)
+# AttendanceWithEventスキーマ用: イベントの列には "event__" の接頭辞を付け、出欠の列と区別する
+ATTENDANCE_EVENT_ROW_PREFIX = "event__"
+
+
+# 指定されたイベントの出欠リストを列の射影（行）として取得（高速シリアライズモード・履歴を含む取得用）
+# include_history: イベントがアーカイブ済みの場合に、アーカイブした出欠を返す（作成者が削除したイベントの出欠は返さない）
+def get_event_attendance_rows(db: Session, event_id: UUID, include_history: bool = False):
+    return db.execute(_event_attendance_rows_statement(event_id, include_history)).all()
+
+
+# 指定されたイベントの出欠リストを列の射影（行）として取得（非同期セッション版）
+async def get_event_attendance_rows_async(db: AsyncSession, event_id: UUID, include_history: bool = False):
+    return (await db.execute(_event_attendance_rows_statement(event_id, include_history))).all()
+
+
+# 指定されたイベントの出欠リストを列の射影として取得するクエリ
+def _event_attendance_rows_statement(event_id: UUID, include_history: bool):
+    query = (
+        select(*ATTENDANCE_ROW_COLUMNS, *ATTENDANCE_USER_ROW_COLUMNS)
+        .join(User, User.id == Attendance.user_id)
+        .where(Attendance.event_id == event_id)
+    )
+    if not include_history:
+        return query
+    cold = (
+        select(*ARCHIVED_ATTENDANCE_ROW_COLUMNS, *ATTENDANCE_USER_ROW_COLUMNS)
+        .join(User, User.id == AttendanceArchive.user_id)
+        .join(EventArchive, EventArchive.id == AttendanceArchive.event_id)
+        .where(AttendanceArchive.event_id == event_id, EventArchive.archived_reason == ARCHIVE_REASON_AGED)
+    )
+    return union_all(query, cold)
+
+
+# 指定されたユーザーの出欠リストをイベント情報込みの行として取得（高速シリアライズモード・履歴を含む取得用）
+# 開催日時がアーカイブの対象期間より前のイベントの出欠は、include_history を指定した場合にのみアーカイブとあわせて返す
+# 作成者が削除してアーカイブへ移動したイベントの出欠は、履歴にも含めない
+def get_user_attendance_rows(db: Session, user_id: UUID, include_history: bool = False):
+    return db.execute(_user_attendance_rows_statement(user_id, include_history)).all()
+
+
+# 指定されたユーザーの出欠リストをイベント情報込みの行として取得（非同期セッション版）
+async def get_user_attendance_rows_async(db: AsyncSession, user_id: UUID, include_history: bool = False):
+    return (await db.execute(_user_attendance_rows_statement(user_id, include_history))).all()
+
+
+# 指定されたユーザーの出欠リストをイベント情報込みの行として取得するクエリ
+def _user_attendance_rows_statement(user_id: UUID, include_history: bool):
+    query = (
+        select(*ATTENDANCE_ROW_COLUMNS, *event_row_columns(ATTENDANCE_EVENT_ROW_PREFIX))
+        .join(Event, Event.id == Attendance.event_id)
+        .join(User, User.id == Event.creator_id)
+        .outerjoin(EventAttendanceSummary, EventAttendanceSummary.event_id == Event.id)
+        .where(Attendance.user_id == user_id)
+    )
+    if not include_history:
+        return query.where(Event.event_date >= hot_horizon())
+    cold = (
+        select(*ARCHIVED_ATTENDANCE_ROW_COLUMNS, *archived_event_row_columns(ATTENDANCE_EVENT_ROW_PREFIX))
+        .join(EventArchive, EventArchive.id == AttendanceArchive.event_id)
+        .join(User, User.id == EventArchive.creator_id)
+        .where(AttendanceArchive.user_id == user_id, EventArchive.archived_reason == ARCHIVE_REASON_AGED)
+    )
+    return union_all(query, cold)
+
+
+# 行から、Attendanceスキーマと同じ構造（同じキーの順序）のdictを組み立てる
+def _attendance_row_payload(row) -> dict:
+    return {
+        "status": row.status,
+        "comment": row.comment,
+        "id": row.id,
+        "event_id": row.event_id,
+        "user_id": row.user_id,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+    }
+
+
+# get_event_attendance_rowsの行をAttendanceWithUserスキーマと同じ構造のdictに変換
+def attendance_with_user_payload(row) -> dict:
+    payload = _attendance_row_payload(row)
+    payload["user"] = {
+        "email": row.user_email,
+        "name": row.user_name,
+        "id": row.user_id,
+        "created_at": row.user_created_at,
+        "updated_at": row.user_updated_at,
+    }
+    return payload
+
+
+# get_user_attendance_rowsの行をAttendanceWithEventスキーマと同じ構造のdictに変換
+def attendance_with_event_payload(row) -> dict:
+    payload = _attendance_row_payload(row)
+    payload["event"] = event_row_payload(row, ATTENDANCE_EVENT_ROW_PREFIX)
+    return payload
 
 
 # 指定されたIDの出欠を取得
 def get_attendance(db: Session, attendance_id: UUID):
-    return db.query(Attendance).filter(Attendance.id == attendance_id).first()
+    return db.scalars(select(Attendance).where(Attendance.id == attendance_id)).first()
+
+
+# 指定されたIDの出欠を取得（非同期セッション版）
+async def get_attendance_async(db: AsyncSession, attendance_id: UUID):
+    return (await db.scalars(select(Attendance).where(Attendance.id == attendance_id))).first()
 
 
 # 指定されたユーザーとイベントの出欠を取得
 def get_user_event_attendance(db: Session, user_id: UUID, event_id: UUID):
-    return db.query(Attendance).filter(
+    return db.scalars(_user_event_attendance_statement(user_id, event_id)).first()
+
+
+# 指定されたユーザーとイベントの出欠を取得（非同期セッション版）
+async def get_user_event_attendance_async(db: AsyncSession, user_id: UUID, event_id: UUID):
+    return (await db.scalars(_user_event_attendance_statement(user_id, event_id))).first()
+
+
+# 指定されたユーザーとイベントの出欠を取得するクエリ
+def _user_event_attendance_statement(user_id: UUID, event_id: UUID):
+    return select(Attendance).where(
         Attendance.user_id == user_id,
         Attendance.event_id == event_id
-    ).first()
+    )
+
+
+# 外部キー制約違反を表すPostgreSQLのエラーコード
+FOREIGN_KEY_VIOLATION = "23503"
 
 
 # 新しい出欠を作成
+# 重複確認のSELECTを行わず、INSERT ... ON CONFLICT DO NOTHING RETURNING の1回の往復で登録する
+# (event_id, user_id) の一意制約に衝突した場合は行が返らないため、既に登録済みと判断する
 def create_attendance(db: Session, attendance: AttendanceCreate, user_id: UUID):
-    # 既に同じイベントにユーザーが出欠登録しているか確認
-    existing_attendance = get_user_event_attendance(db, user_id, attendance.event_id)
-    if existing_attendance:
-        raise HTTPException(
-            status_code=400,
-            detail="Attendance already exists for this event" # 既に存在する場合はエラー
+    try:
+        db_attendance = db.scalars(_create_attendance_statement(attendance, user_id)).first()
+        if db_attendance is not None:
+            # 同じトランザクション内でイベントの出欠集計を加算し、購読者への配信を送る
+            apply_summary_delta(db, attendance.event_id, {db_attendance.status: 1})
+            broker.publish(db, *_attendance_change_message(
+                db_attendance.event_id, db_attendance.id, db_attendance.user_id, db_attendance.status,
+                db_attendance.updated_at, "created",
+            ))
+            # コミット後に、出欠リストと（集計を含む）イベントの詳細・一覧のキャッシュを無効化する
+            response_cache.invalidate_after_commit(db, attendance.event_id)
+        db.commit() # コミットして変更を保存
+    except IntegrityError as e:
+        db.rollback()
+        raise _create_attendance_error(e)
+
+    if db_attendance is None:
+        raise _create_attendance_error() # 既に存在する場合はエラー
+    return db_attendance
+
+
+# 新しい出欠を作成（非同期セッション版）
+# レスポンスの作成時にイベント・作成者・出欠集計を遅延読み込みできないため、それらを含めて読み込み直して返す
+async def create_attendance_async(db: AsyncSession, attendance: AttendanceCreate, user_id: UUID):
+    try:
+        db_attendance = (await db.scalars(_create_attendance_statement(attendance, user_id))).first()
+        if db_attendance is not None:
+            await apply_summary_delta_async(db, attendance.event_id, {db_attendance.status: 1})
+            await broker.publish_async(db, *_attendance_change_message(
+                db_attendance.event_id, db_attendance.id, db_attendance.user_id, db_attendance.status,
+                db_attendance.updated_at, "created",
+            ))
+            response_cache.invalidate_after_commit(db, attendance.event_id)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise _create_attendance_error(e)
+
+    if db_attendance is None:
+        raise _create_attendance_error()
+    return (await db.scalars(_attendance_response_statement(db_attendance.id))).first()
+
+
+# 重複確認のSELECTを行わずに出欠を登録する INSERT ... ON CONFLICT DO NOTHING RETURNING
+def _create_attendance_statement(attendance: AttendanceCreate, user_id: UUID):
+    return (
+        insert(Attendance)
+        .values(
+            event_id=attendance.event_id,
+            user_id=user_id,
+            status=attendance.status,
+            comment=attendance.comment,
         )
-    
-    # Attendanceモデルのインスタンスを作成
-    db_attendance = Attendance(
-        event_id=attendance.event_id,
-        user_id=user_id,
-        status=attendance.status,
-        comment=attendance.comment
+        .on_conflict_do_nothing(index_elements=[Attendance.event_id, Attendance.user_id])
+        .returning(Attendance)
     )
-    db.add(db_attendance) # データベースに追加
+
+
+# 出欠を登録できなかった場合の例外を作成
+# error: 登録時の制約違反（省略時は、一意制約に衝突して行が返らなかった場合）
+def _create_attendance_error(error: Optional[IntegrityError] = None) -> HTTPException:
+    if error is not None and getattr(error.orig, "pgcode", None) == FOREIGN_KEY_VIOLATION:
+        return HTTPException(status_code=404, detail="Event not found") # 存在しないイベントの場合
+    return HTTPException(
+        status_code=400,
+        detail="Attendance already exists for this event"
+    )
+
+
+# 既存の出欠を更新（出欠の所有者のみ）
+# 取得・権限確認・更新・再読み込みを個別に行わず、所有者を条件にした UPDATE ... RETURNING の1回の往復で更新する
+# 集計の差分に必要な変更前のステータスは、同じ文の中で行ロックを取った更新前の行から返す
+def update_attendance(db: Session, attendance_id: UUID, attendance: AttendanceUpdate, user_id: UUID):
+    # 更新データからNoneでないフィールドのみを抽出
+    update_data = attendance.dict(exclude_unset=True)
+    updated = db.execute(_update_attendance_statement(attendance_id, update_data, user_id)).first()
+    if updated is None:
+        db.rollback()
+        raise ownership_error(db, Attendance.user_id, attendance_id, "Attendance not found")
+    event_id, owner_id, new_status, updated_at, previous_status = updated
+    apply_summary_delta(db, event_id, _status_deltas(previous_status, new_status))
+    broker.publish(db, *_attendance_change_message(event_id, attendance_id, owner_id, new_status, updated_at, "updated", previous_status))
+    response_cache.invalidate_after_commit(db, event_id)
     db.commit() # コミットして変更を保存
-    db.refresh(db_attendance) # データベースから最新の情報を取得してオブジェクトを更新
-    return db_attendance
+    # レスポンス用に、イベント・作成者・出欠集計を含めて1回のクエリで読み込む
+    return db.scalars(_attendance_response_statement(attendance_id)).first()
 
 
-# 既存の出欠を更新
-def update_attendance(db: Session, attendance_id: UUID, attendance: AttendanceUpdate):
-    db_attendance = db.query(Attendance).filter(Attendance.id == attendance_id).first()
-    if db_attendance: # 出欠が存在する場合
-        # 更新データからNoneでないフィールドのみを抽出
-        update_data = attendance.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_attendance, field, value) # 各フィールドを更新
-        db.commit() # コミットして変更を保存
-        db.refresh(db_attendance) # データベースから最新の情報を取得してオブジェクトを更新
-    return db_attendance
\ No newline at end of file
+# 既存の出欠を更新（非同期セッション版）
+async def update_attendance_async(db: AsyncSession, attendance_id: UUID, attendance: AttendanceUpdate, user_id: UUID):
+    update_data = attendance.dict(exclude_unset=True)
+    updated = (await db.execute(_update_attendance_statement(attendance_id, update_data, user_id))).first()
+    if updated is None:
+        await db.rollback()
+        raise await ownership_error_async(db, Attendance.user_id, attendance_id, "Attendance not found")
+    event_id, owner_id, new_status, updated_at, previous_status = updated
+    await apply_summary_delta_async(db, event_id, _status_deltas(previous_status, new_status))
+    await broker.publish_async(db, *_attendance_change_message(event_id, attendance_id, owner_id, new_status, updated_at, "updated", previous_status))
+    response_cache.invalidate_after_commit(db, event_id)
+    await db.commit()
+    return (await db.scalars(_attendance_response_statement(attendance_id))).first()
+
+
+# 所有者を条件にした出欠の UPDATE ... RETURNING（変更前のステータスも返す）
+def _update_attendance_statement(attendance_id: UUID, update_data: dict, user_id: UUID):
+    previous = (
+        select(Attendance.id, Attendance.status.label("previous_status"))
+        .where(Attendance.id == attendance_id)
+        .with_for_update()
+        .subquery()
+    )
+    return (
+        update(Attendance)
+        .where(Attendance.id == previous.c.id, Attendance.user_id == user_id)
+        # 更新する項目がない場合は値を変えずに、権限の確認と変更前のステータスの取得だけを行う
+        .values(**(update_data or {"updated_at": Attendance.updated_at}))
+        .returning(Attendance.event_id, Attendance.user_id, Attendance.status, Attendance.updated_at, previous.c.previous_status)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# ステータスが変わった場合は、変更前の件数を減らし変更後の件数を増やす
+def _status_deltas(previous_status, new_status) -> dict:
+    if new_status == previous_status:
+        return {}
+    return {previous_status: -1, new_status: 1}
+
+
+# レスポンス用に、イベント・作成者・出欠集計を含めて出欠を1回のクエリで読み込むクエリ
+# セッション内に読み込み済みの出欠があっても、データベースの値で置き換える
+def _attendance_response_statement(attendance_id: UUID):
+    return (
+        select(Attendance).options(*ATTENDANCE_WITH_EVENT_OPTIONS).where(Attendance.id == attendance_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+
+# 出欠の変更をイベントの購読者に配信するチャンネルとメッセージ（書き込みと同じトランザクションで、コミットの前に配信する）
+# 購読者が件数の集計を手元で更新できるよう、更新の場合は変更前のステータスも含める
+# コメントは長さに上限がなく、NOTIFYのペイロードの上限（8000バイト）を超えうるため含めない（購読者は出欠リストを再取得する）
+def _attendance_change_message(event_id: UUID, attendance_id: UUID, user_id: UUID, status, updated_at, action: str, previous_status=None) -> tuple:
+    return f"event:{event_id}", {
+        "type": "attendance",
+        "action": action,
+        "id": str(attendance_id),
+        "user_id": str(user_id),
+        "status": status.value,
+        "previous_status": previous_status.value if previous_status is not None else None,
+        "updated_at": updated_at.isoformat() if updated_at else None,
+    }
+
+
+# 一括登録で1回のINSERT文に含める最大行数
+BATCH_CHUNK_SIZE = 1000
+
+
+# 出欠を一括で登録・更新（イベント作成者による参加者の取り込み用）
+# items: (リクエスト内の位置, 出欠データ) のリスト
+# 対象ユーザーの解決と検証をまとめて行った後、複数行の INSERT ... ON CONFLICT DO UPDATE で
+# 1つのトランザクション内に書き込み、1件ごとの結果を位置順に返す
+def batch_upsert_attendances(db: Session, event_id: UUID, items: List[Tuple[int, AttendanceBatchItem]]):
+    # メールアドレスとユーザーIDで指定された対象ユーザーを、それぞれ1回のクエリでまとめて解決
+    emails, requested_ids = _batch_user_references(items)
+    user_ids_by_email = dict(db.execute(_users_by_email_statement(emails)).all()) if emails else {}
+    known_ids = set(db.scalars(_known_user_ids_statement(requested_ids)).all()) if requested_ids else set()
+
+    results, rows = _build_batch_rows(event_id, items, user_ids_by_email, known_ids)
+    for stmt in _batch_upsert_statements(rows):
+        _record_batch_results(results, rows, db.execute(stmt))
+
+    if rows:
+        # 件数の増減を1件ずつ反映する代わりに、イベントの集計の再計算をジョブとして同じトランザクションで登録する
+        # 出欠の多いイベントでも、全件の集計をリクエストの中で待たない。出欠リストのETagが変わるよう、バージョン番号だけはここで進める
+        apply_summary_delta(db, event_id, {})
+        enqueue(db, REFRESH_SUMMARY_JOB, {"event_id": str(event_id)})
+        # 一括登録は差分が多いため、購読者には出欠リストの再取得を促す
+        broker.publish(db, f"event:{event_id}", {"type": "resync"})
+        response_cache.invalidate_after_commit(db, event_id)
+    db.commit() # コミットして変更を保存
+    return [results[index] for index in sorted(results)]
+
+
+# 出欠を一括で登録・更新（非同期セッション版）
+async def batch_upsert_attendances_async(db: AsyncSession, event_id: UUID, items: List[Tuple[int, AttendanceBatchItem]]):
+    emails, requested_ids = _batch_user_references(items)
+    user_ids_by_email = dict((await db.execute(_users_by_email_statement(emails))).all()) if emails else {}
+    known_ids = set((await db.scalars(_known_user_ids_statement(requested_ids))).all()) if requested_ids else set()
+
+    results, rows = _build_batch_rows(event_id, items, user_ids_by_email, known_ids)
+    for stmt in _batch_upsert_statements(rows):
+        _record_batch_results(results, rows, await db.execute(stmt))
+
+    if rows:
+        await apply_summary_delta_async(db, event_id, {})
+        enqueue(db.sync_session, REFRESH_SUMMARY_JOB, {"event_id": str(event_id)})
+        await broker.publish_async(db, f"event:{event_id}", {"type": "resync"})
+        response_cache.invalidate_after_commit(db, event_id)
+    await db.commit()
+    return [results[index] for index in sorted(results)]
+
+
+# 一括登録で指定された対象ユーザーのメールアドレスとユーザーIDの集合
+def _batch_user_references(items: List[Tuple[int, AttendanceBatchItem]]) -> Tuple[set, set]:
+    emails = {item.email for _, item in items if item.email is not None}
+    user_ids = {item.user_id for _, item in items if item.user_id is not None}
+    return emails, user_ids
+
+
+# メールアドレスから (メールアドレス, ユーザーID) を取得するクエリ
+def _users_by_email_statement(emails: set):
+    return select(User.email, User.id).where(User.email.in_(emails))
+
+
+# 指定されたユーザーIDのうち、存在するものを取得するクエリ
+def _known_user_ids_statement(user_ids: set):
+    return select(User.id).where(User.id.in_(user_ids))
+
+
+# 1件ずつ検証し、書き込む行を組み立てる
+# 戻り値: (検証でエラーになった結果（位置 -> 結果）, ユーザーID -> (位置, 行データ))
+def _build_batch_rows(event_id: UUID, items: List[Tuple[int, AttendanceBatchItem]], user_ids_by_email: dict, known_ids: set):
+    results: dict[int, AttendanceBatchResult] = {}
+    now = datetime.utcnow()
+    rows: dict[UUID, Tuple[int, dict]] = {} # ユーザーID -> (位置, 行データ)
+    for index, item in items:
+        if item.user_id is not None:
+            user_id = item.user_id if item.user_id in known_ids else None
+        else:
+            user_id = user_ids_by_email.get(item.email)
+        if user_id is None:
+            results[index] = AttendanceBatchResult(index=index, result="error", detail="User not found")
+        elif user_id in rows:
+            # 同じ行を1つのINSERT文で2回更新することはできないため、重複は先の指定を優先してエラーとする
+            results[index] = AttendanceBatchResult(index=index, result="error", detail="Duplicate user in batch")
+        else:
+            rows[user_id] = (index, {
+                "id": uuid.uuid4(),
+                "event_id": event_id,
+                "user_id": user_id,
+                "status": item.status,
+                "comment": item.comment,
+                "created_at": now,
+                "updated_at": now,
+            })
+    return results, rows
+
+
+# 複数行INSERTで書き込むSQLを BATCH_CHUNK_SIZE 行ごとに作成する
+# 新規作成か更新かを判別できるよう、更新された行はxmaxが0以外になることを利用して返す
+def _batch_upsert_statements(rows: dict) -> Iterator:
+    pending = list(rows.values())
+    for start in range(0, len(pending), BATCH_CHUNK_SIZE):
+        chunk = pending[start:start + BATCH_CHUNK_SIZE]
+        stmt = insert(Attendance).values([row for _, row in chunk])
+        yield stmt.on_conflict_do_update(
+            index_elements=[Attendance.event_id, Attendance.user_id],
+            set_={
+                "status": stmt.excluded.status,
+                "comment": stmt.excluded.comment,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ).returning(Attendance.id, Attendance.user_id, literal_column("xmax = 0").label("inserted"))
+
+
+# 書き込んだ行ごとの結果を記録する
+def _record_batch_results(results: dict, rows: dict, written: Iterable) -> None:
+    for attendance_id, user_id, inserted in written:
+        index = rows[user_id][0]
+        results[index] = AttendanceBatchResult(
+            index=index, result="created" if inserted else "updated", attendance_id=attendance_id
+        )
+
+
+# イベントの出欠集計を再計算するジョブの種類
+REFRESH_SUMMARY_JOB = "refresh_event_summary"
+
+
+# イベントの出欠集計を再計算するジョブのハンドラー
+# 同じイベントに対する複数のジョブ（続けて行われた取り込みなど）は、1回の再計算にまとめる
+@job_handler(REFRESH_SUMMARY_JOB)
+def _refresh_event_summaries(db: Session, payloads: List[dict]):
+    event_ids = {UUID(payload["event_id"]) for payload in payloads}
+    for event_id in event_ids:
+        refresh_event_summary(db, event_id)
+        broker.publish(db, f"event:{event_id}", {"type": "resync"}) # 購読者に再取得を促す
+        response_cache.invalidate_after_commit(db, event_id) # ジョブの削除のコミット後に、集計を含むキャッシュを無効化する
+
+
+# 取り込みファイル（CSV / NDJSON）を1行ずつ読み込み、出欠データに変換する
+# ファイル全体をメモリに読み込まず、(行の位置, 出欠データまたはエラー内容) を順に返す
+# CSVはヘッダー行に user_id, email, status, comment のいずれかの列名を持つものとする
+# UTF-8として不正なバイトを含む行は、ファイル全体を失敗させずに、その行を含むレコードだけを "Invalid record" とする
+def parse_attendance_import(stream: IO[bytes], file_format: str) -> Iterator[Tuple[int, Union[AttendanceBatchItem, str]]]:
+    # 不正なバイトはサロゲート文字に置き換えて読み込みを続け、レコードの検証で拒否する
+    text = (line.decode("utf-8-sig", errors="surrogateescape") for line in stream)
+    if file_format == "csv":
+        records = _read_csv_records(text)
+    else:
+        records = (line for line in text if line.strip())
+    for index, record in enumerate(records):
+        try:
+            if record is None:
+                raise ValueError("malformed CSV record")
+            if file_format == "csv":
+                # 空欄の列は未指定として扱う
+                record = {key: value for key, value in record.items() if key and value not in (None, "")}
+                _ensure_utf8(*record, *record.values())
+                yield index, AttendanceBatchItem.model_validate(record)
+            else:
+                _ensure_utf8(record)
+                yield index, AttendanceBatchItem.model_validate(json.loads(record))
+        except ValidationError as e:
+            yield index, e.errors()[0]["msg"]
+        except ValueError: # UnicodeEncodeError・JSONDecodeErrorを含む
+            yield index, "Invalid record"
+
+
+# CSVのレコードを順に返す（クォートの不正などで読み込めなかったレコードはNoneを返し、続きの行から読み込みを再開する）
+def _read_csv_records(text: Iterator[str]) -> Iterator[Optional[dict]]:
+    reader = csv.DictReader(text)
+    while True:
+        try:
+            yield next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            yield None
+
+
+# デコードできなかったバイト（サロゲート文字）を含む値はUnicodeEncodeErrorとする
+def _ensure_utf8(*values: str) -> None:
+    for value in values:
+        value.encode("utf-8")
+
+
+# エクスポートの列（CSVのヘッダー、NDJSONのキー）
+EXPORT_COLUMNS = ["attendance_id", "user_id", "user_name", "user_email", "status", "comment", "created_at", "updated_at"]
+
+
+# イベントの出欠を、ユーザー情報と合わせて行単位で読み込む
+# ORMオブジェクトを作らずに必要な列だけを取得し、サーバーサイドカーソルで batch_size 行ずつ受け取る
+# 戻り値は batch_size 行ごとのリストを返すイテレーター
+def iter_event_attendance_rows(db: Session, event_id: UUID, batch_size: int):
+    result = db.execute(_export_statement(event_id), execution_options={"yield_per": batch_size})
+    return result.partitions()
+
+
+# イベントの出欠を行単位で読み込む（非同期セッション版）
+# 戻り値は batch_size 行ごとのリストを返す非同期イテレーター
+async def iter_event_attendance_rows_async(db: AsyncSession, event_id: UUID, batch_size: int):
+    result = await db.stream(_export_statement(event_id), execution_options={"yield_per": batch_size})
+    return result.partitions()
+
+
+# エクスポートする出欠とユーザー情報の列を取得するクエリ
+def _export_statement(event_id: UUID):
+    return (
+        select(
+            Attendance.id, Attendance.user_id, User.name, User.email,
+            Attendance.status, Attendance.comment, Attendance.created_at, Attendance.updated_at,
+        )
+        .join(User, Attendance.user_id == User.id)
+        .where(Attendance.event_id == event_id)
+    )
+
+
+# 読み込んだ行をCSVまたはNDJSONの文字列に変換
+# 受け取った行のまとまりごとに1つの文字列を返すため、全件をメモリに保持せずに送信できる
+def format_attendance_export(partitions, file_format: str) -> Iterator[str]:
+    if file_format == "csv":
+        yield _export_header() # クエリ結果を待たずにヘッダーを送信
+    for rows in partitions:
+        yield _format_export_rows(rows, file_format)
+
+
+# 読み込んだ行をCSVまたはNDJSONの文字列に変換（非同期イテレーター版）
+async def format_attendance_export_async(partitions, file_format: str) -> AsyncIterator[str]:
+    if file_format == "csv":
+        yield _export_header()
+    async for rows in partitions:
+        yield _format_export_rows(rows, file_format)
+
+
+# CSVのヘッダー行
+def _export_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_COLUMNS)
+    return buffer.getvalue()
+
+
+# 行のまとまりを1つの文字列に変換
+def _format_export_rows(rows, file_format: str) -> str:
+    if file_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(_export_values(row))
+        return buffer.getvalue()
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, _export_values(row))), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+# 1行分の値を文字列に変換
+def _export_values(row) -> list:
+    attendance_id, user_id, name, email, status, comment, created_at, updated_at = row
+    return [
+        str(attendance_id), str(user_id), name, email, status.value, comment,
+        created_at.isoformat() if created_at else None,
+        updated_at.isoformat() if updated_at else None,
+    ]
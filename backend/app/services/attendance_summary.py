@@ -0,0 +1,80 @@
+from datetime import datetime
+from uuid import UUID
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Attendance, AttendanceStatus, Event, EventAttendanceSummary # 出欠・イベント・集計モデルをインポート
+
+
+# 出欠ステータスの変化分をイベントの集計に反映（コミットは呼び出し元で行う）
+# deltas: ステータスごとの増減数（例: {ATTENDING: -1, MAYBE: +1}）。空の場合もバージョン番号は増加する
+# 集計行がなければ作成し、あれば INSERT ... ON CONFLICT DO UPDATE で1回の往復で加算する
+def apply_summary_delta(db: Session, event_id: UUID, deltas: dict[AttendanceStatus, int]):
+    db.execute(_summary_delta_statement(event_id, deltas))
+
+
+# 出欠ステータスの変化分をイベントの集計に反映（非同期セッション版）
+async def apply_summary_delta_async(db: AsyncSession, event_id: UUID, deltas: dict[AttendanceStatus, int]):
+    await db.execute(_summary_delta_statement(event_id, deltas))
+
+
+# 集計行への加算を行う INSERT ... ON CONFLICT DO UPDATE
+def _summary_delta_statement(event_id: UUID, deltas: dict[AttendanceStatus, int]):
+    table = EventAttendanceSummary.__table__
+    values = {status.value: deltas.get(status, 0) for status in AttendanceStatus}
+    stmt = insert(EventAttendanceSummary).values(
+        event_id=event_id, version=1, updated_at=datetime.utcnow(), **values
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[EventAttendanceSummary.event_id],
+        set_={
+            **{column: table.c[column] + delta for column, delta in values.items() if delta},
+            "version": table.c.version + 1,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    return stmt
+
+
+# イベントの集計を出欠テーブルから再計算（コミットは呼び出し元で行う）
+# 一括登録など、増分での反映が難しい更新の後に使用する
+# 先に集計行をロックしてから、後続の文で数え直す。READ COMMITTEDでは文ごとにスナップショットを取るため、
+# ロックを待つ間にコミットされた増分（apply_summary_delta）の出欠は数え直しに含まれ、
+# ロックの取得後に行われる増分は再計算のコミットを待ってから加算される（どちらの場合も更新が失われない）
+def refresh_event_summary(db: Session, event_id: UUID):
+    now = datetime.utcnow()
+    # 集計行の行ロックを取る（集計行がなければ、イベントが存在する場合に限り作成してからロックする）
+    if not _lock_summary(db, event_id):
+        columns = ["event_id", *[status.value for status in AttendanceStatus], "version", "updated_at"]
+        empty = select(
+            Event.id, *[literal(0) for _ in AttendanceStatus], literal(0), literal(now),
+        ).where(Event.id == event_id)
+        db.execute(
+            insert(EventAttendanceSummary).from_select(columns, empty)
+            .on_conflict_do_nothing(index_elements=[EventAttendanceSummary.event_id])
+        )
+        if not _lock_summary(db, event_id):
+            return # イベントが削除済み
+    # GROUP BYを使わない集計のため、出欠が0件でも必ず1行返る
+    counts = db.execute(
+        select(*[func.count().filter(Attendance.status == status) for status in AttendanceStatus])
+        .where(Attendance.event_id == event_id)
+    ).one()
+    db.execute(
+        update(EventAttendanceSummary)
+        .where(EventAttendanceSummary.event_id == event_id)
+        .values(
+            **{status.value: count for status, count in zip(AttendanceStatus, counts)},
+            version=EventAttendanceSummary.version + 1,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+# イベントの集計行を SELECT ... FOR UPDATE でロックし、集計行が存在したかどうかを返す
+def _lock_summary(db: Session, event_id: UUID) -> bool:
+    stmt = select(EventAttendanceSummary.event_id).where(EventAttendanceSummary.event_id == event_id).with_for_update()
+    return db.execute(stmt).first() is not None
@@ -0,0 +1,71 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Event, Attendance, EventAttendanceSummary, User # Event・Attendance・出欠集計・Userモデルをインポート
+from app.schemas import Principal # 認証済みユーザーのスキーマをインポート
+from app.services.event import event_row_columns, event_row_payload # イベントの列の射影と行の変換をインポート
+
+# 現在のユーザーの出欠の列には "my__" の接頭辞を付け、イベントの列と区別する
+MY_ATTENDANCE_ROW_PREFIX = "my__"
+MY_ATTENDANCE_ROW_COLUMNS = (
+    Attendance.id.label(f"{MY_ATTENDANCE_ROW_PREFIX}id"),
+    Attendance.status.label(f"{MY_ATTENDANCE_ROW_PREFIX}status"),
+    Attendance.comment.label(f"{MY_ATTENDANCE_ROW_PREFIX}comment"),
+    Attendance.created_at.label(f"{MY_ATTENDANCE_ROW_PREFIX}created_at"),
+    Attendance.updated_at.label(f"{MY_ATTENDANCE_ROW_PREFIX}updated_at"),
+)
+
+
+# ダッシュボードに表示する今後のイベントを、出欠の集計と現在のユーザーの出欠込みの行として取得
+# 作成者・集計・自分の出欠を1回のクエリで結合する。自分の出欠は (event_id, user_id) の一意制約のインデックスで
+# イベントごとに高々1行を引くだけのため、ユーザーの出欠全件（/attendances/my）を読み込んで突き合わせる必要はない
+def get_dashboard_event_rows(db: Session, user_id: UUID, limit: int = 20):
+    return db.execute(_dashboard_statement(user_id, limit)).all()
+
+
+# ダッシュボードに表示する今後のイベントの行を取得（非同期セッション版）
+async def get_dashboard_event_rows_async(db: AsyncSession, user_id: UUID, limit: int = 20):
+    return (await db.execute(_dashboard_statement(user_id, limit))).all()
+
+
+# ダッシュボードのイベントの行を取得するクエリ
+def _dashboard_statement(user_id: UUID, limit: int):
+    return (
+        select(*event_row_columns(), *MY_ATTENDANCE_ROW_COLUMNS)
+        .join(User, User.id == Event.creator_id)
+        .outerjoin(EventAttendanceSummary, EventAttendanceSummary.event_id == Event.id)
+        .outerjoin(Attendance, and_(Attendance.event_id == Event.id, Attendance.user_id == user_id))
+        .where(Event.event_date >= datetime.utcnow())
+        .order_by(Event.event_date, Event.id)
+        .limit(limit)
+    )
+
+
+# get_dashboard_event_rowsの行をDashboardEventスキーマと同じ構造のdictに変換
+def dashboard_event_payload(row, user_id: UUID) -> dict:
+    payload = event_row_payload(row)
+    m = row._mapping
+    p = MY_ATTENDANCE_ROW_PREFIX
+    # 未回答のイベントは外部結合した出欠の列がすべてNULLになる
+    payload["my_attendance"] = None if m[f"{p}id"] is None else {
+        "status": m[f"{p}status"],
+        "comment": m[f"{p}comment"],
+        "id": m[f"{p}id"],
+        "event_id": m["id"],
+        "user_id": user_id,
+        "created_at": m[f"{p}created_at"],
+        "updated_at": m[f"{p}updated_at"],
+    }
+    return payload
+
+
+# Dashboardスキーマと同じ構造のdictを組み立てる（現在のユーザーは認証で取得済みのため、データベースには問い合わせない）
+def dashboard_payload(user: Principal, rows) -> dict:
+    return {
+        "user": user.model_dump(),
+        "events": [dashboard_event_payload(row, user.id) for row in rows],
+    }
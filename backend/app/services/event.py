@@ -1,52 +1,421 @@
+import base64
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
-from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, tuple_, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 
-from app.models import Event # Eventモデルをインポート
+from app.core.config import settings # アプリケーション設定をインポート
+from app.core.pubsub import broker # イベント変更の配信用pub/subをインポート
+from app.core.replicas import create_async_read_session, create_read_session # 読み取り専用のセッションの作成関数をインポート
+from app.core.response_cache import response_cache # レスポンスキャッシュをインポート
+from app.models import Event, EventArchive, Attendance, EventAttendanceSummary, User # Event・アーカイブ・Attendance・出欠集計・Userモデルをインポート
 from app.schemas import EventCreate, EventUpdate # Event関連のスキーマをインポート
+from app.services.archive import ( # イベントのアーカイブ関数・アーカイブの列の射影・アーカイブの理由をインポート
+    ARCHIVE_REASON_AGED, ARCHIVE_REASON_DELETED, archive_events, archive_events_async, archived_event_row_columns, hot_horizon,
+)
+
+
+# レスポンススキーマごとのリレーション読み込みプラン
+# 遅延読み込み（lazy load）によるN+1クエリを防ぐため、シリアライズ時に辿るリレーションを事前に読み込む
+# Eventスキーマ: creator（多対一）と attendance_summary（一対一）はJOINで同じクエリ内に読み込む
+EVENT_LIST_OPTIONS = (
+    joinedload(Event.creator),
+    joinedload(Event.attendance_summary),
+)
+# EventWithAttendancesスキーマ: attendances（一対多）はSELECT INで一括取得し、各出欠のuserはそのクエリにJOINする
+EVENT_DETAIL_OPTIONS = (
+    joinedload(Event.creator),
+    joinedload(Event.attendance_summary),
+    selectinload(Event.attendances).joinedload(Attendance.user),
+)
+
+
+# 高速シリアライズモード用の列の射影（Eventスキーマの組み立てに必要な列のみ）
+# ORMオブジェクトを作らず行（タプル）として取得する。prefixは他のテーブルの列と同じクエリで取得する場合のラベルの接頭辞
+# 作成者（users）と出欠集計（event_attendance_summaries）を結合したクエリで使用する
+def event_row_columns(prefix: str = ""):
+    return (
+        Event.id.label(f"{prefix}id"),
+        Event.title.label(f"{prefix}title"),
+        Event.description.label(f"{prefix}description"),
+        Event.event_date.label(f"{prefix}event_date"),
+        Event.creator_id.label(f"{prefix}creator_id"),
+        Event.created_at.label(f"{prefix}created_at"),
+        Event.updated_at.label(f"{prefix}updated_at"),
+        User.email.label(f"{prefix}creator_email"),
+        User.name.label(f"{prefix}creator_name"),
+        User.created_at.label(f"{prefix}creator_created_at"),
+        User.updated_at.label(f"{prefix}creator_updated_at"),
+        EventAttendanceSummary.attending.label(f"{prefix}attending"),
+        EventAttendanceSummary.not_attending.label(f"{prefix}not_attending"),
+        EventAttendanceSummary.maybe.label(f"{prefix}maybe"),
+    )
+
+
+# event_row_columnsで取得した行から、Eventスキーマと同じ構造（同じキーの順序）のdictを組み立てる
+def event_row_payload(row, prefix: str = "") -> dict:
+    m = row._mapping
+    return {
+        "title": m[f"{prefix}title"],
+        "description": m[f"{prefix}description"],
+        "event_date": m[f"{prefix}event_date"],
+        "id": m[f"{prefix}id"],
+        "creator_id": m[f"{prefix}creator_id"],
+        "created_at": m[f"{prefix}created_at"],
+        "updated_at": m[f"{prefix}updated_at"],
+        "creator": {
+            "email": m[f"{prefix}creator_email"],
+            "name": m[f"{prefix}creator_name"],
+            "id": m[f"{prefix}creator_id"],
+            "created_at": m[f"{prefix}creator_created_at"],
+            "updated_at": m[f"{prefix}creator_updated_at"],
+        },
+        # 集計行が存在しないイベントはすべて0件として扱う（Eventスキーマと同じ）
+        "attendance_summary": {
+            "attending": m[f"{prefix}attending"] or 0,
+            "not_attending": m[f"{prefix}not_attending"] or 0,
+            "maybe": m[f"{prefix}maybe"] or 0,
+        },
+    }
+
+
+# 一覧ページングのカーソルを作成
+# カーソルは直前のページ最後のイベントの (event_date, id) をURLセーフなBase64で表したもの
+def encode_event_cursor(event: Event) -> str:
+    raw = f"{event.event_date.isoformat()}|{event.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+# 一覧ページングのカーソルを (event_date, id) に復元
+# 不正な形式の場合はValueErrorを送出
+def decode_event_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        event_date, event_id = raw.split("|", 1)
+        return datetime.fromisoformat(event_date), UUID(event_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
 
 
 # イベントのリストを取得
-def get_events(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Event).offset(skip).limit(limit).all()
+# (event_date, id) の順で並べ、cursorが指定された場合はその位置より後ろのイベントを返す（キーセットページング）
+# OFFSETと異なり、深いページでもインデックス上の位置から直接読み始めるため取得コストが一定になる
+# 開催日時がアーカイブの対象期間より前のイベントは含めない（履歴を含める場合は get_event_rows に include_history を指定する）
+def get_events(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    creator_id: Optional[UUID] = None,
+    upcoming: bool = False,
+):
+    return db.scalars(_events_statement(skip, limit, cursor, date_from, date_to, creator_id, upcoming)).all()
+
+
+# イベントのリストを取得（非同期セッション版）
+async def get_events_async(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    creator_id: Optional[UUID] = None,
+    upcoming: bool = False,
+):
+    result = await db.scalars(_events_statement(skip, limit, cursor, date_from, date_to, creator_id, upcoming))
+    return result.all()
+
+
+# イベントのリストを取得するクエリ（get_events / get_events_async）
+def _events_statement(skip, limit, cursor, date_from, date_to, creator_id, upcoming):
+    stmt = select(Event).options(*EVENT_LIST_OPTIONS).where(Event.event_date >= hot_horizon())
+    return _paginate_events(stmt, Event, skip, limit, cursor, date_from, date_to, creator_id, upcoming)
+
+
+# イベントのリストを列の射影（行）として取得（高速シリアライズモード・履歴を含む一覧用）
+# 絞り込み・並び順・ページングはget_eventsと同じ。各行はevent_row_payloadでレスポンスに変換する
+# include_history: アーカイブ済み・アーカイブ対象期間のイベントも含める（eventsとevents_archiveを UNION ALL で読む）
+# 作成者が削除してアーカイブへ移動したイベントは、履歴にも含めない
+def get_event_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    creator_id: Optional[UUID] = None,
+    upcoming: bool = False,
+    include_history: bool = False,
+):
+    stmt = _event_rows_statement(skip, limit, cursor, date_from, date_to, creator_id, upcoming, include_history)
+    return db.execute(stmt).all()
+
+
+# イベントのリストを列の射影（行）として取得（非同期セッション版）
+async def get_event_rows_async(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    creator_id: Optional[UUID] = None,
+    upcoming: bool = False,
+    include_history: bool = False,
+):
+    stmt = _event_rows_statement(skip, limit, cursor, date_from, date_to, creator_id, upcoming, include_history)
+    return (await db.execute(stmt)).all()
+
+
+# イベントのリストを列の射影として取得するクエリ（get_event_rows / get_event_rows_async）
+def _event_rows_statement(skip, limit, cursor, date_from, date_to, creator_id, upcoming, include_history):
+    query = (
+        select(*event_row_columns())
+        .join(User, User.id == Event.creator_id)
+        .outerjoin(EventAttendanceSummary, EventAttendanceSummary.event_id == Event.id)
+    )
+    if not include_history:
+        query = query.where(Event.event_date >= hot_horizon())
+        return _paginate_events(query, Event, skip, limit, cursor, date_from, date_to, creator_id, upcoming)
+    cold = (
+        select(*archived_event_row_columns())
+        .join(User, User.id == EventArchive.creator_id)
+        .where(EventArchive.archived_reason == ARCHIVE_REASON_AGED)
+    )
+    # 絞り込み・並び順は UNION ALL の外側に指定し、PostgreSQLが各テーブルの (event_date, id) インデックスに押し下げる
+    events = union_all(query, cold).subquery("events")
+    return _paginate_events(select(events), events.c, skip, limit, cursor, date_from, date_to, creator_id, upcoming)
+
+
+# イベント一覧のクエリ（select）に絞り込み条件・並び順・ページングを適用
+# source: 絞り込みに使う列（event_date・id・creator_id）を持つもの（Eventモデル、またはサブクエリの列）
+def _paginate_events(query, source, skip, limit, cursor, date_from, date_to, creator_id, upcoming):
+    # 絞り込み条件
+    if date_from is not None:
+        query = query.where(source.event_date >= date_from)
+    if date_to is not None:
+        query = query.where(source.event_date < date_to)
+    if creator_id is not None:
+        query = query.where(source.creator_id == creator_id)
+    if upcoming:
+        query = query.where(source.event_date >= datetime.utcnow())
+    if cursor is not None:
+        # 行値比較により (event_date, id) の複合インデックスをそのまま範囲検索に使う
+        query = query.where(tuple_(source.event_date, source.id) > decode_event_cursor(cursor))
+    elif skip:
+        query = query.offset(skip) # 従来のオフセット指定（カーソル未使用時のみ）
+    return query.order_by(source.event_date, source.id).limit(limit)
 
 
 # 指定されたIDのイベントを取得
 def get_event(db: Session, event_id: UUID):
-    return db.query(Event).filter(Event.id == event_id).first()
+    return db.scalars(select(Event).where(Event.id == event_id)).first()
+
+
+# 指定されたIDのイベントを取得（非同期セッション版）
+async def get_event_async(db: AsyncSession, event_id: UUID):
+    return (await db.scalars(select(Event).where(Event.id == event_id))).first()
+
+
+# 指定されたIDのイベントを出欠情報込みで取得（EventWithAttendancesレスポンス用）
+def get_event_with_attendances(db: Session, event_id: UUID):
+    return db.scalars(select(Event).options(*EVENT_DETAIL_OPTIONS).where(Event.id == event_id)).first()
+
+
+# 指定されたIDのイベントを出欠情報込みで取得（非同期セッション版）
+async def get_event_with_attendances_async(db: AsyncSession, event_id: UUID):
+    return (await db.scalars(select(Event).options(*EVENT_DETAIL_OPTIONS).where(Event.id == event_id))).first()
+
+
+# イベントのバージョン情報を取得（条件付きGETのETag用）
+# イベントの更新日時と出欠集計のバージョン番号だけを1回のクエリで取得し、イベント本体や出欠は読み込まない
+# 戻り値: (イベントの更新日時, 出欠のバージョン番号)。イベントが存在しない場合はNone
+def get_event_version(db: Session, event_id: UUID):
+    return _event_version(db.execute(_event_version_statement(event_id)).first())
+
+
+# イベントのバージョン情報を取得（非同期セッション版）
+async def get_event_version_async(db: AsyncSession, event_id: UUID):
+    return _event_version((await db.execute(_event_version_statement(event_id))).first())
+
+
+# イベントの更新日時と出欠集計のバージョン番号を取得するクエリ
+def _event_version_statement(event_id: UUID):
+    return (
+        select(Event.updated_at, EventAttendanceSummary.version)
+        .outerjoin(EventAttendanceSummary, EventAttendanceSummary.event_id == Event.id)
+        .where(Event.id == event_id)
+    )
+
+
+# 取得した行を (イベントの更新日時, 出欠のバージョン番号) に変換（集計行がない場合のバージョン番号は0）
+def _event_version(row):
+    if row is None:
+        return None
+    updated_at, version = row
+    return updated_at, version or 0
+
+
+# イベントが存在するかを確認
+# ストリーミングレスポンス（配信・エクスポート）を返すエンドポイントで使用する
+# リクエストのセッションはレスポンスの送信が終わるまで閉じられないため、専用の読み取りセッションで確認して結果を返す前に閉じる
+def event_exists(event_id: UUID, subject: Optional[str] = None) -> bool:
+    with create_read_session(subject) as db:
+        return get_event_version(db, event_id=event_id) is not None
+
+
+# イベントが存在するかを確認（非同期モード用）
+async def event_exists_async(event_id: UUID, subject: Optional[str] = None) -> bool:
+    async with await create_async_read_session(subject) as db:
+        return await get_event_version_async(db, event_id=event_id) is not None
 
 
 # 新しいイベントを作成
 def create_event(db: Session, event: EventCreate, user_id: UUID):
-    # Eventモデルのインスタンスを作成
-    db_event = Event(
+    db_event = _new_event(event, user_id)
+    db.add(db_event) # データベースに追加
+    response_cache.invalidate_after_commit(db) # コミット後にイベント一覧のキャッシュを無効化
+    db.commit() # コミットして変更を保存
+    db.refresh(db_event) # データベースから最新の情報を取得してオブジェクトを更新
+    return db_event
+
+
+# 新しいイベントを作成（非同期セッション版）
+# レスポンスの作成時に作成者・出欠集計を遅延読み込みできないため、それらを含めて読み込み直して返す
+async def create_event_async(db: AsyncSession, event: EventCreate, user_id: UUID):
+    db_event = _new_event(event, user_id)
+    db.add(db_event)
+    response_cache.invalidate_after_commit(db)
+    await db.commit()
+    return (await db.scalars(_event_response_statement(db_event.id))).first()
+
+
+# Eventモデルのインスタンスを作成
+def _new_event(event: EventCreate, user_id: UUID) -> Event:
+    return Event(
         title=event.title,
         description=event.description,
         event_date=event.event_date,
         creator_id=user_id # イベント作成者のIDを設定
     )
-    db.add(db_event) # データベースに追加
+
+
+# レスポンス用に、作成者と出欠集計を含めてイベントを1回のクエリで読み込むクエリ
+# セッション内に読み込み済みのイベントがあっても、データベースの値で置き換える
+def _event_response_statement(event_id: UUID):
+    return (
+        select(Event).options(*EVENT_LIST_OPTIONS).where(Event.id == event_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+# 所有者を条件にした更新・削除で対象の行がなかった場合の例外を作成
+# 対象が存在しなければ404、存在するが所有者が異なれば403とする（確認のSELECTは失敗した場合にのみ行う）
+# owner_column: 所有者を表す列（Event.creator_id など）、object_id: 対象のID
+def ownership_error(db: Session, owner_column, object_id: UUID, not_found_detail: str) -> HTTPException:
+    exists = db.execute(_owner_statement(owner_column, object_id)).first() is not None
+    return _ownership_error(exists, not_found_detail)
+
+
+# 所有者を条件にした更新・削除で対象の行がなかった場合の例外を作成（非同期セッション版）
+async def ownership_error_async(db: AsyncSession, owner_column, object_id: UUID, not_found_detail: str) -> HTTPException:
+    exists = (await db.execute(_owner_statement(owner_column, object_id))).first() is not None
+    return _ownership_error(exists, not_found_detail)
+
+
+# 対象の所有者の列を取得するクエリ（対象が存在するかの確認に使用する）
+def _owner_statement(owner_column, object_id: UUID):
+    return select(owner_column).where(owner_column.class_.id == object_id)
+
+
+# 対象が存在しなければ404、存在すれば（所有者が異なるため）403の例外を作成
+def _ownership_error(exists: bool, not_found_detail: str) -> HTTPException:
+    if not exists:
+        return HTTPException(status_code=404, detail=not_found_detail)
+    return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+
+
+# 既存のイベントを更新（イベント作成者のみ）
+# 取得・権限確認・更新・再読み込みを個別に行わず、作成者を条件にした UPDATE ... RETURNING の1回の往復で更新する
+def update_event(db: Session, event_id: UUID, event: EventUpdate, user_id: UUID):
+    # 更新データからNoneでないフィールドのみを抽出
+    update_data = event.dict(exclude_unset=True)
+    updated = db.execute(_update_event_statement(event_id, update_data, user_id)).first()
+    if updated is None:
+        db.rollback()
+        raise ownership_error(db, Event.creator_id, event_id, "Event not found")
+    if update_data:
+        broker.publish(db, f"event:{event_id}", {"type": "event", "action": "updated"})
+        response_cache.invalidate_after_commit(db, event_id) # コミット後にイベントの詳細と一覧のキャッシュを無効化
     db.commit() # コミットして変更を保存
-    db.refresh(db_event) # データベースから最新の情報を取得してオブジェクトを更新
-    return db_event
+    # レスポンス用に、作成者と出欠集計を含めて1回のクエリで読み込む
+    return db.scalars(_event_response_statement(event_id)).first()
 
 
-# 既存のイベントを更新
-def update_event(db: Session, event_id: UUID, event: EventUpdate):
-    db_event = db.query(Event).filter(Event.id == event_id).first()
-    if db_event: # イベントが存在する場合
-        # 更新データからNoneでないフィールドのみを抽出
-        update_data = event.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_event, field, value) # 各フィールドを更新
-        db.commit() # コミットして変更を保存
-        db.refresh(db_event) # データベースから最新の情報を取得してオブジェクトを更新
-    return db_event
+# 既存のイベントを更新（非同期セッション版）
+async def update_event_async(db: AsyncSession, event_id: UUID, event: EventUpdate, user_id: UUID):
+    update_data = event.dict(exclude_unset=True)
+    updated = (await db.execute(_update_event_statement(event_id, update_data, user_id))).first()
+    if updated is None:
+        await db.rollback()
+        raise await ownership_error_async(db, Event.creator_id, event_id, "Event not found")
+    if update_data:
+        await broker.publish_async(db, f"event:{event_id}", {"type": "event", "action": "updated"})
+        response_cache.invalidate_after_commit(db, event_id)
+    await db.commit()
+    return (await db.scalars(_event_response_statement(event_id))).first()
+
+
+# 作成者を条件にしたイベントの UPDATE ... RETURNING
+def _update_event_statement(event_id: UUID, update_data: dict, user_id: UUID):
+    return (
+        update(Event)
+        .where(Event.id == event_id, Event.creator_id == user_id)
+        # 更新する項目がない場合は値を変えずに、権限の確認だけを行う
+        .values(**(update_data or {"updated_at": Event.updated_at}))
+        .returning(Event.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# イベントを削除（イベント作成者のみ）
+# 作成者を条件にした DELETE ... RETURNING の1回の往復で削除する（出欠・出欠集計はデータベースの ON DELETE CASCADE で削除される）
+# 削除方式が "archive" の場合は、作成者を条件に行をロックしてから出欠とともにアーカイブテーブルへ移動する
+def delete_event(db: Session, event_id: UUID, user_id: UUID):
+    deleted = db.execute(_delete_event_statement(event_id, user_id)).first()
+    if deleted is not None and settings.event_delete_mode == "archive":
+        archive_events(db, [event_id], ARCHIVE_REASON_DELETED)
+    if deleted is None:
+        db.rollback()
+        raise ownership_error(db, Event.creator_id, event_id, "Event not found")
+    broker.publish(db, f"event:{event_id}", {"type": "event", "action": "deleted"})
+    response_cache.invalidate_after_commit(db, event_id)
+    db.commit() # コミットして変更を保存
+
+
+# イベントを削除（非同期セッション版）
+async def delete_event_async(db: AsyncSession, event_id: UUID, user_id: UUID):
+    deleted = (await db.execute(_delete_event_statement(event_id, user_id))).first()
+    if deleted is not None and settings.event_delete_mode == "archive":
+        await archive_events_async(db, [event_id], ARCHIVE_REASON_DELETED)
+    if deleted is None:
+        await db.rollback()
+        raise await ownership_error_async(db, Event.creator_id, event_id, "Event not found")
+    await broker.publish_async(db, f"event:{event_id}", {"type": "event", "action": "deleted"})
+    response_cache.invalidate_after_commit(db, event_id)
+    await db.commit()
+
 
+# 作成者を条件にしたイベントの削除（"archive" の場合は行のロック）を行うクエリ
+def _delete_event_statement(event_id: UUID, user_id: UUID):
+    if settings.event_delete_mode == "archive":
+        return select(Event.id).where(Event.id == event_id, Event.creator_id == user_id).with_for_update()
+    stmt = delete(Event).where(Event.id == event_id, Event.creator_id == user_id).returning(Event.id)
+    return stmt.execution_options(synchronize_session=False)
 
-# イベントを削除
-def delete_event(db: Session, event_id: UUID):
-    db_event = db.query(Event).filter(Event.id == event_id).first()
-    if db_event: # イベントが存在する場合
-        db.delete(db_event) # データベースから削除
-        db.commit() # コミットして変更を保存
-    return db_event
\ No newline at end of file
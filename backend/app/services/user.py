@@ -1,26 +1,102 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from app.core.cache import TTLCache # TTL付きLRUキャッシュをインポート
+from app.core.config import settings
 from app.core.security import get_password_hash # パスワードハッシュ化関数をインポート
 from app.models import User # Userモデルをインポート
-from app.schemas import UserCreate # UserCreateスキーマをインポート
+from app.schemas import UserCreate, Principal # UserCreate・Principalスキーマをインポート
+
+# 認証済みユーザーのキャッシュ（メールアドレス -> Principal）
+# セッションから切り離されたORMオブジェクトは遅延読み込みができないため、不変のPrincipalを保持する
+user_principal_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
 
 
 # メールアドレスでユーザーを取得
 def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+    return db.scalars(select(User).where(User.email == email)).first()
+
+
+# メールアドレスでユーザーを取得（非同期セッション版）
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    return (await db.scalars(select(User).where(User.email == email))).first()
+
+
+# メールアドレスから認証済みユーザーのPrincipalを取得（キャッシュ経由）
+# 見つからなかった結果はキャッシュしない
+def get_user_principal(db: Session, email: str):
+    principal = user_principal_cache.get(email)
+    if principal is None:
+        user = get_user_by_email(db, email=email)
+        if user is None:
+            return None
+        principal = Principal.model_validate(user)
+        user_principal_cache.set(email, principal)
+    return principal
+
+
+# メールアドレスから認証済みユーザーのPrincipalを取得（非同期セッション版）
+async def get_user_principal_async(db: AsyncSession, email: str):
+    principal = user_principal_cache.get(email)
+    if principal is None:
+        user = await get_user_by_email_async(db, email=email)
+        if user is None:
+            return None
+        principal = Principal.model_validate(user)
+        user_principal_cache.set(email, principal)
+    return principal
+
+
+# ユーザーのキャッシュを無効化
+# ユーザーの作成時やプロフィール更新時に呼び出す
+def invalidate_user_cache(email: str) -> None:
+    user_principal_cache.delete(email)
 
 
 # 新しいユーザーを作成
 def create_user(db: Session, user: UserCreate):
     # パスワードをハッシュ化
     hashed_password = get_password_hash(user.password)
-    # Userモデルのインスタンスを作成
-    db_user = User(
+    db_user = _new_user(user, hashed_password)
+    db.add(db_user) # データベースに追加
+    db.commit() # コミットして変更を保存
+    db.refresh(db_user) # データベースから最新の情報を取得してオブジェクトを更新
+    invalidate_user_cache(db_user.email) # 同じメールアドレスの古いキャッシュを破棄
+    return db_user
+
+
+# 新しいユーザーを作成（非同期セッション版）
+# ハッシュ化はハッシュ用プロセスの結果を待つため、イベントループをブロックしないようスレッドプールで待つ
+async def create_user_async(db: AsyncSession, user: UserCreate):
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
+    db_user = _new_user(user, hashed_password)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    invalidate_user_cache(db_user.email)
+    return db_user
+
+
+# Userモデルのインスタンスを作成
+def _new_user(user: UserCreate, hashed_password: str) -> User:
+    return User(
         email=user.email,
         name=user.name,
         password_hash=hashed_password # ハッシュ化されたパスワードを保存
     )
-    db.add(db_user) # データベースに追加
+
+
+# パスワードハッシュを更新（ログイン時の再ハッシュで使用）
+def update_password_hash(db: Session, user: User, password_hash: str):
+    user.password_hash = password_hash
     db.commit() # コミットして変更を保存
-    db.refresh(db_user) # データベースから最新の情報を取得してオブジェクトを更新
-    return db_user
\ No newline at end of file
+    return user
+
+
+# パスワードハッシュを更新（非同期セッション版）
+async def update_password_hash_async(db: AsyncSession, user: User, password_hash: str):
+    user.password_hash = password_hash
+    await db.commit()
+    return user
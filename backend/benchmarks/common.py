@@ -0,0 +1,157 @@
+# ベンチマークスイートの共通処理
+# シードデータのIDの決め方、計測値の集計、結果ファイルの保存を seed / load / compare で共有する
+import json
+import math
+import re
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 結果ファイル・シードのマニフェストの保存先
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+SEED_MANIFEST = RESULTS_DIR / "seed.json"
+
+# シードデータのIDを決めるための名前空間
+# IDをインデックスから決定的に求めるため、負荷生成側はデータベースを参照せずに対象を選べる
+BENCH_NAMESPACE = uuid.UUID("6f1c2a4e-9b7d-4c35-8e21-0d4b5a7c9e13")
+# シードユーザーのパスワード（全員共通）
+BENCH_PASSWORD = "bench-password"
+
+
+# i番目のシードユーザーのID
+def user_id(i: int) -> uuid.UUID:
+    return uuid.uuid5(BENCH_NAMESPACE, f"user:{i}")
+
+
+# i番目のシードユーザーのメールアドレス
+def user_email(i: int) -> str:
+    return f"bench-user-{i}@example.com"
+
+
+# i番目のシードイベントのID
+def event_id(i: int) -> uuid.UUID:
+    return uuid.uuid5(BENCH_NAMESPACE, f"event:{i}")
+
+
+# シードのマニフェスト（シード時の規模）を読み込む
+def load_manifest(path: Path = SEED_MANIFEST) -> dict:
+    if not path.exists():
+        raise SystemExit(f"{path} not found. Run `python -m benchmarks.seed` first.")
+    return json.loads(path.read_text())
+
+
+# Server-TimingヘッダーからSQLの数とDB時間（ミリ秒）を取り出す
+_DB_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def parse_server_timing(value: Optional[str]):
+    match = _DB_TIMING.search(value or "")
+    if match is None:
+        return None, None
+    return int(match.group(2)), float(match.group(1))
+
+
+# 昇順に並べた値のパーセンタイル（最近傍順位法）
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+# 値のリストの要約（レイテンシはミリ秒で返す）
+def summarize_latencies(latencies: List[float]) -> dict:
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "max_ms": ms(values[-1]) if values else None,
+    }
+
+
+# 操作ごとの計測値の記録
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.queries: Dict[str, List[int]] = defaultdict(list)
+        self.db_ms: Dict[str, List[float]] = defaultdict(list)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    # 1リクエスト分の結果を記録
+    def record(self, operation: str, latency: float, response=None, error: bool = False) -> None:
+        self.latencies[operation].append(latency)
+        if response is not None:
+            self.statuses[operation][response.status_code] += 1
+            error = error or response.status_code >= 400
+            queries, db_ms = parse_server_timing(response.headers.get("server-timing"))
+            if queries is not None:
+                self.queries[operation].append(queries)
+                self.db_ms[operation].append(db_ms)
+        if error:
+            self.errors[operation] += 1
+
+    # 計測の終了時刻を記録
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+
+    # 操作ごとの要約と全体の要約を作成
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        operations = {}
+        for operation in sorted(self.latencies):
+            latencies = self.latencies[operation]
+            queries = self.queries[operation]
+            db_ms = self.db_ms[operation]
+            operations[operation] = {
+                "requests": len(latencies),
+                "errors": self.errors[operation],
+                "statuses": {str(code): count for code, count in sorted(self.statuses[operation].items())},
+                "requests_per_sec": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+                **summarize_latencies(latencies),
+                "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+                "max_queries": max(queries) if queries else None,
+                "db_ms_mean": round(sum(db_ms) / len(db_ms), 3) if db_ms else None,
+            }
+        all_latencies = [v for values in self.latencies.values() for v in values]
+        all_queries = [v for values in self.queries.values() for v in values]
+        overall = {
+            "elapsed_sec": round(elapsed, 3),
+            "requests": len(all_latencies),
+            "errors": sum(self.errors.values()),
+            "requests_per_sec": round(len(all_latencies) / elapsed, 2) if elapsed > 0 else None,
+            **summarize_latencies(all_latencies),
+            "queries_per_request": round(sum(all_queries) / len(all_queries), 2) if all_queries else None,
+        }
+        return {"overall": overall, "operations": operations}
+
+
+# 現在のコミット（比較時に結果がどの時点のコードか分かるようにする）
+def git_revision() -> dict:
+    def run(*args) -> str:
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {"commit": run("rev-parse", "--short", "HEAD") or None, "dirty": bool(run("status", "--porcelain", "--", "."))}
+
+
+# 結果をJSONファイルに保存し、保存先のパスを返す
+def save_result(result: dict, output: Optional[str], scenario: str, label: Optional[str]) -> Path:
+    if output:
+        path = Path(output)
+    else:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = RESULTS_DIR / f"{stamp}-{scenario}{'-' + label if label else ''}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(result, ensure_ascii=False, indent=2))
+    return path
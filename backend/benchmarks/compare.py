@@ -0,0 +1,67 @@
+# 2つのベンチマーク結果（benchmarks.load の出力）を比較
+# 操作ごとのスループット・p50/p95/p99・リクエストあたりのSQL数の変化を表示し、
+# p95 が閾値を超えて悪化した操作、またはリクエストあたりの最大SQL数が増えた操作があれば終了コード1を返す
+#
+# 実行方法（backendディレクトリで）:
+#   python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json --threshold 10
+import argparse
+import json
+import sys
+from pathlib import Path
+
+METRICS = ("requests_per_sec", "p50_ms", "p95_ms", "p99_ms", "queries_per_request")
+
+
+# 変化率（%）
+def _change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def _format(value) -> str:
+    return "-" if value is None else f"{value:g}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="2つのベンチマーク結果を比較します")
+    parser.add_argument("before", help="比較元の結果ファイル")
+    parser.add_argument("after", help="比較先の結果ファイル")
+    parser.add_argument("--threshold", type=float, default=10.0, help="悪化とみなすp95の増加率（%%）")
+    args = parser.parse_args()
+
+    before = json.loads(Path(args.before).read_text())
+    after = json.loads(Path(args.after).read_text())
+    if before["scenario"] != after["scenario"]:
+        print(f"warning: comparing different scenarios ({before['scenario']} vs {after['scenario']})")
+    print(f"before: {before['revision'].get('commit')} {before.get('label') or ''}")
+    print(f"after:  {after['revision'].get('commit')} {after.get('label') or ''}")
+
+    regressions = []
+    rows = [("overall", before["overall"], after["overall"])]
+    rows += [(name, before["operations"][name], after["operations"][name]) for name in sorted(after["operations"]) if name in before["operations"]]
+    print(f"\n{'operation':<28}" + "".join(f"{metric:>30}" for metric in METRICS))
+    for name, old, new in rows:
+        cells = []
+        for metric in METRICS:
+            change = _change(old.get(metric), new.get(metric))
+            suffix = f" ({change:+.1f}%)" if change is not None else ""
+            cells.append(f"{_format(old.get(metric))} -> {_format(new.get(metric))}{suffix}")
+        print(f"{name:<28}" + "".join(f"{cell:>30}" for cell in cells))
+        p95_change = _change(old.get("p95_ms"), new.get("p95_ms"))
+        if p95_change is not None and p95_change > args.threshold:
+            regressions.append(f"{name}: p95 {p95_change:+.1f}%")
+        # 平均はキャッシュのヒット率で変動するため、SQL数の増加（N+1など）は最大値で判定する
+        if (old.get("max_queries") or 0) < (new.get("max_queries") or 0):
+            regressions.append(f"{name}: max queries per request {old.get('max_queries')} -> {new.get('max_queries')}")
+
+    if regressions:
+        print("\nregressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
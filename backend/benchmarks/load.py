@@ -0,0 +1,510 @@
+# バックエンドAPIの負荷テスト
+# 起動中のサーバーに対して実際のHTTPリクエストを送り、操作ごとのスループット・レイテンシ（p50/p95/p99）・
+# リクエストあたりのSQL数（Server-Timingヘッダーから取得）を計測してJSONで保存する
+# 事前に `python -m benchmarks.seed` でシードデータを作成しておく
+#
+# 実行方法（backendディレクトリで）:
+#   python -m benchmarks.load mixed --concurrency 32 --duration 60 --label baseline
+#   python -m benchmarks.load login --concurrency 16 --duration 30
+#   python -m benchmarks.load pagination --max-depth 1000
+#   python -m benchmarks.load batch --batch-size 1000 --single-users 200
+#   python -m benchmarks.load fanout --subscribers 200 --updates 50
+#   python -m benchmarks.load writes --concurrency 16 --duration 30
+#   python -m benchmarks.load dashboard --concurrency 16 --duration 30
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks.common import (
+    BENCH_PASSWORD, Recorder, event_id, git_revision, load_manifest, save_result, summarize_latencies, user_email, user_id,
+)
+
+STATUSES = ["attending", "not_attending", "maybe"]
+
+# 混合ワークロードの操作と実行比率（読み取りが中心で、一部が出欠の登録・更新）
+MIXED_WEIGHTS = {
+    "list_events": 15,
+    "list_events_next_page": 10,
+    "list_upcoming_events": 10,
+    "event_detail": 25,
+    "event_attendances": 12,
+    "my_attendances": 8,
+    "rsvp": 12,
+    "me": 8,
+}
+# アクセスが集中するイベントの割合と、そこへのアクセスの割合（一部のイベントに読み取りが偏る状況を再現する）
+HOT_EVENT_RATIO = 0.2
+HOT_ACCESS_RATIO = 0.8
+
+
+# 1人の利用者を模擬するクライアント
+# 操作ごとの計測値をRecorderに記録する
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, user_index: int, manifest: dict, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.user_index = user_index
+        self.manifest = manifest
+        self.rng = rng
+        self.headers = {}
+        self.next_cursor = None # 直前に取得した一覧の X-Next-Cursor
+        self.attendance_ids = {} # 回答済みのイベントID -> 出欠ID
+
+    # リクエストを送信し、結果を記録する（通信エラーの場合はNoneを返す）
+    async def request(self, operation: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(operation, time.perf_counter() - start, error=True)
+            return None
+        self.recorder.record(operation, time.perf_counter() - start, response)
+        return response
+
+    # シードユーザーとしてログインする
+    async def login(self) -> bool:
+        response = await self.request("login", "POST", "/auth/login", json={"email": user_email(self.user_index), "password": BENCH_PASSWORD})
+        if response is None or response.status_code != 200:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+
+    # 対象のイベントを選ぶ（HOT_ACCESS_RATIOの確率で先頭HOT_EVENT_RATIOのイベントから選ぶ）
+    def pick_event(self) -> str:
+        events = self.manifest["events"]
+        if self.rng.random() < HOT_ACCESS_RATIO:
+            return str(event_id(self.rng.randrange(max(int(events * HOT_EVENT_RATIO), 1))))
+        return str(event_id(self.rng.randrange(events)))
+
+    async def list_events(self):
+        response = await self.request("list_events", "GET", "/events/", params={"limit": 20})
+        if response is not None:
+            self.next_cursor = response.headers.get("x-next-cursor")
+
+    async def list_events_next_page(self):
+        if self.next_cursor is None:
+            return await self.list_events()
+        response = await self.request("list_events_next_page", "GET", "/events/", params={"limit": 20, "cursor": self.next_cursor})
+        if response is not None:
+            self.next_cursor = response.headers.get("x-next-cursor")
+
+    async def list_upcoming_events(self):
+        await self.request("list_upcoming_events", "GET", "/events/", params={"limit": 20, "upcoming": "true"})
+
+    async def event_detail(self):
+        await self.request("event_detail", "GET", f"/events/{self.pick_event()}")
+
+    async def event_attendances(self):
+        await self.request("event_attendances", "GET", f"/attendances/events/{self.pick_event()}")
+
+    async def my_attendances(self):
+        response = await self.request("my_attendances", "GET", "/attendances/my")
+        if response is not None and response.status_code == 200:
+            self.attendance_ids = {item["event_id"]: item["id"] for item in response.json()}
+
+    # 出欠の登録（未回答のイベント）または更新（回答済みのイベント）
+    async def rsvp(self):
+        target = self.pick_event()
+        status = self.rng.choice(STATUSES)
+        attendance_id = self.attendance_ids.get(target)
+        if attendance_id is not None:
+            await self.request("rsvp_update", "PUT", f"/attendances/{attendance_id}", json={"status": status})
+            return
+        response = await self.request("rsvp_create", "POST", "/attendances/", json={"event_id": target, "status": status})
+        if response is not None and response.status_code == 200:
+            self.attendance_ids[target] = response.json()["id"]
+
+    async def me(self):
+        await self.request("me", "GET", "/auth/me")
+
+
+# HTTPクライアントを作成
+def _client(args) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=args.concurrency + 16, max_keepalive_connections=args.concurrency + 16)
+    return httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout)
+
+
+# 仮想ユーザーごとに異なるシードユーザーを割り当てる
+def _user_index(vu: int, manifest: dict) -> int:
+    return (vu * 7) % manifest["users"]
+
+
+# 混合ワークロード: 各仮想ユーザーがログイン後、MIXED_WEIGHTSの比率で操作を繰り返す
+async def run_mixed(args, manifest: dict) -> tuple:
+    recorder = Recorder()
+    operations = list(MIXED_WEIGHTS)
+    weights = list(MIXED_WEIGHTS.values())
+    deadline = time.perf_counter() + args.duration
+
+    async def virtual_user(client, vu: int):
+        rng = random.Random(args.seed + vu)
+        user = VirtualUser(client, recorder, _user_index(vu, manifest), manifest, rng)
+        if not await user.login():
+            return
+        await user.my_attendances()
+        while time.perf_counter() < deadline:
+            await getattr(user, rng.choices(operations, weights)[0])()
+
+    async with _client(args) as client:
+        await asyncio.gather(*(virtual_user(client, vu) for vu in range(args.concurrency)))
+    recorder.stop()
+    return recorder, {"weights": MIXED_WEIGHTS}
+
+
+# ログインのみ: パスワード検証（bcrypt）を含むログインのスループットと、過負荷時の503の発生数を計測する
+async def run_login(args, manifest: dict) -> tuple:
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+
+    async def virtual_user(client, vu: int):
+        user = VirtualUser(client, recorder, _user_index(vu, manifest), manifest, random.Random(args.seed + vu))
+        while time.perf_counter() < deadline:
+            await user.login()
+
+    async with _client(args) as client:
+        await asyncio.gather(*(virtual_user(client, vu) for vu in range(args.concurrency)))
+    recorder.stop()
+    return recorder, {}
+
+
+# ページングの深さごとの比較: OFFSET（skip）とキーセット（cursor）で同じページを取得したときのレイテンシを比較する
+# レスポンスキャッシュが有効だと2回目以降はDBを参照しないため、RESPONSE_CACHE_BACKEND=none で起動したサーバーで実行する
+async def run_pagination(args, manifest: dict) -> tuple:
+    recorder = Recorder()
+    walk = Recorder() # カーソルを集めるための巡回は集計に含めない
+    limit = 100
+    total_pages = manifest["events"] // limit
+    depths = [d for d in (1, 10, 100, 1000, 10000, 100000) if d <= min(total_pages, args.max_depth)]
+
+    async with _client(args) as client:
+        user = VirtualUser(client, walk, 0, manifest, random.Random(args.seed))
+        if not await user.login():
+            raise SystemExit("login failed")
+        # 先頭から順にページを辿り、各深さのページを指すカーソルを記録する
+        cursors = {1: None}
+        cursor = None
+        for page in range(1, depths[-1] if depths else 1):
+            response = await client.get("/events/", params={"limit": limit, **({"cursor": cursor} if cursor else {})}, headers=user.headers)
+            cursor = response.headers.get("x-next-cursor")
+            if cursor is None:
+                break
+            if page + 1 in depths:
+                cursors[page + 1] = cursor
+        user.recorder = recorder
+        for depth in depths:
+            if depth not in cursors:
+                continue
+            for _ in range(args.repeat):
+                await user.request(f"offset_page_{depth}", "GET", "/events/", params={"limit": limit, "skip": (depth - 1) * limit})
+                params = {"limit": limit, **({"cursor": cursors[depth]} if cursors[depth] else {})}
+                await user.request(f"cursor_page_{depth}", "GET", "/events/", params=params)
+    recorder.stop()
+
+    summary = recorder.summary()["operations"]
+    comparison = {
+        depth: {
+            "offset_p50_ms": summary.get(f"offset_page_{depth}", {}).get("p50_ms"),
+            "cursor_p50_ms": summary.get(f"cursor_page_{depth}", {}).get("p50_ms"),
+        }
+        for depth in depths if depth in cursors
+    }
+    # 2回目以降のリクエストでSQLが実行されていない場合はキャッシュが効いている
+    cached = any(op.get("queries_per_request") == 0 for op in summary.values())
+    return recorder, {"page_size": limit, "by_depth": comparison, "response_cache_hit": cached}
+
+
+# 一括登録と1件ずつの登録の比較
+# 一括登録: イベント作成者が batch_size 件の出欠を1リクエストで登録し、続けて全件のステータスを更新する
+# 1件ずつ: single_users 人がそれぞれ自分の出欠を POST /attendances/ で登録・更新する（同時実行数は concurrency）
+async def run_batch(args, manifest: dict) -> tuple:
+    recorder = Recorder()
+    setup = Recorder() # 準備のためのリクエストは集計に含めない
+    size = min(args.batch_size, manifest["users"])
+    extra = {"batch_size": size, "batch": [], "single": {}}
+
+    async with _client(args) as client:
+        creator = VirtualUser(client, setup, 0, manifest, random.Random(args.seed))
+        if not await creator.login():
+            raise SystemExit("login failed")
+
+        async def create_event(title: str) -> str:
+            response = await client.post("/events/", headers=creator.headers, json={
+                "title": title, "description": "benchmark", "event_date": (datetime.utcnow() + timedelta(days=30)).isoformat(),
+            })
+            response.raise_for_status()
+            return response.json()["id"]
+
+        creator.recorder = recorder
+        for round_ in range(args.repeat):
+            target = await create_event(f"Batch benchmark {round_}")
+            for operation, status in (("batch_create", "attending"), ("batch_update", "maybe")):
+                items = [{"user_id": str(user_id(i)), "status": status} for i in range(size)]
+                start = time.perf_counter()
+                await creator.request(operation, "POST", f"/attendances/events/{target}/batch", json={"items": items})
+                elapsed = time.perf_counter() - start
+                extra["batch"].append({"operation": operation, "items": size, "items_per_sec": round(size / elapsed, 1)})
+
+        # 1件ずつ: 参加者ごとにログインしてから（計測対象外）、同時実行数を制限して登録・更新する
+        singles = min(args.single_users, manifest["users"])
+        target = await create_event("Single benchmark")
+        users = [VirtualUser(client, setup, i, manifest, random.Random(args.seed + i)) for i in range(singles)]
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def with_limit(coro):
+            async with semaphore:
+                return await coro
+
+        await asyncio.gather(*(with_limit(user.login()) for user in users))
+        for user in users:
+            user.recorder = recorder
+        for operation, status in (("single_create", "attending"), ("single_update", "maybe")):
+            async def one(user):
+                if operation == "single_create":
+                    response = await user.request(operation, "POST", "/attendances/", json={"event_id": target, "status": status})
+                    if response is not None and response.status_code == 200:
+                        user.attendance_ids[target] = response.json()["id"]
+                elif target in user.attendance_ids:
+                    await user.request(operation, "PUT", f"/attendances/{user.attendance_ids[target]}", json={"status": status})
+
+            start = time.perf_counter()
+            await asyncio.gather(*(with_limit(one(user)) for user in users))
+            extra["single"][operation] = {"items": singles, "items_per_sec": round(singles / (time.perf_counter() - start), 1)}
+    recorder.stop()
+    return recorder, extra
+
+
+# 更新・削除: 各仮想ユーザーが自分のイベントと出欠を更新し、イベントの削除と、他人のイベントの更新（403）を繰り返す
+# 所有者の確認と更新を1つのSQLで行う前後で、リクエストあたりのSQL数（往復回数）とレイテンシを比較する
+async def run_writes(args, manifest: dict) -> tuple:
+    recorder = Recorder()
+    setup = Recorder() # 準備のためのリクエストは集計に含めない
+    events = {} # 仮想ユーザー -> 自分が作成したイベントID
+    ready = asyncio.Event()
+    joined = [0]
+
+    async def virtual_user(client, vu: int):
+        rng = random.Random(args.seed + vu)
+        user = VirtualUser(client, setup, _user_index(vu, manifest), manifest, rng)
+        if not await user.login():
+            raise SystemExit("login failed")
+
+        async def create_event(title: str):
+            response = await user.request("event_create", "POST", "/events/", json={
+                "title": title, "event_date": (datetime.utcnow() + timedelta(days=30)).isoformat(),
+            })
+            return response.json()["id"] if response is not None and response.status_code == 200 else None
+
+        events[vu] = await create_event(f"Write benchmark {vu}")
+        response = await user.request("rsvp_create", "POST", "/attendances/", json={"event_id": events[vu], "status": "attending"})
+        attendance = response.json()["id"]
+        # 全員の準備が終わってから計測を始める（他人のイベントを更新対象に選ぶため）
+        joined[0] += 1
+        if joined[0] == args.concurrency:
+            ready.set()
+        await ready.wait()
+
+        user.recorder = recorder
+        deadline = time.perf_counter() + args.duration
+        n = 0
+        while time.perf_counter() < deadline:
+            n += 1
+            await user.request("event_update", "PUT", f"/events/{events[vu]}", json={"title": f"Write benchmark {vu} #{n}"})
+            await user.request("attendance_update", "PUT", f"/attendances/{attendance}", json={"status": STATUSES[n % 3]})
+            other = events[(vu + 1) % args.concurrency]
+            if args.concurrency > 1:
+                await user.request("event_update_forbidden", "PUT", f"/events/{other}", json={"title": "not mine"})
+            if n % 5 == 0:
+                user.recorder = setup
+                target = await create_event(f"Write benchmark {vu} delete #{n}")
+                user.recorder = recorder
+                if target is not None:
+                    await user.request("event_delete", "DELETE", f"/events/{target}")
+
+    async with _client(args) as client:
+        await asyncio.gather(*(virtual_user(client, vu) for vu in range(args.concurrency)))
+    recorder.stop()
+    # 他人のイベントの更新は403が正しい結果のため、エラー数とは別に件数を示す
+    return recorder, {"forbidden_expected": recorder.errors.get("event_update_forbidden", 0)}
+
+
+# リアルタイム配信のファンアウト
+# subscribers 本のSSE接続で1つのイベントを購読し、出欠を updates 回更新して、
+# 更新リクエストの送信から各購読者が変更を受信するまでの時間を計測する
+async def run_fanout(args, manifest: dict) -> tuple:
+    recorder = Recorder()
+    delivery = [] # 配信の遅延（秒）
+    sent_at = [] # n番目の変更を送信した時刻
+    received = [0] * args.subscribers # 購読者ごとの受信数
+    resyncs = [0]
+    changed = asyncio.Condition()
+
+    async with _client(args) as client, httpx.AsyncClient(base_url=args.base_url, timeout=None, limits=httpx.Limits(max_connections=args.subscribers + 8)) as stream_client:
+        writer = VirtualUser(client, recorder, 0, manifest, random.Random(args.seed))
+        if not await writer.login():
+            raise SystemExit("login failed")
+        response = await client.post("/events/", headers=writer.headers, json={
+            "title": "Fan-out benchmark", "event_date": (datetime.utcnow() + timedelta(days=30)).isoformat(),
+        })
+        response.raise_for_status()
+        target = response.json()["id"]
+        ready = asyncio.Semaphore(0)
+
+        async def subscriber(n: int):
+            async with stream_client.stream("GET", f"/events/{target}/stream", headers=writer.headers) as stream:
+                ready.release()
+                event_type = None
+                async for line in stream.aiter_lines():
+                    if line.startswith("event: "):
+                        event_type = line[len("event: "):]
+                    elif line.startswith("data: ") and event_type is not None:
+                        now = time.perf_counter()
+                        if event_type == "resync":
+                            resyncs[0] += 1
+                        elif event_type == "attendance" and received[n] < len(sent_at):
+                            delivery.append(now - sent_at[received[n]])
+                            received[n] += 1
+                            async with changed:
+                                changed.notify_all()
+                        event_type = None
+
+        tasks = [asyncio.create_task(subscriber(n)) for n in range(args.subscribers)]
+        for _ in range(args.subscribers):
+            await ready.acquire()
+
+        # 1件ずつ変更し、全購読者が受信する（またはタイムアウトする）まで待ってから次の変更を行う
+        for n in range(args.updates + 1):
+            sent_at.append(time.perf_counter())
+            if n == 0:
+                response = await writer.request("rsvp_create", "POST", "/attendances/", json={"event_id": target, "status": "attending"})
+                attendance = response.json()["id"]
+            else:
+                await writer.request("rsvp_update", "PUT", f"/attendances/{attendance}", json={"status": STATUSES[n % 3]})
+            try:
+                async with changed:
+                    await asyncio.wait_for(changed.wait_for(lambda: min(received) > n), timeout=args.timeout)
+            except asyncio.TimeoutError:
+                pass
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    recorder.stop()
+
+    expected = args.subscribers * (args.updates + 1)
+    return recorder, {
+        "subscribers": args.subscribers,
+        "updates": args.updates + 1,
+        "expected_deliveries": expected,
+        "delivered": len(delivery),
+        "resyncs": resyncs[0],
+        "delivery_latency": summarize_latencies(delivery),
+    }
+
+
+# ダッシュボードの表示: GET /dashboard の1回のリクエストと、従来の3回のリクエスト（/auth/me・/events/・/attendances/my）を比較する
+# 各仮想ユーザーが2つの方法で交互に画面を表示する。従来の方法はフロントエンドと同じく3つのリクエストを同時に送り、すべて揃うまでを1回の表示とする
+async def run_dashboard(args, manifest: dict) -> tuple:
+    recorder = Recorder()
+    pages = {"dashboard": [], "three_calls": []} # 方法ごとの1回の表示にかかった時間（秒）
+    deadline = time.perf_counter() + args.duration
+    limit = 20
+
+    async def virtual_user(client, vu: int):
+        user = VirtualUser(client, recorder, _user_index(vu, manifest), manifest, random.Random(args.seed + vu))
+        if not await user.login():
+            return
+        n = 0
+        while time.perf_counter() < deadline:
+            n += 1
+            start = time.perf_counter()
+            if n % 2:
+                await user.request("dashboard", "GET", "/dashboard", params={"limit": limit})
+                pages["dashboard"].append(time.perf_counter() - start)
+            else:
+                await asyncio.gather(
+                    user.request("three_calls_me", "GET", "/auth/me"),
+                    user.request("three_calls_events", "GET", "/events/", params={"limit": limit, "upcoming": "true"}),
+                    user.request("three_calls_my_attendances", "GET", "/attendances/my"),
+                )
+                pages["three_calls"].append(time.perf_counter() - start)
+
+    async with _client(args) as client:
+        await asyncio.gather(*(virtual_user(client, vu) for vu in range(args.concurrency)))
+    recorder.stop()
+
+    summary = recorder.summary()["operations"]
+
+    # 1回の表示あたりのSQL数（各リクエストの平均の合計）
+    def queries_per_page(operations) -> float:
+        values = [summary.get(op, {}).get("queries_per_request") for op in operations]
+        return round(sum(values), 2) if None not in values else None
+
+    return recorder, {
+        "limit": limit,
+        "dashboard": {
+            "requests_per_page": 1,
+            "queries_per_page": queries_per_page(["dashboard"]),
+            "page_latency": summarize_latencies(pages["dashboard"]),
+        },
+        "three_calls": {
+            "requests_per_page": 3,
+            "queries_per_page": queries_per_page(["three_calls_me", "three_calls_events", "three_calls_my_attendances"]),
+            "page_latency": summarize_latencies(pages["three_calls"]),
+        },
+    }
+
+
+SCENARIOS = {
+    "mixed": run_mixed,
+    "login": run_login,
+    "pagination": run_pagination,
+    "batch": run_batch,
+    "fanout": run_fanout,
+    "writes": run_writes,
+    "dashboard": run_dashboard,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="バックエンドAPIの負荷テストを実行し、結果をJSONで保存します")
+    parser.add_argument("scenario", choices=SCENARIOS, help="実行するシナリオ")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="対象サーバーのURL")
+    parser.add_argument("--concurrency", type=int, default=16, help="同時に動作する仮想ユーザー数")
+    parser.add_argument("--duration", type=float, default=30.0, help="計測時間（秒、mixed・login・writes・dashboard）")
+    parser.add_argument("--repeat", type=int, default=20, help="各計測の繰り返し回数（pagination・batch）")
+    parser.add_argument("--max-depth", type=int, default=1000, help="計測する最大のページ番号（pagination）")
+    parser.add_argument("--batch-size", type=int, default=1000, help="一括登録の件数（batch）")
+    parser.add_argument("--single-users", type=int, default=200, help="1件ずつ登録する参加者数（batch）")
+    parser.add_argument("--subscribers", type=int, default=100, help="SSEの購読者数（fanout）")
+    parser.add_argument("--updates", type=int, default=50, help="出欠の更新回数（fanout）")
+    parser.add_argument("--timeout", type=float, default=30.0, help="リクエストのタイムアウト（秒）")
+    parser.add_argument("--seed", type=int, default=1, help="乱数のシード")
+    parser.add_argument("--label", help="結果ファイル名に付けるラベル（例: サーバーの設定）")
+    parser.add_argument("--output", help="結果の保存先（省略時は benchmarks/results/ に保存）")
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+    started_at = datetime.utcnow().isoformat()
+    recorder, extra = asyncio.run(SCENARIOS[args.scenario](args, manifest))
+    summary = recorder.summary()
+    result = {
+        "scenario": args.scenario,
+        "label": args.label,
+        "started_at": started_at,
+        "revision": git_revision(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output",)},
+        "seed": manifest,
+        **summary,
+        "details": extra,
+    }
+    path = save_result(result, args.output, args.scenario, args.label)
+    print(json.dumps(summary["overall"], indent=2))
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# ベンチマーク用のシードデータを作成
+# 指定した規模のユーザー・イベント・出欠をローカルのPostgreSQL（settings.database_url）に一括登録する
+# IDはインデックスから決定的に求める（common.user_id / common.event_id）ため、同じ引数で何度でも同じデータを再現できる
+#
+# 実行方法（backendディレクトリで）:
+#   python -m benchmarks.seed --users 1000 --events 10000 --attendances-per-event 20 --reset
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, literal, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.database import get_engine
+from app.core.security import pwd_context
+from app.models import Attendance, AttendanceStatus, Event, EventAttendanceSummary, User
+from benchmarks.common import BENCH_PASSWORD, SEED_MANIFEST, event_id, user_email, user_id
+
+# 1回のINSERTで登録する行数
+CHUNK_SIZE = 5000
+# 出欠ステータスの出現比率（参加・不参加・未定）
+STATUS_WEIGHTS = {AttendanceStatus.ATTENDING: 60, AttendanceStatus.NOT_ATTENDING: 25, AttendanceStatus.MAYBE: 15}
+
+# シードデータの識別（メールアドレスの形式で判別する）
+bench_users = select(User.id).where(User.email.like("bench-user-%@example.com"))
+bench_events = select(Event.id).where(Event.creator_id.in_(bench_users))
+
+
+# 既存のシードデータを削除
+def reset(conn) -> None:
+    conn.execute(delete(Attendance).where(Attendance.event_id.in_(bench_events) | Attendance.user_id.in_(bench_users)))
+    conn.execute(delete(EventAttendanceSummary).where(EventAttendanceSummary.event_id.in_(bench_events)))
+    conn.execute(delete(Event).where(Event.creator_id.in_(bench_users)))
+    conn.execute(delete(User).where(User.email.like("bench-user-%@example.com")))
+
+
+# 行を CHUNK_SIZE ごとにまとめて登録し、登録件数を返す
+def insert_chunks(conn, table, rows, label: str) -> int:
+    total = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            conn.execute(insert(table), chunk)
+            total += len(chunk)
+            chunk = []
+            print(f"  {label}: {total}", end="\r", flush=True)
+    if chunk:
+        conn.execute(insert(table), chunk)
+        total += len(chunk)
+    print(f"  {label}: {total}")
+    return total
+
+
+# ユーザーの行を生成（パスワードハッシュは全員共通のものを1回だけ計算する）
+def generate_users(count: int, now: datetime):
+    password_hash = pwd_context.hash(BENCH_PASSWORD)
+    for i in range(count):
+        yield {"id": user_id(i), "email": user_email(i), "name": f"Bench User {i}", "password_hash": password_hash, "created_at": now, "updated_at": now}
+
+
+# イベントの行を生成（開催日時は過去1年から未来1年に分布させる）
+def generate_events(count: int, users: int, now: datetime, rng: random.Random):
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=365)
+    for i in range(count):
+        yield {
+            "id": event_id(i),
+            "title": f"Bench Event {i}",
+            "description": f"Synthetic event {i} for load testing",
+            "event_date": start + timedelta(minutes=rng.randrange(2 * 365 * 24 * 60)),
+            "creator_id": user_id(i % users),
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+# 出欠の行を生成
+# 各イベントの出欠数は 0〜平均の2倍 に分布させ、対象ユーザーはイベントごとにずらした連続するユーザーとする（重複しない）
+def generate_attendances(events: int, users: int, per_event: int, now: datetime, rng: random.Random):
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    for i in range(events):
+        first = (i * 7919) % users
+        for j in range(min(rng.randint(0, 2 * per_event), users)):
+            yield {
+                "id": uuid.uuid4(),
+                "event_id": event_id(i),
+                "user_id": user_id((first + j) % users),
+                "status": rng.choices(statuses, weights)[0],
+                "comment": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+
+
+# シードした出欠からイベントごとの集計行を作成
+def build_summaries(conn, now: datetime) -> None:
+    counts = (
+        select(
+            Attendance.event_id,
+            *[func.count().filter(Attendance.status == status) for status in AttendanceStatus],
+            literal(1),
+            literal(now),
+        )
+        .where(Attendance.event_id.in_(bench_events))
+        .group_by(Attendance.event_id)
+    )
+    columns = ["event_id", *[status.value for status in AttendanceStatus], "version", "updated_at"]
+    stmt = pg_insert(EventAttendanceSummary).from_select(columns, counts)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[EventAttendanceSummary.event_id],
+        set_={column: stmt.excluded[column] for column in columns[1:]},
+    )
+    conn.execute(stmt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用のシードデータを作成します")
+    parser.add_argument("--users", type=int, default=1000, help="ユーザー数")
+    parser.add_argument("--events", type=int, default=10000, help="イベント数")
+    parser.add_argument("--attendances-per-event", type=int, default=20, help="イベントあたりの平均出欠数")
+    parser.add_argument("--seed", type=int, default=42, help="乱数のシード")
+    parser.add_argument("--reset", action="store_true", help="既存のシードデータを削除してから作成する")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    engine = get_engine()
+    with engine.begin() as conn:
+        if args.reset:
+            print("removing existing benchmark data")
+            reset(conn)
+        users = insert_chunks(conn, User.__table__, generate_users(args.users, now), "users")
+        events = insert_chunks(conn, Event.__table__, generate_events(args.events, args.users, now, rng), "events")
+        attendances = insert_chunks(
+            conn, Attendance.__table__,
+            generate_attendances(args.events, args.users, args.attendances_per_event, now, rng), "attendances",
+        )
+        print("  building attendance summaries")
+        build_summaries(conn, now)
+    # 統計情報を更新し、登録直後でも実運用に近い実行計画でクエリが実行されるようにする
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+
+    manifest = {
+        "users": users,
+        "events": events,
+        "attendances": attendances,
+        "attendances_per_event": args.attendances_per_event,
+        "seed": args.seed,
+        "seeded_at": now.isoformat(),
+    }
+    SEED_MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    SEED_MANIFEST.write_text(json.dumps(manifest, indent=2))
+    print(f"seeded in {time.perf_counter() - started:.1f}s, manifest written to {SEED_MANIFEST}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# 一覧エンドポイントのシリアライズ処理のマイクロベンチマーク
+# 従来の経路（ORMオブジェクト → Pydanticで検証 → JSON）と高速シリアライズモード（行 → dict → orjson）を比較する
+# データベースには接続せず、1ページ分のORMオブジェクトと行をメモリ上に作成してシリアライズ部分のみを計測する
+# 両方の経路の出力がバイト単位で一致することも確認する
+#
+# 実行方法（backendディレクトリで）:
+#   python -m benchmarks.serialization [--items 100] [--repeat 200]
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from app.core.serialization import dump_json, dump_rows
+from app.models import Attendance, Event, EventAttendanceSummary, User
+from app.models.attendance import AttendanceStatus
+from app.schemas import Event as EventSchema, AttendanceWithUser, AttendanceWithEvent
+from app.services.attendance import (
+    ATTENDANCE_ROW_COLUMNS, ATTENDANCE_USER_ROW_COLUMNS, ATTENDANCE_EVENT_ROW_PREFIX,
+    attendance_with_user_payload, attendance_with_event_payload,
+)
+from app.services.event import event_row_columns, event_row_payload
+
+STATUSES = list(AttendanceStatus)
+
+
+# 指定した列で取得した場合と同じ形式の行（SQLAlchemyのRow）を作成
+def _rows(columns, values: List[tuple]):
+    keys = [column.name for column in select(*columns).selected_columns]
+    return IteratorResult(SimpleResultMetaData(keys), iter(values)).all()
+
+
+# テスト用のユーザーを作成
+def _user(i: int, now: datetime) -> User:
+    return User(id=uuid.uuid4(), email=f"user{i}@example.com", name=f"ユーザー{i}", created_at=now, updated_at=now)
+
+
+# テスト用のイベント（作成者・出欠集計付き）を作成
+def _event(i: int, creator: User, now: datetime) -> Event:
+    event = Event(
+        id=uuid.uuid4(), title=f"イベント{i}", description="説明" * 20, event_date=now + timedelta(days=i),
+        creator_id=creator.id, created_at=now, updated_at=now,
+    )
+    event.creator = creator
+    event.attendance_summary = EventAttendanceSummary(event_id=event.id, attending=i, not_attending=1, maybe=0, version=i)
+    return event
+
+
+# イベントの行の値（event_row_columnsの列順）
+def _event_values(event: Event) -> tuple:
+    creator, summary = event.creator, event.attendance_summary
+    return (
+        event.id, event.title, event.description, event.event_date, event.creator_id, event.created_at, event.updated_at,
+        creator.email, creator.name, creator.created_at, creator.updated_at,
+        summary.attending, summary.not_attending, summary.maybe,
+    )
+
+
+# 出欠の行の値（ATTENDANCE_ROW_COLUMNSの列順）
+def _attendance_values(attendance: Attendance) -> tuple:
+    return (
+        attendance.id, attendance.event_id, attendance.user_id, attendance.status, attendance.comment,
+        attendance.created_at, attendance.updated_at,
+    )
+
+
+# 各エンドポイントについて (名前, 従来の経路, 高速な経路) を作成
+def build_cases(items: int):
+    now = datetime(2024, 4, 1, 9, 30, 15, 123456)
+    users = [_user(i, now) for i in range(items)]
+    events = [_event(i, users[i % 10], now) for i in range(items)]
+    event_attendances = []
+    my_attendances = []
+    for i in range(items):
+        a = Attendance(
+            id=uuid.uuid4(), event_id=events[0].id, user_id=users[i].id, status=STATUSES[i % 3],
+            comment=f"コメント{i}" if i % 2 else None, created_at=now, updated_at=now,
+        )
+        a.user = users[i]
+        event_attendances.append(a)
+        b = Attendance(
+            id=uuid.uuid4(), event_id=events[i].id, user_id=users[0].id, status=STATUSES[i % 3],
+            comment=None, created_at=now, updated_at=now,
+        )
+        b.event = events[i]
+        my_attendances.append(b)
+
+    event_rows = _rows(event_row_columns(), [_event_values(e) for e in events])
+    attendance_user_rows = _rows(
+        ATTENDANCE_ROW_COLUMNS + ATTENDANCE_USER_ROW_COLUMNS,
+        [_attendance_values(a) + (a.user.email, a.user.name, a.user.created_at, a.user.updated_at) for a in event_attendances],
+    )
+    attendance_event_rows = _rows(
+        ATTENDANCE_ROW_COLUMNS + event_row_columns(ATTENDANCE_EVENT_ROW_PREFIX),
+        [_attendance_values(b) + _event_values(b.event) for b in my_attendances],
+    )
+
+    event_adapter = TypeAdapter(List[EventSchema])
+    attendance_user_adapter = TypeAdapter(List[AttendanceWithUser])
+    attendance_event_adapter = TypeAdapter(List[AttendanceWithEvent])
+    return [
+        (
+            "GET /events/",
+            lambda: dump_json(event_adapter, events),
+            lambda: dump_rows(event_row_payload, event_rows),
+        ),
+        (
+            "GET /attendances/events/{event_id}",
+            lambda: dump_json(attendance_user_adapter, event_attendances),
+            lambda: dump_rows(attendance_with_user_payload, attendance_user_rows),
+        ),
+        (
+            # このエンドポイントはresponse_modelで検証し、jsonable_encoder と JSONResponse でエンコードしている
+            "GET /attendances/my",
+            lambda: json.dumps(
+                jsonable_encoder(attendance_event_adapter.validate_python(my_attendances, from_attributes=True)),
+                ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+            ).encode("utf-8"),
+            lambda: dump_rows(attendance_with_event_payload, attendance_event_rows),
+        ),
+    ]
+
+
+# 関数を繰り返し実行し、1回あたりの平均時間（ミリ秒）を返す
+def _measure(fn, repeat: int) -> float:
+    fn() # ウォームアップ
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="一覧エンドポイントのシリアライズ処理を比較します")
+    parser.add_argument("--items", type=int, default=100, help="1ページあたりの件数")
+    parser.add_argument("--repeat", type=int, default=200, help="計測の繰り返し回数")
+    args = parser.parse_args()
+
+    results = []
+    for name, current, fast in build_cases(args.items):
+        # 出力が一致しない場合は計測しない
+        if current() != fast():
+            raise SystemExit(f"{name}: output mismatch between current and fast serialization")
+        current_ms = _measure(current, args.repeat)
+        fast_ms = _measure(fast, args.repeat)
+        results.append({
+            "endpoint": name,
+            "items": args.items,
+            "current_ms": round(current_ms, 3),
+            "fast_ms": round(fast_ms, 3),
+            "speedup": round(current_ms / fast_ms, 2),
+        })
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# 本番用のgunicorn設定
+# uvicornのワーカーを複数プロセス起動し、CPUコアを使い切れるようにする
+#
+# 実行方法（backendディレクトリで）:
+#   gunicorn -c gunicorn.conf.py app.main:app
+import multiprocessing
+import os
+
+# 待ち受けるアドレス
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# ワーカー数（環境変数 WEB_CONCURRENCY が設定されていなければCPUコア数）
+# 各ワーカーが db_pool_size + db_max_overflow までの接続を持つため、データベースの max_connections を超えないように設定する
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# アプリケーションをマスタープロセスで読み込んでからワーカーをforkする
+# インポートを1回で済ませ、ワーカー間でメモリを共有できる
+# データベースエンジンはワーカーごとに最初の使用時に作成されるため、接続がプロセス間で共有されることはない
+# （接続プールの準備は各ワーカーの起動処理で行われ、完了してからリクエストの受け付けを開始する）
+preload_app = True
+
+# 終了時（SIGTERM）に処理中のリクエストの完了を待つ最大秒数。超えたワーカーは強制終了される
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+# 応答しないワーカーを再起動するまでの秒数
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+# Keep-Aliveの待ち時間（秒）。ロードバランサーのアイドルタイムアウトより長くする
+keepalive = int(os.getenv("KEEPALIVE", 5))
+
+# 指定したリクエスト数を処理したワーカーを再起動し、メモリの増加を抑える（0で無効）
+# ジッターにより、全ワーカーが同時に再起動しないようにする
+max_requests = int(os.getenv("MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 1000))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
@@ -0,0 +1,46 @@
+import asyncio
+from typing import Callable, Dict, Optional, Tuple
+
+
+# ストリーミングレスポンスの送信中の状態を確認するため、ASGIアプリケーションを直接呼び出す
+# TestClientはレスポンス全体を受け取ってから返すため、終わらない配信（SSE）や送信中の状態を確認できない
+# 最初の本文の断片を受け取った時点で on_first_chunk() を呼び出してその戻り値を保持し、その後クライアントの切断を通知する
+# 戻り値: (ステータスコード, on_first_chunk() の戻り値（本文を受け取らなかった場合はNone）)
+def stream_first_chunk(app, path: str, headers: Dict[str, str], on_first_chunk: Callable[[], object]) -> Tuple[int, Optional[object]]:
+    async def run():
+        received_chunk = asyncio.Event()
+        result = {"status": None, "observed": None}
+
+        async def receive():
+            await received_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                result["status"] = message["status"]
+            elif message["type"] == "http.response.body" and not received_chunk.is_set():
+                if message.get("body"):
+                    result["observed"] = on_first_chunk()
+                # 本文の断片を受け取ったら、または本文が空のまま終わったら切断する
+                if message.get("body") or not message.get("more_body", False):
+                    received_chunk.set()
+
+        path_only, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path_only,
+            "raw_path": path_only.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), timeout=10)
+        return result["status"], result["observed"]
+
+    return asyncio.run(run())
@@ -0,0 +1,114 @@
+import os
+import tempfile
+
+# アプリケーションの設定はインポート時に読み込まれるため、テスト用の環境変数は先に設定する
+# TEST_DATABASE_URL を指定するとそのデータベース（PostgreSQL）で実行し、省略時は一時ファイルのSQLiteで実行する
+# TEST_DATABASE_ASYNC=true を指定すると非同期モード（asyncpg / aiosqlite）のエンドポイントで実行する
+_test_database_url = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/test.sqlite"
+os.environ.update(
+    DATABASE_URL=_test_database_url,
+    DATABASE_ASYNC=os.environ.get("TEST_DATABASE_ASYNC", "false"),
+    DATABASE_REPLICA_URLS="",
+    BCRYPT_ROUNDS="4",
+    PASSWORD_HASH_WORKERS="0", # パスワードのハッシュ化をプロセスプールを使わずに行う
+    JOB_WORKERS="0",
+    RATE_LIMIT_ENABLED="false",
+    MAX_CONCURRENT_REQUESTS="0",
+    RESPONSE_CACHE_BACKEND="none", # キャッシュのヒットでSQLの数が変わらないようにする
+    ARCHIVE_INTERVAL_SECONDS="0",
+)
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Integer, event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.database import Base, get_async_engine, get_engine
+
+if get_engine().dialect.name == "sqlite":
+    # PostgreSQL固有のUUID型の列を、SQLiteでは文字列の列として作成する
+    from sqlalchemy.dialects.sqlite.base import SQLiteTypeCompiler
+
+    SQLiteTypeCompiler.visit_UUID = lambda self, type_, **kw: "CHAR(32)"
+
+    # 出欠・出欠集計の ON DELETE CASCADE がPostgreSQLと同じように動作するよう、外部キー制約を有効にする
+    # アプリケーションの終了時にエンジンは作り直されるため、非同期エンジン・レプリカも含むすべてのエンジンに登録する
+    @event.listens_for(Engine, "connect")
+    def _enable_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+import app.models # noqa: F401 すべてのテーブルをメタデータに登録する
+from app.models.job import Job
+
+if get_engine().dialect.name == "sqlite":
+    # SQLiteではBIGINTの主キーが自動採番されないため、INTEGERとして作成する
+    Job.__table__.c.id.type = Integer()
+from app.main import app as fastapi_app
+
+
+def _recreate_tables():
+    engine = get_engine()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+
+# テストごとに空のテーブルを作成する
+@pytest.fixture
+def db_tables():
+    _recreate_tables()
+    yield get_engine()
+    Base.metadata.drop_all(get_engine())
+
+
+# テストの途中でテーブルを空に戻す関数を返す
+@pytest.fixture
+def reset_tables(db_tables):
+    return _recreate_tables
+
+
+@pytest.fixture
+def client(db_tables):
+    with TestClient(fastapi_app) as client:
+        yield client
+
+
+# 実行されたSQL文を数えるカウンター
+class StatementCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def reset(self) -> None:
+        self.statements.clear()
+
+
+# before_cursor_execute でデータベースに送信されたSQL文を数えるフィクスチャ
+# with ブロックの中で実行されたSQL文だけを数える（非同期モードでは非同期エンジンのSQL文も数える）
+@pytest.fixture
+def count_statements(db_tables):
+    counter = StatementCounter()
+    engines = [db_tables]
+    if settings.database_async:
+        engines.append(get_async_engine().sync_engine)
+
+    class _Counting:
+        def __enter__(self):
+            counter.reset()
+            for engine in engines:
+                event.listen(engine, "before_cursor_execute", counter)
+            return counter
+
+        def __exit__(self, *exc):
+            for engine in engines:
+                event.remove(engine, "before_cursor_execute", counter)
+
+    return _Counting
@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+# テスト用のRedis互換クライアント（dictに保存する）
+# RedisCacheBackendが使用するコマンド（GET・SET（ex・nx）・INCR・パイプライン）だけを、redis-pyと同じ戻り値で実装する
+# clock を差し替えると、有効期限の切れたキーを待たずに再現できる
+class FakeRedis:
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {} # キー -> (値, 有効期限の時刻)
+        self._lock = threading.Lock()
+
+    # redis-pyと同じく、値をバイト列に変換して保存する
+    @staticmethod
+    def _encode(value) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    # 有効期限の切れていない値を取得する（ロックを保持して呼び出す）
+    def _get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self.clock():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key: str, value, ex: Optional[float] = None, nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            if nx and self._get(key) is not None:
+                return None
+            self._data[key] = (self._encode(value), self.clock() + ex if ex is not None else None)
+            return True
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            current = self._get(key)
+            value = int(current or 0) + amount
+            expires_at = self._data[key][1] if current is not None else None
+            self._data[key] = (self._encode(value), expires_at)
+            return value
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+
+# テスト用のパイプライン（execute() の呼び出し時に、積んだコマンドを順に実行して結果のリストを返す）
+class FakePipeline:
+    def __init__(self, client: FakeRedis):
+        self._client = client
+        self._commands = []
+
+    def set(self, *args, **kwargs) -> "FakePipeline":
+        self._commands.append((self._client.set, args, kwargs))
+        return self
+
+    def incr(self, *args, **kwargs) -> "FakePipeline":
+        self._commands.append((self._client.incr, args, kwargs))
+        return self
+
+    def execute(self) -> list:
+        commands, self._commands = self._commands, []
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.core.database import create_session
+from app.core.security import get_password_hash
+from app.models.attendance import Attendance, AttendanceStatus
+from app.models.event import Event
+from app.models.user import User
+from app.services.archive import archive_events_before, hot_horizon
+
+PASSWORD = "password123"
+
+
+@pytest.fixture
+def archive_delete_mode(monkeypatch):
+    monkeypatch.setattr(settings, "event_delete_mode", "archive")
+
+
+# 開催から一定期間が経過したイベントと今後のイベントを作成し、作成者が両方に出欠を登録する
+def _seed():
+    db = create_session()
+    try:
+        user = User(email="owner@example.com", name="owner", password_hash=get_password_hash(PASSWORD))
+        db.add(user)
+        db.flush()
+        aged = Event(title="aged", event_date=datetime.utcnow() - timedelta(days=settings.archive_after_days + 1), creator_id=user.id)
+        upcoming = Event(title="upcoming", event_date=datetime.utcnow() + timedelta(days=1), creator_id=user.id)
+        db.add_all([aged, upcoming])
+        db.flush()
+        db.add_all(Attendance(event_id=event.id, user_id=user.id, status=AttendanceStatus.ATTENDING) for event in (aged, upcoming))
+        db.commit()
+        event_ids = aged.id, upcoming.id
+        archive_events_before(db, hot_horizon(), batch_size=10)
+        return event_ids
+    finally:
+        db.close()
+
+
+# 作成者が削除してアーカイブへ移動したイベントは、履歴を含む一覧にも表示しない
+def test_deleted_events_are_excluded_from_history(client, archive_delete_mode):
+    aged_id, upcoming_id = _seed()
+    response = client.post("/auth/login", json={"email": "owner@example.com", "password": PASSWORD})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    assert client.delete(f"/events/{upcoming_id}", headers=headers).status_code == 200
+
+    events = client.get("/events/", params={"include_history": True}, headers=headers).json()
+    assert [event["id"] for event in events] == [str(aged_id)]
+    attendances = client.get("/attendances/my", params={"include_history": True}, headers=headers).json()
+    assert [attendance["event_id"] for attendance in attendances] == [str(aged_id)]
+    deleted_attendances = client.get(f"/attendances/events/{upcoming_id}", params={"include_history": True}, headers=headers)
+    assert deleted_attendances.json() == []
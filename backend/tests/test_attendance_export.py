@@ -0,0 +1,64 @@
+import uuid
+from datetime import datetime, timedelta
+
+from app.core.database import create_session, get_pool_stats
+from app.core.security import get_password_hash
+from app.main import app
+from app.models.attendance import Attendance, AttendanceStatus
+from app.models.event import Event
+from app.models.user import User
+from app.services.user import user_principal_cache
+from tests.asgi_stream import stream_first_chunk
+
+PASSWORD = "password123"
+
+
+# イベントを作成し、guests人の参加者の出欠を登録する
+def _seed(guests: int):
+    db = create_session()
+    try:
+        password_hash = get_password_hash(PASSWORD)
+        owner = User(email="owner@example.com", name="owner", password_hash=password_hash)
+        users = [User(email=f"guest{i}@example.com", name=f"guest{i}", password_hash=password_hash) for i in range(guests)]
+        db.add_all([owner, *users])
+        db.flush()
+        event = Event(title="event", event_date=datetime.utcnow() + timedelta(days=1), creator_id=owner.id)
+        db.add(event)
+        db.flush()
+        db.add_all(Attendance(event_id=event.id, user_id=user.id, status=AttendanceStatus.ATTENDING) for user in users)
+        db.commit()
+        return event.id
+    finally:
+        db.close()
+
+
+def _login(client) -> dict:
+    response = client.post("/auth/login", json={"email": "owner@example.com", "password": PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+# 送信中に保持する接続は、エクスポート用のカーソルの1本だけ（認証ユーザーのキャッシュがない場合も含む）
+def test_export_holds_only_the_cursor_connection(client):
+    event_id = _seed(30)
+    headers = _login(client)
+    user_principal_cache.clear()
+
+    status, checked_out = stream_first_chunk(app, f"/attendances/events/{event_id}/export", headers, lambda: get_pool_stats()["checked_out"])
+    assert status == 200
+    assert checked_out == 1
+    assert get_pool_stats()["checked_out"] == 0
+
+
+def test_export_streams_every_attendance(client):
+    event_id = _seed(30)
+    headers = _login(client)
+    response = client.get(f"/attendances/events/{event_id}/export", params={"format": "ndjson"}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 30
+
+
+def test_export_of_unknown_event_returns_404(client):
+    _seed(1)
+    headers = _login(client)
+    response = client.get(f"/attendances/events/{uuid.uuid4()}/export", headers=headers)
+    assert response.status_code == 404
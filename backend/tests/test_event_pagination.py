@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from app.api.events import MAX_EVENTS_PAGE_SIZE
+from app.core.database import create_session
+from app.core.security import get_password_hash
+from app.models.event import Event
+from app.models.user import User
+
+PASSWORD = "password123"
+
+
+def _seed(count: int):
+    db = create_session()
+    try:
+        user = User(email="owner@example.com", name="owner", password_hash=get_password_hash(PASSWORD))
+        db.add(user)
+        db.flush()
+        start = datetime.utcnow() + timedelta(days=1)
+        db.add_all(Event(title=f"event{i}", event_date=start + timedelta(hours=i), creator_id=user.id) for i in range(count))
+        db.commit()
+    finally:
+        db.close()
+
+
+# 最大件数を超える limit は拒否せずに最大件数へ切り詰め、続きはカーソルで取得できる
+def test_limit_above_maximum_is_clamped(client):
+    _seed(MAX_EVENTS_PAGE_SIZE + 1)
+    response = client.post("/auth/login", json={"email": "owner@example.com", "password": PASSWORD})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    first = client.get("/events/", params={"limit": 1000}, headers=headers)
+    assert first.status_code == 200
+    assert len(first.json()) == MAX_EVENTS_PAGE_SIZE
+    cursor = first.headers["X-Next-Cursor"]
+
+    rest = client.get("/events/", params={"limit": 1000, "cursor": cursor}, headers=headers)
+    assert [event["title"] for event in rest.json()] == [f"event{MAX_EVENTS_PAGE_SIZE}"]
@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime, timedelta
+
+from app.core.database import create_session, get_pool_stats
+from app.core.security import get_password_hash
+from app.main import app
+from app.models.event import Event
+from app.models.user import User
+from app.services.user import user_principal_cache
+from tests.asgi_stream import stream_first_chunk
+
+PASSWORD = "password123"
+
+
+def _seed():
+    db = create_session()
+    try:
+        user = User(email="viewer@example.com", name="viewer", password_hash=get_password_hash(PASSWORD))
+        db.add(user)
+        db.flush()
+        event = Event(title="event", event_date=datetime.utcnow() + timedelta(days=1), creator_id=user.id)
+        db.add(event)
+        db.commit()
+        return event.id
+    finally:
+        db.close()
+
+
+def _login(client) -> dict:
+    response = client.post("/auth/login", json={"email": "viewer@example.com", "password": PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+# 配信中はデータベースの接続を保持しない（認証ユーザーのキャッシュがない場合も含む）
+def test_stream_does_not_hold_a_connection(client):
+    event_id = _seed()
+    headers = _login(client)
+    user_principal_cache.clear()
+
+    status, checked_out = stream_first_chunk(app, f"/events/{event_id}/stream", headers, lambda: get_pool_stats()["checked_out"])
+    assert status == 200
+    assert checked_out == 0
+
+
+# 存在しないイベントは購読せずに404を返す
+def test_stream_of_unknown_event_returns_404(client):
+    _seed()
+    headers = _login(client)
+    response = client.get(f"/events/{uuid.uuid4()}/stream", headers=headers)
+    assert response.status_code == 404
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.database import create_session
+from app.core.security import get_password_hash
+from app.models.attendance import Attendance, AttendanceStatus
+from app.models.event import Event
+from app.models.user import User
+
+PASSWORD = "password123"
+
+
+# 閲覧ユーザーと、rsvps件の出欠が付いたイベントを作成する
+# 閲覧ユーザーはすべてのイベントに出欠を登録するため、/attendances/my の件数もイベント数に比例する
+def _seed(rsvps: int):
+    db = create_session()
+    try:
+        password_hash = get_password_hash(PASSWORD)
+        viewer = User(email="viewer@example.com", name="viewer", password_hash=password_hash)
+        guests = [User(email=f"guest{i}@example.com", name=f"guest{i}", password_hash=password_hash) for i in range(rsvps)]
+        db.add_all([viewer, *guests])
+        db.flush()
+        start = datetime.utcnow() + timedelta(days=1)
+        # 作成者の読み込みもイベントごとに発生し得るよう、イベントはそれぞれ別のユーザーが作成する
+        events = [Event(title=f"event{i}", event_date=start + timedelta(hours=i), creator_id=guest.id) for i, guest in enumerate(guests)]
+        db.add_all(events)
+        db.flush()
+        statuses = list(AttendanceStatus)
+        # 最初のイベントには全員が出欠を登録し、閲覧ユーザーは全イベントに出欠を登録する
+        db.add_all(
+            Attendance(event_id=events[0].id, user_id=guest.id, status=statuses[i % len(statuses)])
+            for i, guest in enumerate(guests)
+        )
+        db.add_all(Attendance(event_id=event.id, user_id=viewer.id, status=AttendanceStatus.ATTENDING) for event in events)
+        db.commit()
+        return events[0].id
+    finally:
+        db.close()
+
+
+def _login(client) -> dict:
+    response = client.post("/auth/login", json={"email": "viewer@example.com", "password": PASSWORD})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+# rsvps件の出欠を登録した状態で、エンドポイントを1回呼び出したときに実行されたSQL文の数を返す
+def _statement_count(client, count_statements, path: str, rsvps: int) -> int:
+    event_id = _seed(rsvps)
+    headers = _login(client)
+    url = path.format(event_id=event_id)
+    # 初回のリクエストで認証ユーザーのキャッシュなどを温めてから数える
+    assert client.get(url, headers=headers).status_code == 200
+    with count_statements() as counter:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    return counter.count
+
+
+# 出欠の件数が増えてもSQL文の数が変わらない（N+1クエリが発生しない）ことを確認する
+@pytest.mark.parametrize("path", ["/events/", "/events/{event_id}", "/attendances/my"])
+def test_statement_count_does_not_grow_with_result_size(client, count_statements, reset_tables, path):
+    small = _statement_count(client, count_statements, path, 3)
+    reset_tables()
+    large = _statement_count(client, count_statements, path, 50)
+    assert small > 0
+    assert large == small
@@ -0,0 +1,86 @@
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core import database, replicas
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, create_session, get_replica_engine
+from app.core.replicas import Replica, replica_router
+from app.core.response_cache import MemoryCacheBackend, response_cache
+from app.core.security import get_password_hash
+from app.models.event import Event
+from app.models.user import User
+
+PASSWORD = "password123"
+
+
+# プライマリとは別のSQLiteファイルを、書き込みが反映されていないレプリカとして使用する
+# レスポンスキャッシュはプロセス内メモリで有効にする
+@pytest.fixture
+def lagging_replica(client, monkeypatch):
+    monkeypatch.setattr(settings, "database_replica_urls", f"sqlite:///{tempfile.mkdtemp()}/replica.sqlite")
+    replica = Replica(0, settings.replica_urls[0])
+    replica.lag = 0.0 # 遅延の確認が済み、読み取りに使用できる状態にする
+    monkeypatch.setattr(replica_router, "replicas", [replica])
+    monkeypatch.setattr(response_cache, "backend", MemoryCacheBackend(maxsize=100, ttl=60))
+    monkeypatch.setattr(replicas, "write_marks", MemoryCacheBackend(maxsize=100, ttl=settings.db_read_your_writes_seconds))
+    engine = get_replica_engine(0)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+    database._engines.pop("replica:0", None)
+    database._engines.pop("async-replica:0", None) # 非同期モードで作成されたレプリカ用の非同期エンジン
+
+
+# 同じユーザー・イベントをプライマリとレプリカの両方に作成する（レプリケーション済みの状態）
+def _seed(replica_engine):
+    password_hash = get_password_hash(PASSWORD)
+    owner_id, viewer_id, event_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    event_date = datetime.utcnow() + timedelta(days=1)
+    for session in (create_session(), SessionLocal(bind=replica_engine)):
+        with session:
+            session.add_all([
+                User(id=owner_id, email="owner@example.com", name="owner", password_hash=password_hash),
+                User(id=viewer_id, email="viewer@example.com", name="viewer", password_hash=password_hash),
+            ])
+            session.flush()
+            session.add(Event(id=event_id, title="before", event_date=event_date, creator_id=owner_id))
+            session.commit()
+    return event_id
+
+
+def _login(client, email: str) -> dict:
+    response = client.post("/auth/login", json={"email": email, "password": PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+# 書き込みの直後に他のユーザーが遅延したレプリカから読み取っても、その内容をキャッシュに保存せず、
+# 書き込んだユーザーの読み取り（プライマリ）には書き込み後の内容を返す
+def test_writer_reads_its_write_after_another_user_reads_the_replica(client, lagging_replica):
+    event_id = _seed(lagging_replica)
+    owner = _login(client, "owner@example.com")
+    viewer = _login(client, "viewer@example.com")
+
+    assert client.put(f"/events/{event_id}", json={"title": "after"}, headers=owner).status_code == 200
+
+    # 他のユーザーはレプリカから読み取るため、書き込みはまだ反映されていない
+    assert client.get(f"/events/{event_id}", headers=viewer).json()["title"] == "before"
+    # 書き込んだユーザーはプライマリで読み取り、他のユーザーの読み取り結果をキャッシュから受け取らない
+    assert client.get(f"/events/{event_id}", headers=owner).json()["title"] == "after"
+    assert client.get("/events/", headers=owner).json()[0]["title"] == "after"
+
+
+# 無効化の直後にレプリカで読み取った内容は保存されず、許容遅延を過ぎた後の読み取りは保存される
+def test_replica_reads_right_after_invalidation_are_not_cached(client, lagging_replica):
+    event_id = _seed(lagging_replica)
+    viewer = _login(client, "viewer@example.com")
+
+    response_cache.invalidate_event(event_id)
+    client.get(f"/events/{event_id}", headers=viewer)
+    assert response_cache.backend.get(response_cache.event_key("event", event_id).key) is None
+
+    response_cache.backend.set(f"invalidated:gen:event:{event_id}", b"1", 0) # 許容遅延の経過
+    client.get(f"/events/{event_id}", headers=viewer)
+    assert response_cache.backend.get(response_cache.event_key("event", event_id).key) is not None
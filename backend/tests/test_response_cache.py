@@ -0,0 +1,197 @@
+import threading
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.core.database import create_session
+from app.core.response_cache import CachedResponse, RedisCacheBackend, ResponseCache, response_cache
+from app.models.user import User
+from tests.fake_redis import FakeRedis
+
+
+# 時刻を手動で進める時計（有効期限の確認用）
+class ManualClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_get_and_set_round_trip_with_expiry():
+    clock = ManualClock()
+    backend = RedisCacheBackend(FakeRedis(clock=clock))
+
+    assert backend.get("missing") is None
+    backend.set("key", b"value", ttl=5)
+    assert backend.get("key") == b"value"
+
+    clock.now += 5
+    assert backend.get("key") is None
+
+
+def test_short_ttl_is_rounded_up_to_one_second():
+    clock = ManualClock()
+    backend = RedisCacheBackend(FakeRedis(clock=clock))
+
+    backend.set("key", b"value", ttl=0.2)
+    clock.now += 0.5
+    assert backend.get("key") == b"value"
+
+
+def test_generation_is_initialized_once_and_bumped():
+    backend = RedisCacheBackend(FakeRedis())
+
+    first = backend.get_generation("gen:event:1")
+    assert backend.get_generation("gen:event:1") == first
+    backend.bump_generation("gen:event:1")
+    assert backend.get_generation("gen:event:1") == first + 1
+
+
+def test_bump_without_existing_generation_initializes_it():
+    backend = RedisCacheBackend(FakeRedis())
+
+    backend.bump_generation("gen:event-list")
+    generation = backend.get_generation("gen:event-list")
+    backend.bump_generation("gen:event-list")
+    assert backend.get_generation("gen:event-list") == generation + 1
+
+
+def test_prefix_separates_backends_sharing_a_client():
+    client = FakeRedis()
+    cache = RedisCacheBackend(client, prefix="attendance:")
+    marks = RedisCacheBackend(client, prefix="attendance:written:")
+
+    cache.set("user", b"cached", ttl=60)
+    assert marks.get("user") is None
+
+
+def test_invalidation_changes_event_and_list_keys():
+    cache = ResponseCache(RedisCacheBackend(FakeRedis()), ttl=60)
+    event_id = uuid.uuid4()
+    event_key = cache.event_key("event", event_id)
+    list_key = cache.list_key("events", "0|100")
+
+    cache.invalidate_event(event_id)
+    assert cache.event_key("event", event_id) != event_key
+    assert cache.list_key("events", "0|100") == list_key
+
+    cache.invalidate_event_lists()
+    assert cache.list_key("events", "0|100") != list_key
+
+
+def test_get_or_compute_caches_the_response():
+    cache = ResponseCache(RedisCacheBackend(FakeRedis()), ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return CachedResponse(b'{"a":1}', {"X-Next-Cursor": "abc"})
+
+    first = cache.get_or_compute("key", compute)
+    second = cache.get_or_compute("key", compute)
+
+    assert len(calls) == 1
+    assert (second.body, second.headers) == (first.body, first.headers)
+    assert (cache.hits.value, cache.misses.value) == (1, 1)
+
+
+# キャッシュを参照した回数を数えるバックエンド
+class CountingBackend(RedisCacheBackend):
+    def __init__(self, client):
+        super().__init__(client)
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return super().get(key)
+
+
+def test_concurrent_misses_compute_once():
+    backend = CountingBackend(FakeRedis())
+    cache = ResponseCache(backend, ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    # 最初の計算を止めている間に、同じキーを他のスレッドから要求する
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return CachedResponse(b"[]")
+
+    def request():
+        results.append(cache.get_or_compute("key", compute).body)
+
+    leader = threading.Thread(target=request)
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=request) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    # 後続のスレッドがすべてキャッシュを参照し終える（計算中の結果を待ち始める）まで待つ
+    while backend.gets < 5:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [b"[]"] * 5
+    assert cache.misses.value == 1
+
+
+def test_failed_leader_lets_followers_compute():
+    cache = ResponseCache(RedisCacheBackend(FakeRedis()), ttl=60, wait_timeout=0.1)
+    flight_started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        flight_started.set()
+        release.wait(5)
+        raise RuntimeError("database unavailable")
+
+    errors = []
+
+    def leader():
+        try:
+            cache.get_or_compute("key", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    assert flight_started.wait(5)
+    # 先行するリクエストが終わらない間は、待ち時間の上限を過ぎたら自分で計算する
+    assert cache.get_or_compute("key", lambda: CachedResponse(b"fallback")).body == b"fallback"
+    release.set()
+    thread.join(5)
+    assert len(errors) == 1
+
+
+# 無効化の登録はコミット後に1回だけ反映され、ロールバックしたトランザクションの登録は反映されない
+def test_invalidate_after_commit_waits_for_the_commit(db_tables, monkeypatch):
+    backend = RedisCacheBackend(FakeRedis())
+    monkeypatch.setattr(response_cache, "backend", backend)
+    event_id = uuid.uuid4()
+    generation = backend.get_generation(f"gen:event:{event_id}")
+    list_generation = backend.get_generation("gen:event-list")
+
+    with create_session() as db:
+        db.execute(text("SELECT 1"))
+        response_cache.invalidate_after_commit(db, event_id)
+        db.rollback()
+        assert backend.get_generation(f"gen:event:{event_id}") == generation
+
+        # コミット時のフラッシュ（内部のトランザクション）が終了しても登録は破棄されない
+        db.add(User(email="user@example.com", name="user", password_hash="x"))
+        response_cache.invalidate_after_commit(db, event_id)
+        response_cache.invalidate_after_commit(db, event_id)
+        assert backend.get_generation(f"gen:event:{event_id}") == generation
+        db.commit()
+
+    assert backend.get_generation(f"gen:event:{event_id}") == generation + 1
+    assert backend.get_generation("gen:event-list") == list_generation + 1
@@ -0,0 +1,10 @@
+#!/bin/bash
+# プライマリの初期化スクリプト（docker-compose.replica.yml から使用）
+# ストリーミングレプリケーション用のユーザーを作成し、レプリカからの接続を許可する
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-SQL
+    CREATE ROLE replicator WITH REPLICATION LOGIN PASSWORD 'replicator';
+SQL
+
+echo "host replication replicator all scram-sha-256" >> "$PGDATA/pg_hba.conf"
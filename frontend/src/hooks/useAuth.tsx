@@ -78,6 +78,10 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
 
   // ログアウト処理
   const logout = () => {
+    const token = localStorage.getItem('access_token');
+    if (token) {
+      authApi.logout(token).catch(() => {}); // サーバー側でトークンを失効させる（失敗してもログアウトは続行）
+    }
     localStorage.removeItem('access_token'); // トークンを削除
     setUser(null); // ユーザー情報をクリア
   };
@@ -58,6 +58,7 @@ const CreateEvent = () => {
     onSuccess: (data) => {
       // 成功時：イベント一覧のキャッシュを無効化し、最新の状態に更新
       queryClient.invalidateQueries('events');
+      queryClient.invalidateQueries('dashboard');
       // 作成されたイベントの詳細ページに遷移
       navigate(`/events/${data.id}`);
     },
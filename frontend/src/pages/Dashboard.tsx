@@ -7,16 +7,24 @@ import { useQuery } from 'react-query';
 import { format } from 'date-fns';
 // 認証フック、APIサービス、型定義をインポート
 import { useAuth } from '../hooks/useAuth';
-import { eventsApi } from '../services/api';
-import { Event } from '../types';
+import { dashboardApi } from '../services/api';
+import { DashboardEvent } from '../types';
+
+// 出欠ステータスの表示名と色
+const STATUS_LABELS = {
+  attending: { text: '参加', color: 'bg-green-100 text-green-800' },
+  not_attending: { text: '不参加', color: 'bg-red-100 text-red-800' },
+  maybe: { text: '未定', color: 'bg-yellow-100 text-yellow-800' },
+};
 
 // ダッシュボードページコンポーネント
 const Dashboard = () => {
   // 認証情報（ユーザー情報とログアウト関数）を取得
   const { user, logout } = useAuth();
-  // React QueryのuseQueryを使用してイベント一覧データをフェッチ
-  // 'events'はクエリキー、eventsApi.getEventsはデータを取得する関数
-  const { data: events, isLoading, error } = useQuery('events', eventsApi.getEvents);
+  // React QueryのuseQueryを使用してダッシュボードのデータをフェッチ
+  // ユーザー情報・今後のイベントと出欠の集計・自分の出欠を1回のリクエストで取得する
+  const { data: dashboard, isLoading, error } = useQuery('dashboard', dashboardApi.getDashboard);
+  const events = dashboard?.events;
 
   // データ読み込み中の表示
   if (isLoading) {
@@ -46,7 +54,7 @@ const Dashboard = () => {
               <h1 className="text-xl font-semibold">出欠管理アプリ</h1>
             </div>
             <div className="flex items-center space-x-4">
-              <span className="text-gray-700">こんにちは、{user?.name}さん</span>
+              <span className="text-gray-700">こんにちは、{dashboard?.user.name ?? user?.name}さん</span>
               <button
                 onClick={logout} // ログアウトボタン
                 className="bg-red-600 hover:bg-red-700 text-white px-4 py-2 rounded-md text-sm font-medium"
@@ -61,7 +69,7 @@ const Dashboard = () => {
       <div className="max-w-7xl mx-auto py-6 sm:px-6 lg:px-8">
         <div className="px-4 py-6 sm:px-0">
           <div className="flex justify-between items-center mb-6">
-            <h2 className="text-2xl font-bold text-gray-900">イベント一覧</h2>
+            <h2 className="text-2xl font-bold text-gray-900">今後のイベント</h2>
             <Link
               to="/create-event" // イベント作成ページへのリンク
               className="bg-blue-600 hover:bg-blue-700 text-white px-4 py-2 rounded-md text-sm font-medium"
@@ -74,7 +82,7 @@ const Dashboard = () => {
             {/* イベントが存在する場合 */}
             {events && events.length > 0 ? (
               <ul className="divide-y divide-gray-200">
-                {events.map((event: Event) => (
+                {events.map((event: DashboardEvent) => (
                   <li key={event.id}>
                     <Link
                       to={`/events/${event.id}`} // イベント詳細ページへのリンク
@@ -94,10 +102,24 @@ const Dashboard = () => {
                             </p>
                           )}
                         </div>
-                        <div className="flex-shrink-0">
-                          <span className="text-sm text-gray-500">
+                        <div className="flex-shrink-0 text-right space-y-1">
+                          {/* 自分の出欠（未回答の場合は未回答と表示） */}
+                          {event.my_attendance ? (
+                            <span className={`inline-block px-2 py-1 text-xs font-medium rounded-full ${STATUS_LABELS[event.my_attendance.status].color}`}>
+                              {STATUS_LABELS[event.my_attendance.status].text}
+                            </span>
+                          ) : (
+                            <span className="inline-block px-2 py-1 text-xs font-medium rounded-full bg-gray-100 text-gray-800">
+                              未回答
+                            </span>
+                          )}
+                          {/* 出欠の集計 */}
+                          <p className="text-xs text-gray-500">
+                            参加 {event.attendance_summary.attending} / 不参加 {event.attendance_summary.not_attending} / 未定 {event.attendance_summary.maybe}
+                          </p>
+                          <p className="text-sm text-gray-500">
                             作成者: {event.creator.name}
-                          </span>
+                          </p>
                         </div>
                       </div>
                     </Link>
@@ -107,7 +129,7 @@ const Dashboard = () => {
             ) : (
               // イベントが存在しない場合
               <div className="text-center py-12">
-                <p className="text-gray-500">イベントがありません</p>
+                <p className="text-gray-500">今後のイベントがありません</p>
                 <Link
                   to="/create-event"
                   className="mt-4 inline-block bg-blue-600 hover:bg-blue-700 text-white px-4 py-2 rounded-md text-sm font-medium"
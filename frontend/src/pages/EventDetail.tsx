@@ -74,6 +74,7 @@ const EventDetail = () => {
       // 成功時：出欠一覧とイベント詳細のキャッシュを無効化し、最新の状態に更新
       queryClient.invalidateQueries(['attendances', id]);
       queryClient.invalidateQueries(['event', id]);
+      queryClient.invalidateQueries('dashboard'); // ダッシュボードの集計と自分の出欠
       setShowAttendanceForm(false); // フォームを非表示
       reset(); // フォームをリセット
     },
@@ -92,6 +93,7 @@ const EventDetail = () => {
         // 成功時：出欠一覧とイベント詳細のキャッシュを無効化し、最新の状態に更新
         queryClient.invalidateQueries(['attendances', id]);
         queryClient.invalidateQueries(['event', id]);
+        queryClient.invalidateQueries('dashboard'); // ダッシュボードの集計と自分の出欠
         setShowAttendanceForm(false); // フォームを非表示
         reset(); // フォームをリセット
       },
@@ -107,6 +109,7 @@ const EventDetail = () => {
     onSuccess: () => {
       // 成功時：イベント一覧のキャッシュを無効化し、ダッシュボードに遷移
       queryClient.invalidateQueries('events');
+      queryClient.invalidateQueries('dashboard');
       navigate('/');
     },
     onError: (err: any) => {
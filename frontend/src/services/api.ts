@@ -1,7 +1,7 @@
 // HTTPクライアントライブラリaxiosをインポート
 import axios from 'axios';
 // アプリケーション内で使用する型定義をインポート
-import { LoginRequest, RegisterRequest, Token, User, Event, EventCreate, EventWithAttendances, AttendanceCreate, AttendanceWithUser, AttendanceWithEvent } from '../types';
+import { LoginRequest, RegisterRequest, Token, User, Event, EventCreate, EventWithAttendances, AttendanceCreate, AttendanceWithUser, AttendanceWithEvent, Dashboard } from '../types';
 
 // APIのベースURLを定義
 const API_BASE_URL = 'http://localhost:8000';
@@ -51,6 +51,11 @@ export const authApi = {
     return response.data;
   },
 
+  // ログアウトAPI（サーバー側でアクセストークンを失効させる）
+  logout: async (token: string): Promise<void> => {
+    await api.post('/auth/logout', null, { headers: { Authorization: `Bearer ${token}` } });
+  },
+
   // 現在のユーザー情報取得API
   getCurrentUser: async (): Promise<User> => {
     const response = await api.get('/auth/me');
@@ -117,4 +122,13 @@ export const attendancesApi = {
   },
 };
 
+// ダッシュボード関連のAPIサービス
+export const dashboardApi = {
+  // ダッシュボード取得API（ユーザー情報・今後のイベントと出欠の集計・自分の出欠を1回のリクエストで取得）
+  getDashboard: async (): Promise<Dashboard> => {
+    const response = await api.get('/dashboard');
+    return response.data;
+  },
+};
+
 export default api;
\ No newline at end of file
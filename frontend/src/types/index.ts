@@ -17,6 +17,14 @@ export interface Event {
   created_at: string;
   updated_at: string;
   creator: User; // イベント作成者のユーザー情報
+  attendance_summary: AttendanceSummary; // 出欠ステータスごとの件数
+}
+
+// 出欠ステータスごとの件数のインターフェース
+export interface AttendanceSummary {
+  attending: number;
+  not_attending: number;
+  maybe: number;
 }
 
 // 出欠情報を含むイベント情報のインターフェース
@@ -45,6 +53,17 @@ export interface AttendanceWithEvent extends Attendance {
   event: Event; // 関連するイベント情報
 }
 
+// ダッシュボードに表示するイベント情報のインターフェース
+export interface DashboardEvent extends Event {
+  my_attendance: Attendance | null; // 現在のユーザーの出欠（未回答の場合はnull）
+}
+
+// ダッシュボード情報のインターフェース（GET /dashboard のレスポンス）
+export interface Dashboard {
+  user: User; // 現在のユーザー情報
+  events: DashboardEvent[]; // 今後のイベント（開催日時の昇順）
+}
+
 // ログインリクエストのインターフェース
 export interface LoginRequest {
   email: string;